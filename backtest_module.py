@@ -68,16 +68,25 @@ class Loader:
         return resampled
 
 class SimulatedBroker:
-    """Tracks Balance, Positions, and Equity Curve"""
-    def __init__(self, initial_balance=10000, leverage=100, slippage=0.0, commission_type='fixed', commission_value=0.0, lot_size=100):
+    """
+    Tracks Balance, Positions, and Equity Curve.
+    be_trigger_r / partial_r (in R, None = off) mirror TradeManager's BE move and partial TP.
+    """
+    def __init__(self, initial_balance=10000, leverage=100, slippage=0.0, commission_type='fixed', commission_value=0.0, lot_size=100,
+                 be_trigger_r=None, be_buffer_r=0.25, partial_r=None, partial_pct=0.3):
         self.balance = initial_balance
         self.leverage = leverage
         self.slippage = slippage
         self.commission_type = commission_type
         self.commission_value = commission_value
         self.lot_size = lot_size
+        self.be_trigger_r = be_trigger_r
+        self.be_buffer_r = be_buffer_r
+        self.partial_r = partial_r
+        self.partial_pct = partial_pct
         
         self.positions = [] 
+        self.order_count = 0
         self.trade_history = []
         self.equity_curve = []
 
@@ -109,8 +118,9 @@ class SimulatedBroker:
         
         real_entry = self.get_price_with_slippage(entry_price, side)
         
+        self.order_count += 1
         trade = {
-            'id': len(self.trade_history) + len(self.positions) + 1,
+            'id': self.order_count, # Partial closes share their position's id
             'symbol': symbol,
             'direction': side,
             'qty': qty,
@@ -118,7 +128,10 @@ class SimulatedBroker:
             'sl': sl,
             'tp': tp,
             'open_time': time,
-            'commission': comm_cost
+            'commission': comm_cost,
+            'risk': abs(real_entry - sl), # 1R
+            'is_be': False,
+            'partial_taken': False
         }
         self.positions.append(trade)
         return trade
@@ -161,7 +174,33 @@ class SimulatedBroker:
                 self.close_trade(trade, exit_price, current_candle['time'], 'TP')
                 continue
 
-    def close_trade(self, trade, exit_price, time, reason):
+            # Management acts on this bar's extreme; a moved SL applies from the next bar
+            if self.be_trigger_r is not None or self.partial_r is not None:
+                self.manage_trade(trade, current_candle)
+
+    def manage_trade(self, trade, current_candle):
+        """TradeManager's BE trigger + partial TP, evaluated at the best price of the bar."""
+        r = trade['risk']
+        if r <= 0:
+            return
+        sign = 1 if trade['direction'] == 'buy' else -1
+        if sign > 0:
+            best_r = (current_candle['high'] - trade['entry_price']) / r
+        else:
+            best_r = (trade['entry_price'] - current_candle['low']) / r
+
+        if self.partial_r is not None and not trade['partial_taken'] and best_r >= self.partial_r:
+            exit_price = trade['entry_price'] + sign * self.partial_r * r
+            self.close_trade(trade, exit_price, current_candle['time'], 'PARTIAL', fraction=self.partial_pct)
+            trade['partial_taken'] = True
+
+        if self.be_trigger_r is not None and not trade['is_be'] and best_r >= self.be_trigger_r:
+            trade['sl'] = trade['entry_price'] + sign * self.be_buffer_r * r
+            trade['is_be'] = True
+
+    def close_trade(self, trade, exit_price, time, reason, fraction=1.0):
+        qty = trade['qty'] * fraction
+        entry_comm = trade['commission'] * fraction # Entry commission is released pro rata
         # Commission on exit
         comm_cost = 0
         
@@ -171,44 +210,56 @@ class SimulatedBroker:
              
         elif self.commission_type == 'percentage':
              # Charge percentage on exit value
-             notional = trade['qty'] * exit_price
+             notional = qty * exit_price
              comm_cost = notional * (self.commission_value / 100)
              
         elif self.commission_type == 'fixed':
-             comm_cost = self.commission_value * trade['qty'] # If per unit
+             comm_cost = self.commission_value * qty # If per unit
         
         if trade['direction'] == 'buy':
-            gross_pnl = (exit_price - trade['entry_price']) * trade['qty']
+            gross_pnl = (exit_price - trade['entry_price']) * qty
         else:
-            gross_pnl = (trade['entry_price'] - exit_price) * trade['qty']
+            gross_pnl = (trade['entry_price'] - exit_price) * qty
             
-        net_pnl = gross_pnl - trade['commission'] - comm_cost
+        net_pnl = gross_pnl - entry_comm - comm_cost
         
         self.balance += net_pnl
         
         # Log
         closed = trade.copy()
+        closed['qty'] = qty
+        closed['commission'] = entry_comm
         closed['exit_price'] = exit_price
         closed['close_time'] = time
         closed['pnl'] = net_pnl
         closed['reason'] = reason
         
         self.trade_history.append(closed)
-        self.positions.remove(trade)
+        if fraction >= 1.0:
+            self.positions.remove(trade)
+        else:
+            trade['qty'] -= qty
+            trade['commission'] -= entry_comm
 
 class SilentReporter:
-    """Redirects alerts to a log file"""
+    """Redirects alerts to a log file (filename=None discards them, e.g. sweep workers)"""
     def __init__(self, filename='backtest_events.log'):
         self.filename = filename
+        if filename is None:
+            return
         # Clear log
         with open(filename, 'w') as f:
             f.write(f"--- Backtest Started: {datetime.datetime.now()} ---\n")
 
     def send_message(self, msg):
+        if self.filename is None:
+            return
         with open(self.filename, 'a') as f:
             f.write(f"[MSG] {msg}\n")
             
     def send_photo(self, path, caption=""):
+        if self.filename is None:
+            return
         with open(self.filename, 'a') as f:
             f.write(f"[IMG] {path} | {caption}\n")
 
@@ -243,17 +294,49 @@ class BacktestEngine:
         }
     }
 
-    def __init__(self, asset_class='GOLD'):
+    # Tunable rule constants (grid/random search: backtest_sweep.py). Defaults = live behaviour,
+    # except trade management: be_trigger_r / partial_r = None keeps the plain SL/TP simulation.
+    DEFAULT_PARAMS = {
+        'rr': 2.0,                 # TP at rr x risk
+        'sl_buffer': 0.0005,       # SL distance beyond the sweep level (price units)
+        'rsi_long': (40, 70),      # M5 RSI band for longs
+        'rsi_short': (30, 60),     # M5 RSI band for shorts
+        'sweep_min_wick': 0.1,     # SMCLogic
+        'sweep_min_candles': 20,   # SMCLogic
+        'sweep_exclude': 5,        # SMCLogic
+        'mss_expiry_hours': 8.0,   # SMCLogic
+        'be_trigger_r': None,      # TradeManager live: 1.5
+        'be_buffer_r': 0.25,
+        'partial_r': None,         # TradeManager live: 2.0
+        'partial_pct': 0.3
+    }
+    STRATEGY_PARAMS = ('sweep_min_wick', 'sweep_min_candles', 'sweep_exclude', 'mss_expiry_hours')
+    BROKER_PARAMS = ('be_trigger_r', 'be_buffer_r', 'partial_r', 'partial_pct')
+
+    def __init__(self, asset_class='GOLD', audit_charts=False, params=None, data=None, log_events=True):
+        """
+        params: overrides for DEFAULT_PARAMS.
+        data: preloaded frames {'m1': ..., 'm5': ..., 'h1': ...} (time-indexed; m5/h1 optional)
+              instead of reading the asset CSV.
+        log_events: False discards the per-trade event log (parallel sweeps).
+        """
         if asset_class not in self.ASSET_CONFIG:
             raise ValueError(f"Invalid Asset Class. Options: {list(self.ASSET_CONFIG.keys())}")
         
         config = self.ASSET_CONFIG[asset_class]
         self.symbol = config['symbol']
         data_path = config['file']
+        self.params = self.resolve_params(params)
         
         logger.info(f"Initializing Backtest for {asset_class} ({self.symbol})")
         
-        self.df_m1 = Loader.load_csv(data_path) # Master M1 Data
+        if data is not None:
+            self.df_m1 = data['m1']
+            self.df_m5 = data.get('m5')
+            self.df_h1 = data.get('h1')
+        else:
+            self.df_m1 = Loader.load_csv(data_path) # Master M1 Data
+            self.df_m5 = self.df_h1 = None
         
         # Initialize Broker with Asset Specifics
         self.broker = SimulatedBroker(
@@ -261,82 +344,138 @@ class BacktestEngine:
             slippage=config['slippage'],
             commission_type=config['commission_type'],
             commission_value=config['commission_value'],
-            lot_size=config['lot_size']
+            lot_size=config['lot_size'],
+            **{key: self.params[key] for key in self.BROKER_PARAMS}
         )
         
-        self.reporter = SilentReporter()
+        self.reporter = SilentReporter() if log_events else SilentReporter(filename=None)
         self.strategy = SMCLogic()
-        self.visualizer = Visualizer()
+        for key in self.STRATEGY_PARAMS:
+            setattr(self.strategy, key, self.params[key])
+        self.audit_charts = audit_charts
+        self.visualizer = Visualizer(export_dir="backtest_audit", renderer="fast") # One chart per trade: NumPy fast path
         
         # State
         self.htf_candles = pd.DataFrame()
         self.ltf_candles = pd.DataFrame()
         self.trades_taken = 0
+
+    @classmethod
+    def resolve_params(cls, params=None):
+        """DEFAULT_PARAMS + overrides. Unknown keys and impossible sweep windows raise (a typo would silently sweep nothing)."""
+        unknown = set(params or {}) - set(cls.DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown backtest params: {sorted(unknown)}. Options: {list(cls.DEFAULT_PARAMS.keys())}")
+        resolved = {**cls.DEFAULT_PARAMS, **(params or {})}
+        if resolved['sweep_exclude'] < 1:
+            raise ValueError(f"sweep_exclude must be >= 1 (got {resolved['sweep_exclude']}): the newest candle is the sweeper.")
+        if resolved['sweep_min_candles'] <= resolved['sweep_exclude']:
+            raise ValueError(f"sweep_min_candles ({resolved['sweep_min_candles']}) must exceed sweep_exclude "
+                             f"({resolved['sweep_exclude']}): no base range left.")
+        return resolved
+
+    def prepare_frames(self):
+        """H1/M5 resamples + M5 RSI (skips whatever was handed in via `data`)."""
+        if self.df_h1 is None or self.df_m5 is None:
+            logger.info("Pre-sampling HTF(1H) and LTF(5min) for lookup...")
+        if self.df_h1 is None:
+            self.df_h1 = Loader.resample_data(self.df_m1, '1H').set_index('time')
+        if self.df_m5 is None:
+            self.df_m5 = Loader.resample_data(self.df_m1, '5min').set_index('time')
         
-    def run(self):
+        # Calculate RSI on M5
+        if 'rsi' not in self.df_m5.columns:
+            self.df_m5['rsi'] = self.strategy.calculate_rsi(self.df_m5['close'], 14)
+        
+    def run(self, verbose=True):
+        """verbose=False: no progress output and no report/CSV files (read summary() instead)."""
         logger.info(f"Starting Backtest on {self.symbol}...")
         logger.info(f"Data range: {self.df_m1.index[0]} to {self.df_m1.index[-1]}")
         
-        logger.info("Pre-sampling HTF(1H) and LTF(5min) for lookup...")
-        self.df_h1 = Loader.resample_data(self.df_m1, '1H').set_index('time')
-        self.df_m5 = Loader.resample_data(self.df_m1, '5min').set_index('time')
-        
-        # Calculate RSI on M5
-        self.df_m5['rsi'] = self.strategy.calculate_rsi(self.df_m5['close'], 14)
+        self.prepare_frames()
+
+        # Strategy-facing frames ('time' column, built once): windows are iloc views into these
+        h1 = self.df_h1.reset_index()
+        m5 = self.df_m5.reset_index()
+
+        # Cursors: number of CLOSED H1/M5 bars at the close of every M1 bar (one searchsorted per TF).
+        # A bar only counts once its full period has elapsed - no peeking into the forming bar.
+        m1_times = self.df_m1.index.to_numpy()
+        m1_close = m1_times + np.timedelta64(1, 'm')
+        h1_cursor = np.searchsorted((h1['time'] + pd.Timedelta(hours=1)).to_numpy(), m1_close, side='right')
+        m5_cursor = np.searchsorted((m5['time'] + pd.Timedelta(minutes=5)).to_numpy(), m1_close, side='right')
+
+        m1_open = self.df_m1['open'].to_numpy(dtype=float)
+        m1_high = self.df_m1['high'].to_numpy(dtype=float)
+        m1_low = self.df_m1['low'].to_numpy(dtype=float)
+        m1_close_px = self.df_m1['close'].to_numpy(dtype=float)
+
+        m5_tracker = self.strategy.get_structure_tracker(self.symbol, 'M5') # Streaming swings: only new M5 bars ingested
         
         # Setup Variables
         sweep_state = {'swept': False}
         total_bars = len(self.df_m1)
+        last_h1, last_m5 = -1, -1
+        self.evaluations = 0
+        rsi_long, rsi_short = self.params['rsi_long'], self.params['rsi_short']
+        min_h1 = self.params['sweep_min_candles']
+        htf_window = max(55, min_h1 + self.params['sweep_exclude']) # 50-bar base range by default
         
-        print(f"Processing {total_bars} M1 bars...")
+        if verbose:
+            print(f"Processing {total_bars} M1 bars...")
         
-        for i, (current_time, row) in enumerate(self.df_m1.iterrows()):
-            if i % 10000 == 0:
+        for i in range(total_bars):
+            if verbose and i % 100000 == 0:
                 print(f"{int(i/total_bars*100)}%...", end="", flush=True)
                 
-            # 1. Update Broker (Check SL/TP on this M1 bar)
-            current_price_dict = {'time': current_time, 'open': row['open'], 'high': row['high'], 
-                                  'low': row['low'], 'close': row['close']}
-            self.broker.check_sl_tp(current_price_dict)
-            
-            # Context Lookup
-            valid_h1_mask = self.df_h1.index < current_time
-            valid_m5_mask = self.df_m5.index < current_time
-
-            # Retrieve recent history
-            # Optimization: slicing is faster than boolean install usually, but we need dynamic cutoff
-            # Actually, using searchsorted on index is fastest, but let's stick to simple masking for now
-            # To optimize: Maintain a pointer?
-            # For robustness, we'll keep the mask logic but maybe optimize later if too slow.
-            
-            htf_slice = self.df_h1[valid_h1_mask].tail(55).reset_index()
-            ltf_slice = self.df_m5[valid_m5_mask].tail(200).reset_index()
-            
-            if len(htf_slice) < 20 or len(ltf_slice) < 50:
+            # 1. Update Broker (Check SL/TP on this M1 bar) - only while something is open
+            current_price_dict = None
+            if self.broker.positions:
+                current_price_dict = self._m1_bar(i, m1_times, m1_open, m1_high, m1_low, m1_close_px)
+                self.broker.check_sl_tp(current_price_dict)
+
+            # 2. Event gate: the SMC rules only change when an M5 or H1 bar closes
+            h_count, m_count = h1_cursor[i], m5_cursor[i]
+            if h_count == last_h1 and m_count == last_m5:
+                continue
+            h1_closed = h_count != last_h1
+            last_h1, last_m5 = h_count, m_count
+
+            if h_count < min_h1 or m_count < 50:
                 continue
+
+            # Zero-copy windows over the precomputed frames
+            htf_slice = h1.iloc[max(0, h_count - htf_window):h_count]
+            ltf_slice = m5.iloc[max(0, m_count - 200):m_count]
+            self.ltf_candles = ltf_slice
+            self.evaluations += 1
+            if current_price_dict is None:
+                current_price_dict = self._m1_bar(i, m1_times, m1_open, m1_high, m1_low, m1_close_px)
                 
-            # --- BLOCK 2.1: HTF Sweep ---
-            new_sweep = self.strategy.detect_htf_sweeps(htf_slice)
-            if new_sweep['swept']:
-                sweep_state = new_sweep
+            # --- BLOCK 2.1: HTF Sweep (H1 close only) ---
+            if h1_closed:
+                new_sweep = self.strategy.detect_htf_sweeps(htf_slice, symbol=self.symbol)
+                if new_sweep['swept']:
+                    sweep_state = new_sweep
 
             # --- BLOCK 2.2: LTF MSS ---
             if sweep_state['swept']:
-                mss_result = self.strategy.detect_mss(ltf_slice, sweep_state['side'], sweep_state['sweep_candle_time'])
+                mss_result = self.strategy.detect_mss(ltf_slice, sweep_state['side'], sweep_state['sweep_candle_time'],
+                                                      tracker=m5_tracker, symbol=self.symbol)
                 
                 if mss_result['mss']:
                     # --- BLOCK 2.3: FVG Entry ---
                     direction = 'bullish' if sweep_state['side'] == 'sell_side' else 'bearish'
-                    fvgs = self.strategy.find_fvg(ltf_slice, direction, mss_result['leg_high'], mss_result['leg_low'])
+                    fvgs = self.strategy.find_fvg(ltf_slice, direction, mss_result['leg_high'], mss_result['leg_low'], symbol=self.symbol)
                     
                     if fvgs:
                         # RSI Confluence Check
-                        current_rsi = ltf_slice.iloc[-1]['rsi']
+                        current_rsi = ltf_slice['rsi'].iat[-1]
                         rsi_ok = False
                         if direction == 'bullish':
-                            if 40 <= current_rsi <= 70: rsi_ok = True
+                            if rsi_long[0] <= current_rsi <= rsi_long[1]: rsi_ok = True
                         else: # Bearish
-                            if 30 <= current_rsi <= 60: rsi_ok = True
+                            if rsi_short[0] <= current_rsi <= rsi_short[1]: rsi_ok = True
                             
                         if rsi_ok:
                              self.execute_trade(direction, fvgs[0], current_price_dict, sweep_state, mss_result, current_rsi)
@@ -344,24 +483,32 @@ class BacktestEngine:
                         # Reset Sweep
                         sweep_state = {'swept': False}
 
-        print("\nDone!")
-        self.generate_report()
+        logger.info(f"Strategy evaluated on {self.evaluations} bar closes ({total_bars} M1 bars).")
+        if verbose:
+            print("\nDone!")
+            self.generate_report()
+
+    @staticmethod
+    def _m1_bar(i, times, opens, highs, lows, closes):
+        return {'time': pd.Timestamp(times[i]), 'open': opens[i], 'high': highs[i],
+                'low': lows[i], 'close': closes[i]}
 
     def execute_trade(self, direction, fvg, current_bar, sweep, mss, rsi=None):
         # Calc SL/TP
+        buffer, rr = self.params['sl_buffer'], self.params['rr']
         if direction == 'bullish': # Long
-            sl = sweep['level'] - 0.0005 # Buffer (need to make asset specific?)
+            sl = sweep['level'] - buffer # Buffer (need to make asset specific?)
             entry = fvg['entry']
             risk = entry - sl
             if risk <= 0: return # Invalid
-            tp = entry + (risk * 2.0) # 1:2 RR
+            tp = entry + (risk * rr) # 1:2 RR by default
             side = 'buy'
         else: # Short
-            sl = sweep['level'] + 0.0005
+            sl = sweep['level'] + buffer
             entry = fvg['entry']
             risk = sl - entry
             if risk <= 0: return
-            tp = entry - (risk * 2.0)
+            tp = entry - (risk * rr)
             side = 'sell'
             
         # Position Size (Fixed Risk $100)
@@ -377,20 +524,54 @@ class BacktestEngine:
         self.trades_taken += 1
         
         # Audit Image (Optional)
-        # ... logic for visualizer ...
+        if self.audit_charts:
+            audit_zones = {
+                'trade': {'entry': entry, 'sl': sl, 'tp': tp},
+                'sweeps': [{'price': sweep['level']}],
+                'mss': [{'level': mss.get('level')}]
+            }
+            self.visualizer.generate_chart(self.ltf_candles.tail(100), self.symbol, zones=audit_zones,
+                                           filename=f"audit_{self.symbol}_{self.trades_taken}.png")
+
+    def summary(self):
+        """Headline metrics for one run (a row of the sweep table). Partial closes count with their position."""
+        trades = pd.DataFrame(self.broker.trade_history)
+        result = {'trades': 0, 'net_pnl': 0.0, 'win_rate': 0.0, 'profit_factor': 0.0,
+                  'avg_pnl': 0.0, 'max_drawdown': 0.0, 'final_balance': self.broker.balance}
+        if trades.empty:
+            return result
+
+        pnl = trades.groupby('id', sort=False)['pnl'].sum()
+        gross_win = pnl[pnl > 0].sum()
+        gross_loss = -pnl[pnl <= 0].sum()
+        equity = np.concatenate([[0.0], trades['pnl'].cumsum().to_numpy()]) # Close order
+        result.update(
+            trades=len(pnl),
+            net_pnl=pnl.sum(),
+            win_rate=(pnl > 0).mean() * 100,
+            profit_factor=gross_win / gross_loss if gross_loss > 0 else (float('inf') if gross_win > 0 else 0.0),
+            avg_pnl=pnl.mean(),
+            max_drawdown=(np.maximum.accumulate(equity) - equity).max()
+        )
+        return result
 
     def generate_report(self):
+        # Detector rejection stats (why setups did NOT form)
+        rej_file = self.strategy.rejections.to_csv(f"backtest_rejections_{self.symbol}.csv")
+        if rej_file: print(f"Rejection stats saved to {rej_file}")
+
         trades = pd.DataFrame(self.broker.trade_history)
         if trades.empty:
             print("No trades generated.")
             return
             
-        total_trades = len(trades)
-        wins = trades[trades['pnl'] > 0]
-        losses = trades[trades['pnl'] <= 0]
+        position_pnl = trades.groupby('id', sort=False)['pnl'].sum() # Partial closes fold into their position
+        total_trades = len(position_pnl)
+        wins = position_pnl[position_pnl > 0]
+        losses = position_pnl[position_pnl <= 0]
         
         win_rate = len(wins) / total_trades * 100 if total_trades > 0 else 0
-        net_pnl = trades['pnl'].sum()
+        net_pnl = position_pnl.sum()
         
         report = f"""
         === BACKTEST REPORT ===
@@ -398,8 +579,8 @@ class BacktestEngine:
         Total Trades: {total_trades}
         Net PnL: ${net_pnl:.2f}
         Win Rate: {win_rate:.1f}%
-        Avg Win: ${wins['pnl'].mean():.2f} if not wins.empty else 0
-        Avg Loss: ${losses['pnl'].mean():.2f} if not losses.empty else 0
+        Avg Win: ${wins.mean():.2f} if not wins.empty else 0
+        Avg Loss: ${losses.mean():.2f} if not losses.empty else 0
         Final Balance: ${self.broker.balance:.2f}
         =======================
         """
@@ -417,12 +598,13 @@ if __name__ == "__main__":
     print("Available Assets: GOLD, FOREX, CRYPTO")
     
     asset_choice = 'GOLD' # Default
-    if len(sys.argv) > 1:
-        asset_choice = sys.argv[1].upper()
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if args:
+        asset_choice = args[0].upper()
         
     try:
-        engine = BacktestEngine(asset_choice)
+        engine = BacktestEngine(asset_choice, audit_charts='--audit' in sys.argv)
         engine.run()
     except Exception as e:
         print(f"Error: {e}")
-        print("Usage: python backtest_module.py [GOLD|FOREX|CRYPTO]")
+        print("Usage: python backtest_module.py [GOLD|FOREX|CRYPTO] [--audit]")
@@ -0,0 +1,226 @@
+"""
+Parallel parameter sweep for the backtester.
+
+    python backtest_sweep.py GOLD                                 # DEFAULT_GRID
+    python backtest_sweep.py GOLD rr=1.5,2,3 rsi_long=40:70,30:80  # custom grid
+    python backtest_sweep.py GOLD --random 50 --seed 7            # random search over DEFAULT_SPACE
+    python backtest_sweep.py GOLD --workers 4 --sort profit_factor --top 20
+
+The CSV is loaded and resampled once. The M1/M5/H1 arrays are published in shared
+memory and each worker process builds zero-copy DataFrames over them, so a run only
+pays for its own event loop. Results are ranked and saved to sweep_results_<SYMBOL>.csv.
+Parameter names: BacktestEngine.DEFAULT_PARAMS.
+"""
+import ast
+import itertools
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest_module import BacktestEngine
+
+logger = logging.getLogger("BacktestSweep")
+
+class Uniform:
+    """Continuous range for random search (values rounded to `digits`)."""
+    def __init__(self, low, high, digits=2):
+        self.low = low
+        self.high = high
+        self.digits = digits
+
+    def sample(self, rng):
+        return round(rng.uniform(self.low, self.high), self.digits)
+
+    def __repr__(self):
+        return f"Uniform({self.low}, {self.high})"
+
+DEFAULT_GRID = {
+    'rr': [1.5, 2.0, 2.5, 3.0],
+    'sweep_min_wick': [0.1, 0.2],
+    'mss_expiry_hours': [4.0, 8.0],
+    'be_trigger_r': [None, 1.5]
+}
+
+DEFAULT_SPACE = {
+    'rr': Uniform(1.5, 3.5),
+    'sweep_min_wick': Uniform(0.05, 0.4),
+    'sweep_exclude': [3, 5, 8],
+    'mss_expiry_hours': Uniform(2.0, 12.0),
+    'rsi_long': [(40, 70), (35, 75), (30, 80)],
+    'rsi_short': [(30, 60), (25, 65), (20, 70)],
+    'be_trigger_r': [None, 1.0, 1.5],
+    'partial_r': [None, 1.5, 2.0]
+}
+
+FRAME_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'rsi')
+
+def grid_search(space):
+    """Every combination of the listed values."""
+    keys = list(space)
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+def random_search(space, samples, seed=None):
+    """`samples` draws: lists pick one value, Uniform ranges draw a float."""
+    rng = random.Random(seed)
+    for _ in range(samples):
+        yield {k: v.sample(rng) if isinstance(v, Uniform) else rng.choice(v) for k, v in space.items()}
+
+# --- Shared memory ---
+def publish_frames(frames):
+    """
+    {name: time-indexed DataFrame} -> (blocks, spec). Each frame becomes two blocks:
+    int64 timestamps + a float64 (rows x columns) matrix. The caller owns the blocks
+    (close() + unlink() when the pool is done).
+    """
+    blocks, spec = [], {}
+    for name, df in frames.items():
+        columns = [c for c in FRAME_COLUMNS if c in df.columns]
+        parts = {
+            'times': df.index.to_numpy(dtype='datetime64[ns]').view('int64'),
+            'values': df[columns].to_numpy(dtype=np.float64)
+        }
+        entry = {'columns': columns}
+        for part, arr in parts.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+            blocks.append(shm)
+            entry[part] = (shm.name, arr.shape, arr.dtype.str)
+        spec[name] = entry
+    return blocks, spec
+
+def attach_frames(spec):
+    """spec -> ({name: DataFrame over the shared buffers}, blocks). Arrays are read-only."""
+    frames, blocks = {}, []
+    for name, entry in spec.items():
+        arrays = {}
+        for part in ('times', 'values'):
+            shm_name, shape, dtype = entry[part]
+            shm = shared_memory.SharedMemory(name=shm_name)
+            blocks.append(shm)
+            arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            arr.flags.writeable = False
+            arrays[part] = arr
+        index = pd.DatetimeIndex(arrays['times'].view('datetime64[ns]'), name='time')
+        frames[name] = pd.DataFrame(arrays['values'], index=index, columns=entry['columns'], copy=False)
+    return frames, blocks
+
+# --- Worker ---
+_worker_frames = None
+_worker_blocks = None # Keeps the mappings alive for the life of the worker
+
+def _init_worker(spec):
+    global _worker_frames, _worker_blocks
+    logging.getLogger().setLevel(logging.WARNING) # Per-run INFO lines from N workers are just noise
+    _worker_frames, _worker_blocks = attach_frames(spec)
+
+def _run_one(asset_class, params):
+    started = time.perf_counter()
+    engine = BacktestEngine(asset_class, params=params, data=_worker_frames, log_events=False)
+    engine.run(verbose=False)
+    return {**params, **engine.summary(), 'evaluations': engine.evaluations,
+            'seconds': round(time.perf_counter() - started, 2)}
+
+# --- Driver ---
+def run_sweep(asset_class, combos, workers=None, sort_by='net_pnl'):
+    """Runs every param dict in `combos` across a process pool -> ranked DataFrame."""
+    combos = list(combos)
+    for params in combos:
+        BacktestEngine.resolve_params(params) # Fail before spawning anything
+    if not combos:
+        raise ValueError("Empty search space.")
+
+    base = BacktestEngine(asset_class, log_events=False)
+    base.prepare_frames() # Resample + RSI once, shared by every run
+    blocks, spec = publish_frames({'m1': base.df_m1, 'm5': base.df_m5, 'h1': base.df_h1})
+
+    workers = workers or os.cpu_count() or 1
+    print(f"Sweeping {len(combos)} parameter sets on {base.symbol} with {workers} workers...")
+    rows = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(spec,)) as pool:
+            futures = {pool.submit(_run_one, asset_class, params): params for params in combos}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    rows.append(future.result())
+                except Exception as e:
+                    logger.error(f"Sweep run failed for {futures[future]}: {e}")
+                    rows.append({**futures[future], 'error': str(e)})
+                print(f"\r{done}/{len(combos)} runs", end="", flush=True)
+        print()
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    return rank_results(rows, sort_by)
+
+def rank_results(rows, sort_by='net_pnl'):
+    table = pd.DataFrame(rows)
+    if sort_by in table.columns:
+        table = table.sort_values(sort_by, ascending=(sort_by == 'max_drawdown'), na_position='last', kind='stable')
+    table = table.reset_index(drop=True)
+    table.index = table.index + 1
+    table.index.name = 'rank'
+    return table
+
+def _parse_value(text):
+    """'none' -> None, '40:70' -> (40, 70), else a Python literal (falls back to the raw string)."""
+    if text.lower() == 'none':
+        return None
+    if ':' in text:
+        return tuple(_parse_value(part) for part in text.split(':'))
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+def _parse_grid(args):
+    grid = {}
+    for arg in args:
+        key, _, values = arg.partition('=')
+        grid[key] = [_parse_value(v) for v in values.split(',')]
+    return grid
+
+def _option(flag, default=None, cast=str):
+    if flag in sys.argv:
+        return cast(sys.argv[sys.argv.index(flag) + 1])
+    return default
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    option_values = {sys.argv[i + 1] for i, a in enumerate(sys.argv[:-1]) if a.startswith('--')}
+    positional = [a for a in sys.argv[1:] if not a.startswith('--') and a not in option_values]
+    asset_choice = positional[0].upper() if positional and '=' not in positional[0] else 'GOLD'
+    grid_args = [a for a in positional if '=' in a]
+
+    samples = _option('--random', cast=int)
+    if samples:
+        combos = random_search(DEFAULT_SPACE, samples, seed=_option('--seed', cast=int))
+    else:
+        combos = grid_search(_parse_grid(grid_args) if grid_args else DEFAULT_GRID)
+
+    sort_by = _option('--sort', 'net_pnl')
+    try:
+        results = run_sweep(asset_choice, combos, workers=_option('--workers', cast=int), sort_by=sort_by)
+    except Exception as e:
+        print(f"Error: {e}")
+        print("Usage: python backtest_sweep.py [GOLD|FOREX|CRYPTO] [key=v1,v2 ...] [--random N] [--seed S] "
+              "[--workers W] [--sort net_pnl|profit_factor|win_rate|max_drawdown] [--top N]")
+        sys.exit(1)
+
+    output_file = f"sweep_results_{BacktestEngine.ASSET_CONFIG[asset_choice]['symbol']}.csv"
+    results.to_csv(output_file)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(results.head(_option('--top', 10, int)).to_string())
+    print(f"Ranked results saved to {output_file}")
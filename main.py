@@ -1,28 +1,34 @@
 import os
 import time
+import functools
 import logging
 import json
 from datetime import datetime
 from dotenv import load_dotenv
 
 from src.communication.telegram_bot import TelegramBot
+from src.communication.telegram_service import TelegramService, PRIORITY_CRITICAL, PRIORITY_HIGH
 from src.bridges.mt5_bridge import MT5Bridge
 from src.bridges.bybit_bridge import BybitBridge
 from src.strategy.session_manager import SessionManager
 from src.utils.state_manager import StateManager
+from src.utils.candle_cache import CandleCache
+from src.utils.bar_scheduler import BarCloseScheduler
+from src.utils.scan_orchestrator import ScanOrchestrator
 from src.strategy.trade_manager import TradeManager
 from src.risk.position_sizer import PositionSizer
 from src.strategy.smc_logic import SMCLogic
 from src.risk.guardrails import RiskGuardrails
 from src.utils.visualizer import Visualizer
+from src.utils.chart_service import ChartRenderService
 from src.communication.telegram_handler import TelegramErrorHandler
 
 # --- HELPER: Telegram Command Processing ---
 def process_telegram_updates(bot, last_id, context):
     """Checks for and executes Telegram commands (High Responsive)"""
     try:
-        # Use short timeout for updates inside scan loop
-        updates = bot.get_updates(offset=last_id + 1, timeout=0.1) 
+        # Non-blocking: the Telegram service long-polls on its own thread and queues updates
+        updates = bot.get_updates(offset=last_id + 1, timeout=0)
         if updates:
             for update in updates:
                 last_id = update['update_id']
@@ -45,12 +51,12 @@ def process_telegram_updates(bot, last_id, context):
                         resp = bot.handle_command(command, args, context)
                         if resp:
                             chat_id = update['message']['chat']['id']
-                            bot.send_message(resp, chat_id=chat_id)
+                            bot.send_message(resp, chat_id=chat_id, priority=PRIORITY_HIGH)
                     except Exception as cmd_error:
                         # Report Command Failure to User
                         logger.error(f"Command '{command}' crashed: {cmd_error}", exc_info=True)
                         chat_id = update['message']['chat']['id']
-                        bot.send_message(f"❌ **COMMAND FAILED**\nError: `{str(cmd_error)}`", chat_id=chat_id)
+                        bot.send_message(f"❌ **COMMAND FAILED**\nError: `{str(cmd_error)}`", chat_id=chat_id, priority=PRIORITY_HIGH)
 
         return last_id
     except Exception as e:
@@ -87,14 +93,16 @@ class MockTelegramBot:
         self.running = True
     def get_updates(self, offset=None, timeout=10):
         return []
-    def send_message(self, message, chat_id=None):
+    def send_message(self, message, chat_id=None, priority=None):
         logger.info(f"[MOCK TELEGRAM] >> {message[:50]}...")
-    def send_signal(self, message):
+    def send_signal(self, message, priority=None):
          logger.info(f"[MOCK SIGNAL] >> {message[:50]}...")
-    def send_photo(self, photo_path, caption=""):
+    def send_photo(self, photo_path, caption="", priority=None):
         logger.info(f"[MOCK PHOTO] >> {photo_path} | {caption}")
     def handle_command(self, command, args, context):
         return f"Mock Response to {command}"
+    def stop(self, flush_timeout=0):
+        pass
 
 def get_bot_version():
     """Retrieves the current version (Git Short Hash)."""
@@ -151,13 +159,21 @@ def main():
     if tele_offline:
         bot = MockTelegramBot()
     else:
-        bot = TelegramBot()
+        # Long polling + outbound priority queue on background threads
+        bot = TelegramService(TelegramBot()).start()
     state_manager = StateManager()
     session_manager = SessionManager()
     smc = SMCLogic()
     risk = RiskGuardrails(state_manager)
     visualizer = Visualizer()
+    chart_service = ChartRenderService(bot) # Charts render in a worker process, delivered when ready
     position_sizer = PositionSizer()
+    candle_cache = CandleCache() # One fetch per (bridge, symbol, timeframe) per cycle
+    scheduler = BarCloseScheduler() # SMC rules only change on bar close (H1 sweep, M5 MSS/FVG)
+    htf_state = {} # {symbol: {'sweep': dict, 'candles': DataFrame}} from the last H1 close
+    MANAGEMENT_INTERVAL = 3 # Seconds: tick-driven trade management cadence
+    # Concurrent per-symbol pipelines: lane = bridge (MT5 IPC serial, Bybit HTTP 4-wide)
+    orchestrator = ScanOrchestrator(lane_limits={'mt5': 1, 'bybit': 4}, timeout=20.0)
 
     # Initialize Proactive Error Alerting
     error_handler = TelegramErrorHandler(bot)
@@ -167,7 +183,8 @@ def main():
     bot.send_message(f"🚀 System Initializing: The Ekbottlebeer A+ Operator\n📦 **Version**: `{VERSION}`")
 
     # Connect Bridges
-    mt5_bridge = MT5Bridge()
+    forex_symbols = sorted({sym for cfg in session_manager.sessions.values() for sym in cfg['symbols']})
+    mt5_bridge = MT5Bridge(symbols=forex_symbols) # Symbol map resolved once at connect
     if mt5_bridge.connect():
         bot.send_message("✅ MT5 Bridge Connected")
     else:
@@ -175,11 +192,415 @@ def main():
         
     bybit_bridge = BybitBridge()
     bot.send_message("✅ Bybit Bridge Initialized")
+    if bybit_bridge.session and str(os.getenv("BYBIT_STREAM", "True")).upper() == "TRUE":
+        # Push klines/ticks over WebSocket; REST remains the fallback while it's down
+        bybit_bridge.start_stream(session_manager.crypto_symbols, intervals=('5', '60'))
     
     # Initialize Trade Managers for each bridge
     mt5_trade_manager = TradeManager(mt5_bridge, state_manager, smc_logic=smc, telegram_bot=bot)
     bybit_trade_manager = TradeManager(bybit_bridge, state_manager, smc_logic=smc, telegram_bot=bot)
 
+    # --- Per-Symbol Pipelines (run concurrently by the ScanOrchestrator) ---
+    def check_reaction(setup):
+        """Pending setup: expiry + reaction candle on M5 close -> market execution."""
+        symbol = setup['symbol']
+        bridge = bybit_bridge if symbol in session_manager.crypto_symbols else mt5_bridge
+        
+        # 1. Expiration (2h)
+        try:
+            created_ts = datetime.fromisoformat(setup['created_at'])
+            if (datetime.now() - created_ts).total_seconds() > 7200:
+                state_manager.remove_pending_setup(symbol)
+                return
+        except: pass
+
+        # 2. Check Reaction (once per M5 close, on the bar that just closed)
+        if not scheduler.is_due(symbol, 'REACTION'): return
+        ltf_tf = '5' if bridge == bybit_bridge else 5
+        candles = candle_cache.get_candles(bridge, symbol, ltf_tf, 2)
+        if candles is None or len(candles) < 2: return
+        scheduler.done(symbol, 'REACTION')
+        
+        last = candles.iloc[-2]
+        entry_level = setup['entry']
+        direction = setup['direction']
+        triggered = False
+        
+        # LOGIC: Tap + Reject + Color
+        if direction == 'bullish':
+             if last['low'] <= entry_level:
+                 if last['close'] > entry_level and last['close'] > last['open']:
+                     triggered = True
+                 else:
+                     # MISSED LOG: Tapped but failed validation
+                     logger.info(f"⏳ {symbol} TAP: {last['low']:.5f} <= {entry_level:.5f}, but Close {last['close']:.5f} not valid (Color/Reject)")
+             
+             # Invalidation: Close below SL
+             if last['close'] < setup['sl']:
+                 state_manager.remove_pending_setup(symbol)
+                 return
+        else:
+             if last['high'] >= entry_level:
+                 if last['close'] < entry_level and last['close'] < last['open']:
+                     triggered = True
+                 else:
+                     # MISSED LOG
+                     logger.info(f"⏳ {symbol} TAP: {last['high']:.5f} >= {entry_level:.5f}, but Close {last['close']:.5f} not valid")
+
+             # Invalidation
+             if last['close'] > setup['sl']:
+                 state_manager.remove_pending_setup(symbol)
+                 return
+                 
+        if triggered:
+             # EXECUTE MARKET ORDER
+             balance = bridge.get_balance()
+             inst_info = bridge.get_instrument_info(symbol)
+             units = position_sizer.calculate_position_size(balance, setup['entry'], setup['sl'], symbol, instrument_info=inst_info)
+             
+             if units > 0:
+                 logger.info(f"⚡ REACTION CONFIRMED: {symbol}. FIRING MARKET ORDER.")
+                 res_ticket = None
+                 if bridge == bybit_bridge:
+                     side = 'Buy' if direction == 'bullish' else 'Sell'
+                     res_ticket = bridge.place_order(symbol, side, 'Market', units, stop_loss=setup['sl'], take_profit=setup['tp'])
+                 else:
+                     o_type = 'market_buy' if direction == 'bullish' else 'market_sell'
+                     res_ticket = bridge.place_limit_order(symbol, o_type, 0.0, setup['sl'], setup['tp'], units)
+                 
+                 if res_ticket:
+                     bot.send_message(f"⚡ **REACTION HIT**: Executed Market Order on {symbol}\nTicket: `{res_ticket}`", priority=PRIORITY_CRITICAL)
+                     
+                     # VISUAL VERIFICATION: Send Chart
+                     try:
+                         # Re-fetch context for chart
+                         chart_5m = candle_cache.get_candles(bridge, symbol, ltf_tf, 100)
+                         chart_zones = {
+                             'trade': {
+                                 'entry': setup['entry'], 'sl': setup['sl'], 'tp': setup['tp']
+                             }
+                         }
+                         
+                         chart_service.render_and_send(chart_5m, symbol, zones=chart_zones, filename=f"trade_{res_ticket}.png",
+                                                       caption=f"📸 **Verification**: {symbol} Entry\nTicket: `{res_ticket}`")
+                     except Exception as e:
+                         logger.error(f"Failed to send verification chart: {e}")
+                         
+                     state_manager.remove_pending_setup(symbol)
+                 else:
+                     # Retry logic (Half Risk)
+                     half_units = units * 0.5
+                     if bridge == bybit_bridge:
+                         res_ticket = bridge.place_order(symbol, side, 'Market', half_units, stop_loss=setup['sl'], take_profit=setup['tp'])
+                     else:
+                         res_ticket = bridge.place_limit_order(symbol, o_type, 0.0, setup['sl'], setup['tp'], half_units)
+                     
+                     if res_ticket:
+                         bot.send_message(f"⚠️ **RESCUE**: Executed Half Risk on {symbol}", priority=PRIORITY_CRITICAL)
+                         state_manager.remove_pending_setup(symbol)
+             else:
+                 bot.send_message(f"⚠️ Low Balance for Reaction Trade: {symbol}")
+                 state_manager.remove_pending_setup(symbol)
+
+    def run_symbol_pipeline(symbol, watchlist):
+        """
+        One symbol's full pass: pending reaction -> manage active trades -> hunt.
+        Returns the scan status ('active', 'paused', 'news', 'spread' or None) for the loop summary.
+        """
+        status = None
+        setup = state_manager.get_pending_setup(symbol)
+        if setup:
+            check_reaction(setup)
+
+        # Bridge Selection
+        bridge = None
+        trade_mgr = None
+        if symbol in session_manager.crypto_symbols:
+            bridge = bybit_bridge
+            trade_mgr = bybit_trade_manager
+        else:
+            bridge = mt5_bridge
+            trade_mgr = mt5_trade_manager
+
+        # Only proceed if bridge connected/active (Stub check)
+        
+        # --- A. Manage Active Trades (Trailing, TP) ---
+        # Always run this regardless of session correctness
+        symbol_trades = state_manager.get_trades(symbol)
+        if symbol_trades:
+            # Fetch data needed for management
+            tick = bridge.get_tick(symbol)
+            
+            # optimized: Reuse LTF fetch if we are about to fetch it anyway?
+            # For safety, fetch fresh 5m candles for trailing logic
+            mt_tf = '5' if bridge == bybit_bridge else 5
+            mgmt_candles = candle_cache.get_candles(bridge, symbol, mt_tf, 10)
+            
+            if tick:
+                current_price = tick['bid'] # default to bid for check
+                for trade in symbol_trades:
+                    # Use Ask for Short closing? Simplify to mid or Bid for now.
+                    # Accurate: Long exits on Bid, Short exits on Ask.
+                    # price_to_check = tick['bid'] if trade['direction'] == 'long' else tick['ask'] # Correction: Long closes on Bid, Short on Ask. Correct.
+                    price_to_check = tick['bid'] if trade['direction'] == 'long' else tick['ask']
+                    trade_mgr.manage_active_trade(trade, price_to_check, ltf_candles=mgmt_candles,
+                                                  structure_tracker=smc.get_structure_tracker(symbol, mt_tf))
+            
+            # CRITICAL: If we have an active trade, DO NOT HUNT for new ones on this symbol.
+            # Prevent stacking/double entry.
+            return status
+
+        # --- B. Hunt for Setups (SMC Logic) ---
+        # Check Global Status
+        system_status = state_manager.state.get('system_status', 'active')
+        
+        # Check Granular Status
+        is_crypto = symbol in session_manager.crypto_symbols
+        market_status = state_manager.state.get('crypto_status', 'active') if is_crypto else state_manager.state.get('forex_status', 'active')
+        
+        # OLD SESSION KILLA REMOVED per user request.
+        # Asia hunting is back ON.
+        # if is_asia and not is_crypto: ... (Deleted)
+
+        # Scan Condition: 
+        # 1. Symbol in Session Watchlist
+        # 2. Global System Active
+        # 3. Specific Market Active
+        
+        if symbol not in watchlist: return status
+        
+        if system_status == 'paused' or market_status == 'paused':
+             return 'paused'
+        
+        # 1. Check News Filter
+        if not risk.check_news(symbol):
+            return 'news'
+            
+        # 1.5. Spread Protection (Crucial for Scalping)
+        # Fetch live tick first
+        tick_scan = bridge.get_tick(symbol)
+        if not tick_scan: return status
+        
+        spread = tick_scan['ask'] - tick_scan['bid']
+        
+        if not risk.check_spread(symbol, spread, is_crypto=is_crypto):
+             return 'spread'
+        
+        status = 'active'
+
+        # Bar-close gating: nothing to re-evaluate until the next M5 close (the checks
+        # above still run every cycle so the summary keeps counting/flagging the symbol)
+        if not scheduler.is_due(symbol, 'M5'): return status
+            
+        # 2. Fetch Data (HTF - 1H) + 3. Detect HTF Sweep (once per H1 close)
+        # MT5: 1H=16385, Bybit: '60'
+        if scheduler.is_due(symbol, 'H1') or symbol not in htf_state:
+            htf_tf = '60' if bridge == bybit_bridge else 16385
+            htf_candles = candle_cache.get_candles(bridge, symbol, htf_tf, 100)
+
+            if htf_candles is None or htf_candles.empty:
+                return status
+
+            htf_state[symbol] = {'sweep': smc.detect_htf_sweeps(htf_candles, symbol=symbol), 'candles': htf_candles}
+            scheduler.done(symbol, 'H1')
+
+        sweep = htf_state[symbol]['sweep']
+        htf_candles = htf_state[symbol]['candles']
+        
+        if not sweep['swept']:
+            # HUD v2: Detailed Status (RSI + Bias) for Neutral Assets
+            ltf_tf_scan = '5' if bridge == bybit_bridge else 5
+            ltf_scan_data = candle_cache.get_candles(bridge, symbol, ltf_tf_scan, 50)
+            
+            status_line = f"⏩ [NEUTRAL] Wait HTF Sweep"
+            rsi_val = 50.0
+            bias = "NEUTRAL"
+            
+            if ltf_scan_data is not None and not ltf_scan_data.empty:
+                try:
+                    rsi_val = smc.get_rsi_tracker(symbol, ltf_tf_scan).sync(ltf_scan_data)
+                    if rsi_val > 60: bias = "BULLISH"
+                    elif rsi_val < 40: bias = "BEARISH"
+                    
+                    status_line = f"{bias:<7} | RSI: {rsi_val:>4.1f} | Wait HTF Sweep"
+                except: pass
+            
+            # Persist for Dashboard
+            waiting_on = f"Sweep High: {sweep.get('htf_high', 0):.5f} / Low: {sweep.get('htf_low', 0):.5f}"
+            state_manager.update_scan_data(symbol, {
+                'bias': bias, 'rsi': rsi_val, 'status': "Scanning", 'waiting_on': waiting_on, 'checkpoint': 'SWEEP'
+            })
+            print(f"   📊 {symbol:<10} | {status_line}")
+            scheduler.done(symbol, 'M5') # No sweep: nothing for the LTF rules until the next close
+            return status
+        
+        # --- SWEEP DETECTED ---
+        if sweep['swept']:
+            side_name = "BEARISH (Short Setup)" if sweep['side'] == 'buy_side' else "BULLISH (Long Setup)"
+            
+            # 4. Drop to LTF (5m) for MSS
+            ltf_tf = '5' if bridge == bybit_bridge else 5
+            ltf_candles = candle_cache.get_candles(bridge, symbol, ltf_tf, 201)
+            if ltf_candles is None or len(ltf_candles) < 2: return status # Stays due: retried next pass
+            scheduler.done(symbol, 'M5')
+            # Gated once per close: evaluate the bar that just CLOSED, not the 2s-old forming one
+            closed_ltf = ltf_candles.iloc[:-1]
+
+            mss = smc.detect_mss(closed_ltf, sweep['side'], sweep['sweep_candle_time'],
+                                 tracker=smc.get_structure_tracker(symbol, ltf_tf), symbol=symbol)
+            
+            # Log MSS Failure reason
+            if not mss.get('mss', False):
+                reason = mss.get('reason', 'Wait MSS break')
+                trigger = mss.get('trigger_level', 0)
+                type_str = mss.get('type', 'cross')
+                
+                status_msg = f"⏱️ Wait MSS {type_str} {trigger:.5f}"
+                if mss.get('reject_code') == 'expired': status_msg = "❌ Setup Expired (>4h)"
+                
+                logger.info(f"   👀 {symbol:<10} | Sweep ✅ | {status_msg}")
+                state_manager.update_scan_data(symbol, {
+                    'bias': 'BULLISH' if sweep['side'] == 'sell_side' else 'BEARISH',
+                    'rsi': 0, 'status': "Sweep Confirmed", 'waiting_on': status_msg, 'checkpoint': 'MSS'
+                })
+                return status
+            
+            # --- MSS CONFIRMED ---
+            if mss.get('mss', False):
+                # Calculate RSI for confluence check
+                current_rsi = smc.get_rsi_tracker(symbol, ltf_tf).sync(closed_ltf)
+
+                # Filter Logic (Strictly Matches README Strategy)
+                rsi_ok = False
+                if sweep['side'] == 'buy_side': # We swept highs -> Bearish Bias (Short)
+                     # Strategy: RSI < 60 (Momentum) and > 30 (No Oversold)
+                     if (30 <= current_rsi <= 60): 
+                        rsi_ok = True
+                     else:
+                        logger.warning(f"   📉 {symbol:<10} | MSS ✅ | RSI WARNING: {current_rsi:.1f} (Ideal 30-60)")
+                else: # We swept lows -> Bullish Bias (Long)
+                     # Strategy: RSI > 40 (Momentum) and < 70 (No Overbought)
+                     if (40 <= current_rsi <= 70): 
+                        rsi_ok = True
+                     else:
+                        logger.warning(f"   📈 {symbol:<10} | MSS ✅ | RSI WARNING: {current_rsi:.1f} (Ideal 40-70)")
+                
+                # UPDATED RULE 4: RSI is PERMISSION ONLY. Structure Overrides.
+                # We do NOT continue/skip here. We just log the warning above.
+                # if not rsi_ok: continue <-- REMOVED
+                
+                # 5. Find FVG Entry (Premium/Discount Linked)
+                direction_bias = 'bearish' if sweep['side'] == 'buy_side' else 'bullish'
+                fvgs = smc.find_fvg(closed_ltf, direction_bias, mss['leg_high'], mss['leg_low'], symbol=symbol)
+                
+                if not fvgs:
+                    logger.info(f"   🔍 {symbol:<10} | MSS ✅ | RSI ✅ | Wait FVG in {direction_bias} zone")
+                    state_manager.update_scan_data(symbol, {
+                        'bias': direction_bias.upper(), 'rsi': current_rsi, 'status': "Wait FVG", 'waiting_on': "Formation in Prem/Disc", 'checkpoint': 'FVG'
+                    })
+                    return status
+                
+                if fvgs:
+                     fvg = fvgs[0]
+                     logger.info(f"💎 A+ SETUP: {symbol} {direction_bias.upper()} FVG @ {fvg['entry']}")
+                     
+                     # Dash: Update status for execution
+                     state_manager.update_scan_data(symbol, {
+                         'bias': direction_bias.upper(),
+                         'rsi': current_rsi,
+                         'status': "💎 FVG FOUND",
+                         'waiting_on': "Execution",
+                         'checkpoint': 'EXEC'
+                     })
+                
+                if fvgs:
+                    setup = fvgs[0] # Take the most recent/valid FVG
+                    entry_price = setup['entry']
+                    
+                     # Stop Loss Calculation
+                    # Rule: SL at the Sweep Candle High/Low (Pivot)
+                    # mss['leg_high'] is the high of the breakdown move for bearish
+                    # For Bearish: SL should be the High that caused the low.
+                    sl_price = mss['leg_high'] if direction_bias == 'bearish' else mss['leg_low']
+                    
+                    # SAFETY BUFFER (Optional, per user request "small buffer for fees" logic elsewhere)
+                    # For SL, exact pivot is standard SMC.
+                    
+                    # TP Calculation: 1:2 Minimum
+                    risk_dist = abs(entry_price - sl_price)
+                    tp_price = entry_price - (2 * risk_dist) if direction_bias == 'bearish' else entry_price + (2 * risk_dist)
+                    
+                    # 6. Risk Check & Execution
+                    balance = bridge.get_balance()
+                    
+                    # Calculate Stats
+                    rr_ratio = abs(tp_price - entry_price) / risk_dist if risk_dist > 0 else 0
+                    
+                    # Construct Signal
+                    signal_msg = (
+                        f"💎 **A+ SETUP FOUND** 💎\n\n"
+                        f"📜 **Symbol**: `{symbol}`\n"
+                        f"↕️ **Side**: {direction_bias.upper()}\n"
+                        f"📉 **Entry**: `{entry_price:.5f}`\n"
+                        f"🛑 **Stop Loss**: `{sl_price:.5f}`\n"
+                        f"🎯 **Take Profit**: `{tp_price:.5f}`\n\n"
+                        f"⚖️ **R:R**: `1:{rr_ratio:.2f}`\n"
+                        f"📅 **Time**: `{datetime.now().strftime('%H:%M UTC')}`"
+                    )
+                    
+                    bot.send_signal(signal_msg)
+                    
+                    # --- 7. AUTO-EVIDENCE: Generate & Send Chart ---
+                    try:
+                        h1_high = htf_candles['high'].tail(24).max()
+                        h1_low = htf_candles['low'].tail(24).min()
+                        
+                        evidence_zones = {
+                            'sweeps': [{'price': sweep['level'], 'desc': sweep['desc']}],
+                            'mss': [{'time': ltf_candles.iloc[-1]['time'], 'price': mss['level']}],
+                            'fvg': [setup],
+                            'htf': {
+                                '1H_high': h1_high,
+                                '1H_low': h1_low
+                            },
+                            'trade': {
+                                'entry': entry_price,
+                                'sl': sl_price,
+                                'tp': tp_price
+                            }
+                        }
+                        # Generate Chart (worker process; photo follows the signal when ready)
+                        caption = f"📸 **Trade Evidence**: {symbol} {direction_bias.upper()}\nEntry: {entry_price} | SL: {sl_price} | TP: {tp_price}"
+                        chart_service.render_and_send(ltf_candles, symbol, zones=evidence_zones,
+                                                      filename=f"evidence_{symbol}_{int(time.time())}.png", caption=caption)
+                    except Exception as e_vis:
+                        logger.error(f"Failed to generate auto-evidence chart: {e_vis}")
+
+                    if position_sizer.check_risk_reward(entry_price, sl_price, tp_price):
+                        # NEW EXECUTION LOGIC: Wait for Reaction
+                        logger.info(f"💎 A+ SETUP QUEUED for {symbol}. Waiting for Reaction Candle...")
+                        
+                        setup_data = {
+                            'symbol': symbol,
+                            'direction': direction_bias, # 'bullish' or 'bearish'
+                            'entry': entry_price,
+                            'sl': sl_price,
+                            'tp': tp_price,
+                            'created_at': datetime.now().isoformat(),
+                            'fvg_bottom': setup.get('bottom', entry_price),
+                            'fvg_top': setup.get('top', entry_price)
+                        }
+                        state_manager.add_pending_setup(setup_data)
+                        
+                        bot.send_message(
+                            f"⏳ **SETUP QUEUED**: {symbol} {direction_bias.upper()}\n"
+                            f"Waiting for **Reaction Candle** at `{entry_price:.5f}`..."
+                        )
+                    else:
+                        bot.send_message(f"⚠️ **RR INVALID**: {symbol} setup found but RR < 2.0 (Calculated: {rr_ratio:.2f})") 
+
+        return status
+
     # 4. Main Loop
     logger.info("System initialized. Entering main loop...")
     last_heartbeat = time.time()
@@ -188,6 +609,7 @@ def main():
     try:
         while True:
             current_time = time.time()
+            candle_cache.new_cycle()
             
             # --- 1. Session & Risk Management ---
              # --- 0. Check Requests (High Priority) ---
@@ -197,14 +619,18 @@ def main():
                 'session_manager': session_manager,
                 'risk_manager': risk,
                 'visualizer': visualizer,
+                'chart_service': chart_service,
                 'mt5_bridge': mt5_bridge,
                 'bybit_bridge': bybit_bridge,
                 'smc': smc,
                 'position_sizer': position_sizer,
                 'logger_buffer': log_buffer,
                 'mt5_trade_manager': mt5_trade_manager,
-                'bybit_trade_manager': bybit_trade_manager
+                'bybit_trade_manager': bybit_trade_manager,
+                'candle_cache': candle_cache
             }
+            # Single poll site, outside the scan cycle: /close, /chart, /panic, /test etc. call
+            # mt5_bridge directly and must not overlap the serial 'mt5' lane
             last_update_id = process_telegram_updates(bot, last_update_id, command_context)
 
             # --- 1. Session & Risk Management ---
@@ -226,7 +652,7 @@ def main():
             watchlist = set(session_info['watchlist']) # Convert to set for lookup speed
             
             # Identify all symbols with active trades
-            active_trade_symbols = {t['symbol'] for t in active_trades}
+            active_trade_symbols = state_manager.trade_symbols()
             
 
             
@@ -236,402 +662,21 @@ def main():
             # Combine loop: Watchlist (Hunting) + Active Trades (Managing)
             all_monitored_symbols = watchlist.union(active_trade_symbols)
             
-            # --- 1.5. Manage Pending Setups (Reaction Mode) ---
-            pending_setups = state_manager.state.get('pending_setups', [])
-            for setup in pending_setups[:]: # Copy to iterate
-                symbol = setup['symbol']
-                bridge = bybit_bridge if symbol in session_manager.crypto_symbols else mt5_bridge
-                
-                # 1. Expiration (2h)
-                try:
-                    created_ts = datetime.fromisoformat(setup['created_at'])
-                    if (datetime.now() - created_ts).total_seconds() > 7200:
-                        state_manager.remove_pending_setup(symbol)
-                        continue
-                except: pass
-
-                # 2. Check Reaction
-                ltf_tf = '5' if bridge == bybit_bridge else 5
-                candles = bridge.get_candles(symbol, timeframe=ltf_tf, num_candles=2)
-                if candles is None or candles.empty: continue
-                
-                last = candles.iloc[-1]
-                entry_level = setup['entry']
-                direction = setup['direction']
-                triggered = False
-                
-                # LOGIC: Tap + Reject + Color
-                if direction == 'bullish':
-                     if last['low'] <= entry_level:
-                         if last['close'] > entry_level and last['close'] > last['open']:
-                             triggered = True
-                         else:
-                             # MISSED LOG: Tapped but failed validation
-                             logger.info(f"⏳ {symbol} TAP: {last['low']:.5f} <= {entry_level:.5f}, but Close {last['close']:.5f} not valid (Color/Reject)")
-                     
-                     # Invalidation: Close below SL
-                     if last['close'] < setup['sl']:
-                         state_manager.remove_pending_setup(symbol)
-                         continue
-                else:
-                     if last['high'] >= entry_level:
-                         if last['close'] < entry_level and last['close'] < last['open']:
-                             triggered = True
-                         else:
-                             # MISSED LOG
-                             logger.info(f"⏳ {symbol} TAP: {last['high']:.5f} >= {entry_level:.5f}, but Close {last['close']:.5f} not valid")
-
-                     # Invalidation
-                     if last['close'] > setup['sl']:
-                         state_manager.remove_pending_setup(symbol)
-                         continue
-                         
-                if triggered:
-                     # EXECUTE MARKET ORDER
-                     balance = bridge.get_balance()
-                     inst_info = bridge.get_instrument_info(symbol)
-                     units = position_sizer.calculate_position_size(balance, setup['entry'], setup['sl'], symbol, instrument_info=inst_info)
-                     
-                     if units > 0:
-                         logger.info(f"⚡ REACTION CONFIRMED: {symbol}. FIRING MARKET ORDER.")
-                         res_ticket = None
-                         if bridge == bybit_bridge:
-                             side = 'Buy' if direction == 'bullish' else 'Sell'
-                             res_ticket = bridge.place_order(symbol, side, 'Market', units, stop_loss=setup['sl'], take_profit=setup['tp'])
-                         else:
-                             o_type = 'market_buy' if direction == 'bullish' else 'market_sell'
-                             res_ticket = bridge.place_limit_order(symbol, o_type, 0.0, setup['sl'], setup['tp'], units)
-                         
-                         if res_ticket:
-                             bot.send_message(f"⚡ **REACTION HIT**: Executed Market Order on {symbol}\nTicket: `{res_ticket}`")
-                             
-                             # VISUAL VERIFICATION: Send Chart
-                             try:
-                                 # Re-fetch context for chart
-                                 chart_5m = bridge.get_candles(symbol, timeframe=ltf_tf, num_candles=100)
-                                 chart_zones = {
-                                     'trade': {
-                                         'entry': setup['entry'], 'sl': setup['sl'], 'tp': setup['tp']
-                                     }
-                                 }
-                                 
-                                 img = visualizer.generate_chart(chart_5m, symbol, zones=chart_zones, filename=f"trade_{res_ticket}.png")
-                                 if img:
-                                     bot.send_photo(img, caption=f"📸 **Verification**: {symbol} Entry\nTicket: `{res_ticket}`")
-                             except Exception as e:
-                                 logger.error(f"Failed to send verification chart: {e}")
-                                 
-                             state_manager.remove_pending_setup(symbol)
-                         else:
-                             # Retry logic (Half Risk)
-                             half_units = units * 0.5
-                             if bridge == bybit_bridge:
-                                 res_ticket = bridge.place_order(symbol, side, 'Market', half_units, stop_loss=setup['sl'], take_profit=setup['tp'])
-                             else:
-                                 res_ticket = bridge.place_limit_order(symbol, o_type, 0.0, setup['sl'], setup['tp'], half_units)
-                             
-                             if res_ticket:
-                                 bot.send_message(f"⚠️ **RESCUE**: Executed Half Risk on {symbol}")
-                                 state_manager.remove_pending_setup(symbol)
-                     else:
-                         bot.send_message(f"⚠️ Low Balance for Reaction Trade: {symbol}")
-                         state_manager.remove_pending_setup(symbol)
+            # --- 1.5 / 2. Pending Reactions + Market Scan (concurrent per-symbol pipelines) ---
+            pending_symbols = state_manager.pending_symbols()
+            jobs = []
+            for symbol in sorted(all_monitored_symbols | pending_symbols):
+                lane = 'bybit' if symbol in session_manager.crypto_symbols else 'mt5'
+                jobs.append((lane, symbol, functools.partial(run_symbol_pipeline, symbol, watchlist)))
+            results = orchestrator.run_cycle(jobs)
 
-            # --- 2. Market Scan Loop ---
-            
-            # Print Header
-            t_str = datetime.now().strftime('%H:%M:%S')
             # Filter Lists
-            paused_list = []
-            news_list = []
-            spread_list = []
-            active_count = 0
-            
-            for i, symbol in enumerate(all_monitored_symbols):
-                # High-Frequency Command check (every 2 symbols)
-                if i % 2 == 0:
-                    last_update_id = process_telegram_updates(bot, last_update_id, command_context)
-                # Bridge Selection
-                bridge = None
-                trade_mgr = None
-                if symbol in session_manager.crypto_symbols:
-                    bridge = bybit_bridge
-                    trade_mgr = bybit_trade_manager
-                else:
-                    bridge = mt5_bridge
-                    trade_mgr = mt5_trade_manager
-
-                # Only proceed if bridge connected/active (Stub check)
-                
-                # --- A. Manage Active Trades (Trailing, TP) ---
-                # Always run this regardless of session correctness
-                symbol_trades = [t for t in active_trades if t['symbol'] == symbol]
-                if symbol_trades:
-                    # Fetch data needed for management
-                    tick = bridge.get_tick(symbol)
-                    
-                    # optimized: Reuse LTF fetch if we are about to fetch it anyway?
-                    # For safety, fetch fresh 5m candles for trailing logic
-                    mt_tf = '5' if bridge == bybit_bridge else 5
-                    mgmt_candles = bridge.get_candles(symbol, timeframe=mt_tf, num_candles=10)
-                    
-                    if tick:
-                        current_price = tick['bid'] # default to bid for check
-                        for trade in symbol_trades:
-                            # Use Ask for Short closing? Simplify to mid or Bid for now.
-                            # Accurate: Long exits on Bid, Short exits on Ask.
-                            # price_to_check = tick['bid'] if trade['direction'] == 'long' else tick['ask'] # Correction: Long closes on Bid, Short on Ask. Correct.
-                            price_to_check = tick['bid'] if trade['direction'] == 'long' else tick['ask']
-                            trade_mgr.manage_active_trade(trade, price_to_check, ltf_candles=mgmt_candles)
-                    
-                    # CRITICAL: If we have an active trade, DO NOT HUNT for new ones on this symbol.
-                    # Prevent stacking/double entry.
-                    continue
+            statuses = list(results.values())
+            paused_list = [r for r in statuses if r == 'paused']
+            news_list = [r for r in statuses if r == 'news']
+            spread_list = [r for r in statuses if r == 'spread']
+            active_count = sum(1 for r in statuses if r == 'active')
 
-                # --- B. Hunt for Setups (SMC Logic) ---
-                # Check Global Status
-                system_status = state_manager.state.get('system_status', 'active')
-                
-                # Check Granular Status
-                is_crypto = symbol in session_manager.crypto_symbols
-                market_status = state_manager.state.get('crypto_status', 'active') if is_crypto else state_manager.state.get('forex_status', 'active')
-                
-                # OLD SESSION KILLA REMOVED per user request.
-                # Asia hunting is back ON.
-                # if is_asia and not is_crypto: ... (Deleted)
-
-                # Scan Condition: 
-                # 1. Symbol in Session Watchlist
-                # 2. Global System Active
-                # 3. Specific Market Active
-                
-                if symbol not in watchlist: continue
-                
-                if system_status == 'paused' or market_status == 'paused':
-                     paused_list.append(symbol)
-                     continue
-                
-                # 1. Check News Filter
-                if not risk.check_news(symbol):
-                    news_list.append(symbol)
-                    continue
-                    
-                # 1.5. Spread Protection (Crucial for Scalping)
-                # Fetch live tick first
-                tick_scan = bridge.get_tick(symbol)
-                if not tick_scan: continue
-                
-                spread = tick_scan['ask'] - tick_scan['bid']
-                
-                if not risk.check_spread(symbol, spread, is_crypto=is_crypto):
-                     spread_list.append(symbol)
-                     continue
-                
-                active_count += 1
-                    
-                # 2. Fetch Data (HTF - 1H)
-                # MT5: 1H=16385, Bybit: '60'
-                htf_tf = '60' if bridge == bybit_bridge else 16385
-                htf_candles = bridge.get_candles(symbol, timeframe=htf_tf, num_candles=100)
-                
-                if htf_candles is None or htf_candles.empty:
-                    continue
-
-                # 3. Detect HTF Sweep
-                sweep = smc.detect_htf_sweeps(htf_candles)
-                
-                if not sweep['swept']:
-                    # HUD v2: Detailed Status (RSI + Bias) for Neutral Assets
-                    ltf_tf_scan = '5' if bridge == bybit_bridge else 5
-                    ltf_scan_data = bridge.get_candles(symbol, timeframe=ltf_tf_scan, num_candles=50)
-                    
-                    status_line = f"⏩ [NEUTRAL] Wait HTF Sweep"
-                    rsi_val = 50.0
-                    bias = "NEUTRAL"
-                    
-                    if ltf_scan_data is not None and not ltf_scan_data.empty:
-                        try:
-                            ltf_scan_data['rsi'] = smc.calculate_rsi(ltf_scan_data['close'], 14)
-                            rsi_val = ltf_scan_data.iloc[-1]['rsi']
-                            if rsi_val > 60: bias = "BULLISH"
-                            elif rsi_val < 40: bias = "BEARISH"
-                            
-                            status_line = f"{bias:<7} | RSI: {rsi_val:>4.1f} | Wait HTF Sweep"
-                        except: pass
-                    
-                    # Persist for Dashboard
-                    waiting_on = f"Sweep High: {sweep.get('htf_high', 0):.5f} / Low: {sweep.get('htf_low', 0):.5f}"
-                    state_manager.update_scan_data(symbol, {
-                        'bias': bias, 'rsi': rsi_val, 'status': "Scanning", 'waiting_on': waiting_on, 'checkpoint': 'SWEEP'
-                    })
-                    print(f"   📊 {symbol:<10} | {status_line}")
-                    continue
-                
-                # --- SWEEP DETECTED ---
-                if sweep['swept']:
-                    side_name = "BEARISH (Short Setup)" if sweep['side'] == 'buy_side' else "BULLISH (Long Setup)"
-                    
-                    # 4. Drop to LTF (5m) for MSS
-                    ltf_tf = '5' if bridge == bybit_bridge else 5
-                    ltf_candles = bridge.get_candles(symbol, timeframe=ltf_tf, num_candles=200)
-                    if ltf_candles is None or ltf_candles.empty: continue
-
-                    mss = smc.detect_mss(ltf_candles, sweep['side'], sweep['sweep_candle_time'])
-                    
-                    # Log MSS Failure reason
-                    if not mss.get('mss', False):
-                        reason = mss.get('reason', 'Wait MSS break')
-                        trigger = mss.get('trigger_level', 0)
-                        type_str = mss.get('type', 'cross')
-                        
-                        status_msg = f"⏱️ Wait MSS {type_str} {trigger:.5f}"
-                        if reason == 'Expired': status_msg = "❌ Setup Expired (>4h)"
-                        
-                        logger.info(f"   👀 {symbol:<10} | Sweep ✅ | {status_msg}")
-                        state_manager.update_scan_data(symbol, {
-                            'bias': 'BULLISH' if sweep['side'] == 'sell_side' else 'BEARISH',
-                            'rsi': 0, 'status': "Sweep Confirmed", 'waiting_on': status_msg, 'checkpoint': 'MSS'
-                        })
-                        continue
-                    
-                    # --- MSS CONFIRMED ---
-                    if mss.get('mss', False):
-                        # Calculate RSI for confluence check
-                        ltf_candles['rsi'] = smc.calculate_rsi(ltf_candles['close'], 14)
-                        current_rsi = ltf_candles.iloc[-1]['rsi']
-
-                        # Filter Logic (Strictly Matches README Strategy)
-                        rsi_ok = False
-                        if sweep['side'] == 'buy_side': # We swept highs -> Bearish Bias (Short)
-                             # Strategy: RSI < 60 (Momentum) and > 30 (No Oversold)
-                             if (30 <= current_rsi <= 60): 
-                                rsi_ok = True
-                             else:
-                                logger.warning(f"   📉 {symbol:<10} | MSS ✅ | RSI WARNING: {current_rsi:.1f} (Ideal 30-60)")
-                        else: # We swept lows -> Bullish Bias (Long)
-                             # Strategy: RSI > 40 (Momentum) and < 70 (No Overbought)
-                             if (40 <= current_rsi <= 70): 
-                                rsi_ok = True
-                             else:
-                                logger.warning(f"   📈 {symbol:<10} | MSS ✅ | RSI WARNING: {current_rsi:.1f} (Ideal 40-70)")
-                        
-                        # UPDATED RULE 4: RSI is PERMISSION ONLY. Structure Overrides.
-                        # We do NOT continue/skip here. We just log the warning above.
-                        # if not rsi_ok: continue <-- REMOVED
-                        
-                        # 5. Find FVG Entry (Premium/Discount Linked)
-                        direction_bias = 'bearish' if sweep['side'] == 'buy_side' else 'bullish'
-                        fvgs = smc.find_fvg(ltf_candles, direction_bias, mss['leg_high'], mss['leg_low'])
-                        
-                        if not fvgs:
-                            logger.info(f"   🔍 {symbol:<10} | MSS ✅ | RSI ✅ | Wait FVG in {direction_bias} zone")
-                            state_manager.update_scan_data(symbol, {
-                                'bias': direction_bias.upper(), 'rsi': current_rsi, 'status': "Wait FVG", 'waiting_on': "Formation in Prem/Disc", 'checkpoint': 'FVG'
-                            })
-                            continue
-                        
-                        if fvgs:
-                             fvg = fvgs[0]
-                             logger.info(f"💎 A+ SETUP: {symbol} {direction_bias.upper()} FVG @ {fvg['entry']}")
-                             
-                             # Dash: Update status for execution
-                             state_manager.update_scan_data(symbol, {
-                                 'bias': direction_bias.upper(),
-                                 'rsi': current_rsi,
-                                 'status': "💎 FVG FOUND",
-                                 'waiting_on': "Execution",
-                                 'checkpoint': 'EXEC'
-                             })
-                        
-                        if fvgs:
-                            setup = fvgs[0] # Take the most recent/valid FVG
-                            entry_price = setup['entry']
-                            
-                             # Stop Loss Calculation
-                            # Rule: SL at the Sweep Candle High/Low (Pivot)
-                            # mss['leg_high'] is the high of the breakdown move for bearish
-                            # For Bearish: SL should be the High that caused the low.
-                            sl_price = mss['leg_high'] if direction_bias == 'bearish' else mss['leg_low']
-                            
-                            # SAFETY BUFFER (Optional, per user request "small buffer for fees" logic elsewhere)
-                            # For SL, exact pivot is standard SMC.
-                            
-                            # TP Calculation: 1:2 Minimum
-                            risk_dist = abs(entry_price - sl_price)
-                            tp_price = entry_price - (2 * risk_dist) if direction_bias == 'bearish' else entry_price + (2 * risk_dist)
-                            
-                            # 6. Risk Check & Execution
-                            balance = bridge.get_balance()
-                            
-                            # Calculate Stats
-                            rr_ratio = abs(tp_price - entry_price) / risk_dist if risk_dist > 0 else 0
-                            
-                            # Construct Signal
-                            signal_msg = (
-                                f"💎 **A+ SETUP FOUND** 💎\n\n"
-                                f"📜 **Symbol**: `{symbol}`\n"
-                                f"↕️ **Side**: {direction_bias.upper()}\n"
-                                f"📉 **Entry**: `{entry_price:.5f}`\n"
-                                f"🛑 **Stop Loss**: `{sl_price:.5f}`\n"
-                                f"🎯 **Take Profit**: `{tp_price:.5f}`\n\n"
-                                f"⚖️ **R:R**: `1:{rr_ratio:.2f}`\n"
-                                f"📅 **Time**: `{datetime.now().strftime('%H:%M UTC')}`"
-                            )
-                            
-                            bot.send_signal(signal_msg)
-                            
-                            # --- 7. AUTO-EVIDENCE: Generate & Send Chart ---
-                            try:
-                                h1_high = htf_candles['high'].tail(24).max()
-                                h1_low = htf_candles['low'].tail(24).min()
-                                
-                                evidence_zones = {
-                                    'sweeps': [{'price': sweep['level'], 'desc': sweep['desc']}],
-                                    'mss': [{'time': ltf_candles.iloc[-1]['time'], 'price': mss['level']}],
-                                    'fvg': [setup],
-                                    'htf': {
-                                        '1H_high': h1_high,
-                                        '1H_low': h1_low
-                                    },
-                                    'trade': {
-                                        'entry': entry_price,
-                                        'sl': sl_price,
-                                        'tp': tp_price
-                                    }
-                                }
-                                # Generate Chart (Synchronous)
-                                evidence_path = visualizer.generate_chart(ltf_candles, symbol, zones=evidence_zones, filename=f"evidence_{symbol}_{int(time.time())}.png")
-                                
-                                if evidence_path and os.path.exists(evidence_path):
-                                    caption = f"📸 **Trade Evidence**: {symbol} {direction_bias.upper()}\nEntry: {entry_price} | SL: {sl_price} | TP: {tp_price}"
-                                    bot.send_photo(evidence_path, caption=caption)
-                                    # cleanup? os.remove(evidence_path) # Optional, keep for debug for now
-                            except Exception as e_vis:
-                                logger.error(f"Failed to generate auto-evidence chart: {e_vis}")
-
-                            if position_sizer.check_risk_reward(entry_price, sl_price, tp_price):
-                                # NEW EXECUTION LOGIC: Wait for Reaction
-                                logger.info(f"💎 A+ SETUP QUEUED for {symbol}. Waiting for Reaction Candle...")
-                                
-                                setup_data = {
-                                    'symbol': symbol,
-                                    'direction': direction_bias, # 'bullish' or 'bearish'
-                                    'entry': entry_price,
-                                    'sl': sl_price,
-                                    'tp': tp_price,
-                                    'created_at': datetime.now().isoformat(),
-                                    'fvg_bottom': setup.get('bottom', entry_price),
-                                    'fvg_top': setup.get('top', entry_price)
-                                }
-                                state_manager.add_pending_setup(setup_data)
-                                
-                                bot.send_message(
-                                    f"⏳ **SETUP QUEUED**: {symbol} {direction_bias.upper()}\n"
-                                    f"Waiting for **Reaction Candle** at `{entry_price:.5f}`..."
-                                )
-                            else:
-                                bot.send_message(f"⚠️ **RR INVALID**: {symbol} setup found but RR < 2.0 (Calculated: {rr_ratio:.2f})") 
-            
             # --- Loop Summary ---
             t_now = datetime.now().strftime('%H:%M:%S')
             summary_parts = [f"[{t_now}] 🔍 Active: {active_count}"]
@@ -650,17 +695,28 @@ def main():
             
 
 
-            time.sleep(3) # Scan delay
+            # Sleep until the next bar close, but never longer than the management cadence
+            time.sleep(max(0.5, min(MANAGEMENT_INTERVAL, scheduler.seconds_until_next_close())))
             
     except KeyboardInterrupt:
         logger.info("Shutdown signal received.")
-        bot.send_message("🛑 System Shutdown Initiated via Keyboard")
+        bot.send_message("🛑 System Shutdown Initiated via Keyboard", priority=PRIORITY_CRITICAL)
+        orchestrator.shutdown()
+        chart_service.shutdown()
         mt5_bridge.shutdown()
+        bybit_bridge.stop_stream()
+        state_manager.flush() # Write-behind changes
+        bot.stop() # Flush queued alerts
         
     except Exception as e:
         logger.critical(f"CRITICAL CRASH: {e}", exc_info=True)
-        bot.send_message(f"🚨 **SYSTEM CRASHED** 🚨\nError: `{str(e)}`\nCheck logs immediately.")
+        bot.send_message(f"🚨 **SYSTEM CRASHED** 🚨\nError: `{str(e)}`\nCheck logs immediately.", priority=PRIORITY_CRITICAL)
+        orchestrator.shutdown()
+        chart_service.shutdown()
         mt5_bridge.shutdown()
+        bybit_bridge.stop_stream()
+        state_manager.flush() # Write-behind changes
+        bot.stop() # Flush queued alerts
         raise e # Re-raise to let watchdog restart if needed
 
 if __name__ == "__main__":
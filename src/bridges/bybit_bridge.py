@@ -1,8 +1,12 @@
 # src/bridges/bybit_bridge.py
 from pybit.unified_trading import HTTP
 import os
+import time
 import logging
-import pandas as pd
+import threading
+from src.bridges.candle_store import CandleStore, parse_kline_rows
+from src.bridges.bybit_stream import BybitMarketStream, PUBLIC_LINEAR_URLS
+from src.utils.candle_cache import timeframe_seconds
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +44,12 @@ class BybitBridge:
         
         self.session = None
         self._instruments_cache = {} 
+        self._candle_store = CandleStore(max_fetch=1000) # Rolling kline buffers (delta fetching)
+        self.tick_ttl = 2.0 # Seconds a bulk ticker snapshot is reused
+        self._tick_snapshot = None
+        self._tick_snapshot_at = 0.0
+        self._tick_lock = threading.Lock() # One get_tickers refresh at a time (lanes share the bridge)
+        self.stream = None # Optional BybitMarketStream (see start_stream)
         
         if api_key and api_secret:
             try:
@@ -93,51 +103,148 @@ class BybitBridge:
         Standardized Interface:
         timeframe: Bybit interval string ('1', '5', '60', 'D')
         num_candles: Number of candles to fetch (mapped to 'limit')
+
+        Served from a per-symbol CandleRing: the first call loads the full window,
+        later calls only request bars from the last stored startTime onwards.
+        The returned frame is a copy taken under the ring lock (safe to cache).
         """
         if not self.session:
             logger.warning("Bybit session not active.")
             return None
 
         try:
-            response = self.session.get_kline(
-                category="linear",
-                symbol=symbol,
-                interval=timeframe,
-                limit=num_candles
-            )
-            # Process response to DataFrame
-            if response['retCode'] == 0:
-                data = response['result']['list']
-                if not data:
-                    logger.warning(f"Bybit: No candles found for {symbol}. Check if symbol is correct and you have trading permissions.")
-                    return None
-                # Bybit returns: [startTime, open, high, low, close, volume, turnover]
-                # Note: list is in reverse order (newest first)
-                df = pd.DataFrame(data, columns=['time', 'open', 'high', 'low', 'close', 'volume', 'turnover'])
-                df['time'] = pd.to_datetime(pd.to_numeric(df['time']), unit='ms')
-                df = df.astype({'open': 'float', 'high': 'float', 'low': 'float', 'close': 'float', 'volume': 'float'})
-                return df.iloc[::-1] # Reverse to have oldest first
-            else:
-                msg = response['retMsg']
-                logger.error(f"Bybit API Error: {msg}")
-                if "10001" in str(response['retCode']):
-                    logger.error("TIP: Parameter error. Check if BYBIT_DEMO=True matches your account type.")
-                return None
+            ring = self._candle_store.ring(symbol, timeframe, num_candles)
+            with ring.lock:
+                # Live stream keeps the ring current: no REST round-trip needed
+                if self.stream and self.stream.covers(symbol, timeframe) and self.stream.is_live(ring) and ring.size >= num_candles:
+                    return ring.frame(num_candles)
+                return self._sync_ring(ring, symbol, timeframe, num_candles)
         except Exception as e:
             logger.error(f"Error fetching Bybit candles: {e}")
             return None
-    def get_tick(self, symbol):
-        """Returns current bid/ask."""
-        if not self.session: return None
-        try:
-             resp = self.session.get_tickers(category="linear", symbol=symbol)
-             if resp['retCode'] == 0:
-                 res = resp['result']['list'][0]
-                 return {'bid': float(res['bid1Price']), 'ask': float(res['ask1Price'])}
-        except:
-             return None
+
+    def _sync_ring(self, ring, symbol, timeframe, num_candles):
+        """Full load or delta update of one CandleRing, then returns the newest bars."""
+        full_limit = min(ring.capacity, self._candle_store.max_fetch)
+        interval_ms = timeframe_seconds(timeframe) * 1000
+        sync_started = time.time()
+        limit = self._candle_store.delta_limit(ring, num_candles, interval_ms, int(time.time() * 1000))
+
+        if limit is None:
+            data = self._fetch_kline(symbol, timeframe, limit=full_limit)
+            if not data:
+                return None
+            ring.reset()
+            ring.merge(*parse_kline_rows(data))
+        else:
+            data = self._fetch_kline(symbol, timeframe, limit=limit, start=ring.last_time)
+            if data is None:
+                return None
+            if data:
+                ms, values = parse_kline_rows(data)
+                if ms[0] > ring.last_time:
+                    # Delta doesn't overlap the stored bars (clock skew / outage): reload
+                    logger.debug(f"Bybit: Candle gap for {symbol} {timeframe}. Reloading window.")
+                    data = self._fetch_kline(symbol, timeframe, limit=full_limit)
+                    if not data:
+                        return None
+                    ring.reset()
+                    ms, values = parse_kline_rows(data)
+                ring.merge(ms, values)
+
+        ring.synced_at = sync_started
+        return ring.frame(num_candles)
+
+    def _fetch_kline(self, symbol, timeframe, limit, start=None):
+        """Raw kline rows (newest first) or None on API error."""
+        params = {"category": "linear", "symbol": symbol, "interval": timeframe, "limit": limit}
+        if start is not None:
+            params["start"] = start
+        response = self.session.get_kline(**params)
+        if response['retCode'] == 0:
+            data = response['result']['list']
+            # Bybit returns: [startTime, open, high, low, close, volume, turnover]
+            # Note: list is in reverse order (newest first)
+            if not data and start is None:
+                logger.warning(f"Bybit: No candles found for {symbol}. Check if symbol is correct and you have trading permissions.")
+            return data
+        msg = response['retMsg']
+        logger.error(f"Bybit API Error: {msg}")
+        if "10001" in str(response['retCode']):
+            logger.error("TIP: Parameter error. Check if BYBIT_DEMO=True matches your account type.")
         return None
 
+    def get_ticks(self, symbols=None, max_age=None):
+        """
+        Bulk bid/ask snapshot: ONE unfiltered linear get_tickers call parsed into
+        {symbol: {'bid', 'ask'}} and cached for `tick_ttl` seconds.
+        symbols: Optional subset to return (None = whole snapshot).
+        """
+        if not self.session: return {}
+        max_age = self.tick_ttl if max_age is None else max_age
+
+        # Timestamp first: it is written after the snapshot, so a fresh time implies a fresh snapshot
+        fetched_at, snapshot = self._tick_snapshot_at, self._tick_snapshot
+        if snapshot is None or time.time() - fetched_at > max_age:
+            with self._tick_lock:
+                # Re-check: another lane may have refreshed while we waited
+                fetched_at, snapshot = self._tick_snapshot_at, self._tick_snapshot
+                if snapshot is None or time.time() - fetched_at > max_age:
+                    snapshot = self._fetch_tick_snapshot()
+                    if snapshot is None:
+                        return {}
+
+        if symbols is None:
+            return dict(snapshot)
+        return {sym: snapshot[sym] for sym in symbols if sym in snapshot}
+
+    def _fetch_tick_snapshot(self):
+        """Single get_tickers call -> stored {symbol: {'bid', 'ask'}} (None on error). Caller holds _tick_lock."""
+        try:
+            resp = self.session.get_tickers(category="linear")
+            if resp['retCode'] != 0:
+                logger.error(f"Bybit Tickers Error: {resp['retMsg']}")
+                return None
+            snapshot = {}
+            for res in resp['result']['list']:
+                try:
+                    snapshot[res['symbol']] = {'bid': float(res['bid1Price']), 'ask': float(res['ask1Price'])}
+                except (KeyError, ValueError):
+                    continue # No book (e.g. pre-listing): skip
+            self._tick_snapshot = snapshot
+            self._tick_snapshot_at = time.time()
+            return snapshot
+        except Exception as e:
+            logger.error(f"Error fetching Bybit tickers: {e}")
+            return None
+
+    def get_tick(self, symbol):
+        """Returns current bid/ask (stream top-of-book if live, else the bulk get_ticks snapshot)."""
+        if self.stream:
+            tick = self.stream.get_tick(symbol)
+            if tick:
+                return tick
+        return self.get_ticks([symbol]).get(symbol)
+
+    def start_stream(self, symbols, intervals=('5', '60'), url=None):
+        """
+        Starts the public WebSocket feed (kline + orderbook.1) for `symbols`.
+        url: Override for the stream endpoint (BYBIT_STREAM_URL, e.g. a local replay server).
+        """
+        if self.stream:
+            self.stream.stop()
+        url = url or os.getenv("BYBIT_STREAM_URL")
+        if not url:
+            # Demo trading has no separate public stream: it uses mainnet market data
+            url = PUBLIC_LINEAR_URLS['testnet'] if self.testnet and not self.demo_trading else PUBLIC_LINEAR_URLS['mainnet']
+        self.stream = BybitMarketStream(self._candle_store, symbols, intervals=intervals, url=url).start()
+        return self.stream
+
+    def stop_stream(self):
+        if self.stream:
+            self.stream.stop()
+            self.stream = None
+
     def place_order(self, symbol, side, order_type, qty, price=None, stop_loss=None, take_profit=None):
         """
         Places an order on Bybit (Unified Trading).
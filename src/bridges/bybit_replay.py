@@ -0,0 +1,200 @@
+# src/bridges/bybit_replay.py
+import base64
+import hashlib
+import json
+import logging
+import socket
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+class ReplayServer:
+    """
+    Local stand-in for the Bybit v5 public stream (offline testing / backtest replays).
+    Speaks just enough WebSocket (RFC 6455, stdlib only) for BybitMarketStream:
+    answers subscribe / ping ops and plays recorded messages (JSONL captured via
+    BybitMarketStream(record_path=...)) to each client for its subscribed topics.
+    """
+    def __init__(self, messages, host='127.0.0.1', port=0, interval=0.0, autoplay=True):
+        self.messages = [m if isinstance(m, dict) else json.loads(m) for m in messages]
+        self.host = host
+        self.port = port
+        self.interval = interval # Seconds between replayed messages
+        self._play = threading.Event()
+        if autoplay:
+            self._play.set()
+
+        self._sock = None
+        self._stop = threading.Event()
+        self._clients = []
+        self.sent = 0
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, "r") as f:
+            return cls([line for line in f if line.strip()], **kwargs)
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        self.port = self._sock.getsockname()[1]
+        self._sock.listen(5)
+        self._sock.settimeout(0.2)
+        threading.Thread(target=self._accept_loop, name="ReplayServer", daemon=True).start()
+        logger.info(f"Replay server listening on {self.url} ({len(self.messages)} messages)")
+        return self
+
+    def play(self):
+        """Releases playback when created with autoplay=False."""
+        self._play.set()
+
+    def stop(self):
+        self._stop.set()
+        self._play.set()
+        for conn in list(self._clients):
+            try:
+                conn.close()
+            except OSError:
+                pass
+        if self._sock:
+            self._sock.close()
+
+    # --- Connection Handling ---
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            conn.settimeout(None)
+            self._clients.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        send_lock = threading.Lock()
+        topics = set()
+        try:
+            if not self._handshake(conn):
+                return
+            while not self._stop.is_set():
+                opcode, payload = _recv_frame(conn)
+                if opcode is None or opcode == OP_CLOSE:
+                    break
+                if opcode == OP_PING:
+                    with send_lock: conn.sendall(_frame(OP_PONG, payload))
+                    continue
+                if opcode != OP_TEXT:
+                    continue
+
+                req = json.loads(payload.decode())
+                if req.get('op') == 'subscribe':
+                    topics.update(req.get('args', []))
+                    self._send_json(conn, send_lock, {"success": True, "ret_msg": "", "conn_id": "replay", "op": "subscribe"})
+                    threading.Thread(target=self._playback, args=(conn, send_lock, set(topics)), daemon=True).start()
+                elif req.get('op') == 'ping':
+                    self._send_json(conn, send_lock, {"success": True, "ret_msg": "pong", "conn_id": "replay", "op": "ping"})
+        except (OSError, ValueError):
+            pass
+        finally:
+            try:
+                conn.close()
+            except OSError:
+                pass
+            if conn in self._clients:
+                self._clients.remove(conn)
+
+    def _playback(self, conn, send_lock, topics):
+        self._play.wait()
+        for msg in self.messages:
+            if self._stop.is_set():
+                return
+            if msg.get('topic') not in topics:
+                continue
+            try:
+                self._send_json(conn, send_lock, msg)
+            except OSError:
+                return
+            self.sent += 1
+            if self.interval:
+                time.sleep(self.interval)
+
+    def _handshake(self, conn):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = conn.recv(1024)
+            if not chunk:
+                return False
+            request += chunk
+
+        key = None
+        for line in request.decode(errors='ignore').split("\r\n"):
+            if line.lower().startswith("sec-websocket-key:"):
+                key = line.split(":", 1)[1].strip()
+        if not key:
+            return False
+
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        conn.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        return True
+
+    def _send_json(self, conn, send_lock, obj):
+        with send_lock:
+            conn.sendall(_frame(OP_TEXT, json.dumps(obj).encode()))
+
+def _frame(opcode, payload):
+    """Server -> client frame (FIN set, unmasked)."""
+    header = bytes([0x80 | opcode])
+    n = len(payload)
+    if n < 126:
+        header += bytes([n])
+    elif n < 65536:
+        header += bytes([126]) + struct.pack(">H", n)
+    else:
+        header += bytes([127]) + struct.pack(">Q", n)
+    return header + payload
+
+def _recv_exact(conn, n):
+    data = b""
+    while len(data) < n:
+        chunk = conn.recv(n - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+def _recv_frame(conn):
+    """Client -> server frame (masked). Returns (opcode, payload) or (None, None) on EOF."""
+    header = _recv_exact(conn, 2)
+    if header is None:
+        return None, None
+    opcode = header[0] & 0x0F
+    masked = header[1] & 0x80
+    length = header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", _recv_exact(conn, 2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", _recv_exact(conn, 8))[0]
+    mask = _recv_exact(conn, 4) if masked else None
+    payload = _recv_exact(conn, length) if length else b""
+    if payload is None:
+        return None, None
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
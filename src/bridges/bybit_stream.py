@@ -0,0 +1,195 @@
+# src/bridges/bybit_stream.py
+import json
+import logging
+import threading
+import time
+import numpy as np
+import websocket
+
+from src.bridges.candle_store import FIELDS
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_LINEAR_URLS = {
+    'mainnet': "wss://stream.bybit.com/v5/public/linear",
+    'testnet': "wss://stream-testnet.bybit.com/v5/public/linear"
+}
+
+class BybitMarketStream:
+    """
+    Public market-data feed (v5 linear) running on a daemon thread.
+    Subscribes to kline.<interval>.<symbol> and orderbook.1.<symbol> and keeps the
+    bridge's CandleStore rings and a top-of-book tick dict current, so get_candles /
+    get_tick can skip REST while the socket is live.
+    """
+    def __init__(self, candle_store, symbols, intervals=('5', '60'), url=None,
+                 ping_interval=20, ping_timeout=10, stale_after=60, record_path=None):
+        self.candle_store = candle_store
+        self.symbols = list(symbols)
+        self.intervals = [str(i) for i in intervals]
+        self.url = url or PUBLIC_LINEAR_URLS['mainnet']
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout # WS-level pong deadline: a stalled socket is closed and reconnected
+        self.stale_after = stale_after # No topic message for this long = frozen feed, fall back to REST
+        self.record_path = record_path # Optional JSONL capture for the replay server
+
+        self._ws = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._record_file = None
+        self._ticks = {} # {symbol: {'bid', 'ask', 'time'}}
+        self._ticks_lock = threading.Lock()
+
+        self.connected = False
+        self.connected_since = None # Rings synced over REST before this may have a gap
+        self.last_message_at = None
+        self.messages = 0
+
+    @property
+    def topics(self):
+        topics = [f"kline.{i}.{s}" for s in self.symbols for i in self.intervals]
+        topics += [f"orderbook.1.{s}" for s in self.symbols]
+        return topics
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        if self.record_path:
+            self._record_file = open(self.record_path, "a")
+        self._thread = threading.Thread(target=self._run, name="BybitMarketStream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._ws:
+            self._ws.close()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._record_file:
+            self._record_file.close()
+            self._record_file = None
+        self.connected = False
+
+    def wait_until_connected(self, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.connected: return True
+            time.sleep(0.05)
+        return False
+
+    def covers(self, symbol, interval):
+        return symbol in self.symbols and str(interval) in self.intervals
+
+    def is_fresh(self):
+        """Connected and a topic message arrived within `stale_after` (kline topics push every few seconds)."""
+        if not self.connected or self.connected_since is None:
+            return False
+        last_seen = max(self.last_message_at or 0.0, self.connected_since)
+        return time.time() - last_seen < self.stale_after
+
+    def is_live(self, ring):
+        """True if the feed is fresh and the ring was REST-synced during the current connection (no missed bars since)."""
+        return (self.is_fresh() and ring.synced_at is not None
+                and ring.synced_at >= self.connected_since)
+
+    def get_tick(self, symbol, max_age=5.0):
+        """Latest top-of-book from orderbook.1 (None if unknown or stale)."""
+        with self._ticks_lock:
+            tick = self._ticks.get(symbol)
+            if not tick or not self.connected or time.time() - tick['time'] > max_age:
+                return None
+            if tick['bid'] is None or tick['ask'] is None:
+                return None
+            return {'bid': tick['bid'], 'ask': tick['ask']}
+
+    # --- Socket Loop ---
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close
+            )
+            self._ws.run_forever(ping_interval=self.ping_interval, ping_timeout=self.ping_timeout)
+            self.connected = False
+            if self._stop.is_set():
+                break
+            logger.warning(f"Bybit stream disconnected. Reconnecting in {backoff}s...")
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30)
+        logger.info("Bybit stream stopped.")
+
+    def _on_open(self, ws):
+        ws.send(json.dumps({"op": "subscribe", "args": self.topics}))
+        self.connected_since = time.time()
+        self.connected = True
+        logger.info(f"Bybit stream connected: {self.url} ({len(self.topics)} topics)")
+        threading.Thread(target=self._heartbeat, args=(ws,), name="BybitStreamPing", daemon=True).start()
+
+    def _heartbeat(self, ws):
+        # Bybit drops idle public connections: app-level ping every ~20s
+        while self.connected and not self._stop.wait(self.ping_interval):
+            try:
+                ws.send(json.dumps({"op": "ping"}))
+            except Exception:
+                return
+
+    def _on_error(self, ws, error):
+        logger.error(f"Bybit stream error: {error}")
+
+    def _on_close(self, ws, code, reason):
+        self.connected = False
+
+    def _on_message(self, ws, raw):
+        try:
+            msg = json.loads(raw)
+        except ValueError:
+            return
+        topic = msg.get('topic')
+        if not topic:
+            if msg.get('op') == 'subscribe' and not msg.get('success', True):
+                logger.error(f"Bybit stream subscribe failed: {msg.get('ret_msg')}")
+            return
+
+        self.last_message_at = time.time()
+        self.messages += 1
+        if self._record_file:
+            self._record_file.write(raw if isinstance(raw, str) else raw.decode())
+            self._record_file.write("\n")
+
+        if topic.startswith("kline."):
+            self._handle_kline(topic, msg.get('data') or [])
+        elif topic.startswith("orderbook.1."):
+            self._handle_orderbook(msg.get('data') or {})
+
+    def _handle_kline(self, topic, bars):
+        _, interval, symbol = topic.split(".", 2)
+        if not bars:
+            return
+        bars = sorted(bars, key=lambda b: int(b['start']))
+        ms = np.array([int(b['start']) for b in bars], dtype=np.int64)
+        values = np.array([[float(b[f]) for f in FIELDS] for b in bars], dtype=float)
+
+        ring = self.candle_store.ring(symbol, interval, 0)
+        with ring.lock:
+            if not self.is_live(ring):
+                return # Not seeded during this connection: the next REST sync closes the gap
+            ring.merge(ms, values)
+
+    def _handle_orderbook(self, data):
+        symbol = data.get('s')
+        if not symbol:
+            return
+        with self._ticks_lock:
+            tick = self._ticks.setdefault(symbol, {'bid': None, 'ask': None, 'time': 0.0})
+            # Level 1: empty side / size '0' means unchanged / removed
+            for side, key in (('b', 'bid'), ('a', 'ask')):
+                levels = data.get(side) or []
+                if levels and float(levels[0][1]) > 0:
+                    tick[key] = float(levels[0][0])
+            tick['time'] = time.time()
@@ -0,0 +1,118 @@
+# src/bridges/candle_store.py
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ['open', 'high', 'low', 'close', 'volume', 'turnover']
+
+class CandleRing:
+    """
+    Rolling window of the last `capacity` bars for ONE symbol + interval.
+    Preallocated NumPy buffers of size 2 * capacity: every bar is written twice
+    (slot and slot + capacity), so the newest k bars are always one contiguous
+    slice and frame() is a single block copy - no re-parsing or reordering.
+    """
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._ms = np.zeros(2 * self.capacity, dtype=np.int64)                 # startTime (ms)
+        self._values = np.zeros((2 * self.capacity, len(FIELDS)), dtype=float) # OHLCV + turnover
+        self.count = 0 # Total bars written (monotonic)
+        self.synced_at = None # Wall time of the last successful REST sync
+        self.lock = threading.Lock() # Held by the bridge while syncing / slicing
+
+    @property
+    def size(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def last_time(self):
+        """startTime (ms) of the newest stored bar (the forming candle at fetch time)."""
+        if self.count == 0:
+            return None
+        return int(self._ms[(self.count - 1) % self.capacity])
+
+    def reset(self):
+        self.count = 0
+
+    def merge(self, ms, values):
+        """
+        Ingests rows sorted oldest first. A row with the same startTime as the newest
+        stored bar overwrites it (forming candle update), newer rows are appended,
+        older rows are ignored.
+        """
+        last = self.last_time
+        for i in range(len(ms)):
+            t = int(ms[i])
+            if last is not None and t < last:
+                continue
+            if last is not None and t == last:
+                slot = (self.count - 1) % self.capacity
+            else:
+                slot = self.count % self.capacity
+                self.count += 1
+            self._ms[slot] = self._ms[slot + self.capacity] = t
+            self._values[slot] = self._values[slot + self.capacity] = values[i]
+            last = t
+
+    def frame(self, num_candles):
+        """
+        Newest `num_candles` bars (oldest first) as a DataFrame that owns its data:
+        the stream thread keeps merging into the ring after the caller releases
+        `lock`, and callers (CandleCache) hold frames across a whole scan cycle.
+        Call with `lock` held.
+        """
+        k = min(int(num_candles), self.size)
+        end = self.count % self.capacity + self.capacity
+        start = end - k
+
+        df = pd.DataFrame(self._values[start:end], columns=FIELDS, copy=True)
+        df.insert(0, 'time', self._ms[start:end].astype('datetime64[ms]').astype('datetime64[ns]'))
+        return df
+
+class CandleStore:
+    """
+    Per-(symbol, interval) CandleRing registry.
+    Tells the bridge whether it needs a full reload or only a delta since the
+    last stored startTime, and how many bars the delta request should ask for.
+    """
+    def __init__(self, min_capacity=200, max_fetch=1000):
+        self.min_capacity = min_capacity
+        self.max_fetch = max_fetch # Exchange cap on 'limit' per request
+        self._lock = threading.Lock()
+        self._rings = {} # {(symbol, interval): CandleRing}
+
+    def ring(self, symbol, interval, num_candles):
+        """Returns the ring for a key, regrowing it if a deeper window is requested."""
+        key = (symbol, str(interval))
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None or ring.capacity < num_candles:
+                ring = CandleRing(max(self.min_capacity, num_candles))
+                self._rings[key] = ring
+            return ring
+
+    def delta_limit(self, ring, num_candles, interval_ms, now_ms):
+        """
+        Bars to request for a delta update (from the last stored startTime), or
+        None if the ring must be fully reloaded (empty, too shallow, or stale).
+        """
+        if ring.count == 0 or ring.size < num_candles:
+            return None
+        missing = (now_ms - ring.last_time) // interval_ms + 2 # +1 forming bar, +1 slack for clock skew
+        if missing > self.max_fetch or missing > ring.capacity:
+            return None
+        return int(max(2, missing))
+
+    def invalidate(self, symbol=None):
+        with self._lock:
+            for key in list(self._rings.keys()):
+                if symbol is None or key[0] == symbol:
+                    del self._rings[key]
+
+def parse_kline_rows(rows):
+    """Bybit kline list (newest first, strings) -> (ms int64[k], values float[k, 6]) oldest first."""
+    arr = np.asarray(rows, dtype=float)[::-1]
+    return arr[:, 0].astype(np.int64), arr[:, 1:1 + len(FIELDS)]
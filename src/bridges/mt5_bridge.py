@@ -88,6 +88,7 @@ except ImportError:
     mt5 = MockMT5()
     print("⚠️ WARNING: Running with MOCK MetaTrader5 (Mac Detected)")
 import os
+import json
 import logging
 from datetime import datetime
 import pandas as pd
@@ -95,7 +96,15 @@ import pandas as pd
 logger = logging.getLogger(__name__)
 
 class MT5Bridge:
-    def __init__(self):
+    def __init__(self, symbols=None, symbol_cache_path=None):
+        """
+        symbols: Canonical names to resolve up-front at connect (e.g. the forex watchlist).
+        symbol_cache_path: Optional JSON file persisting canonical -> broker names across restarts
+        (defaults to MT5_SYMBOL_CACHE env var; disabled if unset).
+        """
+        self.symbols = list(symbols or [])
+        self.symbol_cache_path = symbol_cache_path or os.getenv("MT5_SYMBOL_CACHE")
+        self._symbol_map = {} # {canonical: {'name': broker_name, 'selected': bool}}
         try:
             val = os.getenv("MT5_LOGIN")
             self.login = int(val) if val else 0
@@ -117,7 +126,7 @@ class MT5Bridge:
             return None
 
         # 1. Selection (Required for some brokers to "activate" symbol info)
-        if not mt5.symbol_select(found_symbol, True):
+        if not self._select_symbol(symbol, found_symbol):
             logger.warning(f"Failed to SELECT {found_symbol} in Market Watch. Attempting info anyway.")
 
         # 2. Fetch Info
@@ -143,9 +152,80 @@ class MT5Bridge:
         
         logger.info(f"Connected to MT5: {self.login} on {self.server}")
         self.connected = True
+        self._build_symbol_map()
         return True
 
+    def _build_symbol_map(self):
+        """
+        (Re)builds the canonical -> broker symbol map after a (re)connect.
+        Disk entries from a previous run (same login/server) are re-validated with a
+        single symbol_info call instead of the full variant search.
+        """
+        self._symbol_map = {}
+        cached = self._load_symbol_cache()
+
+        for symbol in self.symbols:
+            name = cached.get(symbol)
+            if name and mt5.symbol_info(name) is not None:
+                self._symbol_map[symbol] = {'name': name, 'selected': False}
+            else:
+                self._find_symbol(symbol)
+
+        if self._symbol_map:
+            resolved = ', '.join(f"{k}->{v['name']}" for k, v in self._symbol_map.items())
+            logger.info(f"MT5: Resolved {len(self._symbol_map)} symbols: {resolved}")
+        self._save_symbol_cache()
+
+    def _load_symbol_cache(self):
+        if not self.symbol_cache_path or not os.path.exists(self.symbol_cache_path):
+            return {}
+        try:
+            with open(self.symbol_cache_path, "r") as f:
+                data = json.load(f)
+            if data.get('login') != self.login or data.get('server') != self.server:
+                return {} # Different account/broker: names may differ
+            return data.get('symbols', {})
+        except Exception as e:
+            logger.warning(f"MT5: Failed to load symbol cache: {e}")
+            return {}
+
+    def _save_symbol_cache(self):
+        if not self.symbol_cache_path:
+            return
+        try:
+            data = {
+                'login': self.login,
+                'server': self.server,
+                'symbols': {k: v['name'] for k, v in self._symbol_map.items()}
+            }
+            with open(self.symbol_cache_path, "w") as f:
+                json.dump(data, f, indent=4)
+        except Exception as e:
+            logger.warning(f"MT5: Failed to save symbol cache: {e}")
+
     def _find_symbol(self, symbol):
+        """Resolves the broker's name for a symbol (dict hit after the first lookup)."""
+        entry = self._symbol_map.get(symbol)
+        if entry:
+            return entry['name']
+
+        found = self._search_symbol(symbol)
+        if found:
+            self._symbol_map[symbol] = {'name': found, 'selected': False}
+        return found
+
+    def _select_symbol(self, symbol, found_symbol):
+        """symbol_select once per connection; the map remembers successful selections."""
+        entry = self._symbol_map.get(symbol)
+        if entry and entry['selected']:
+            return True
+        if not mt5.symbol_select(found_symbol, True):
+            return False
+        if entry:
+            entry['selected'] = True
+        return True
+
+    def _search_symbol(self, symbol):
         """Helper to find the correct symbol variant (e.g. with .a suffix or different case)."""
         # 1. Try common suffixes
         suffixes = ["", ".a", ".m", ".i", ".pro", ".x", ".z", "!", "#", "_", ".ext", ".abc"]
@@ -204,7 +284,7 @@ class MT5Bridge:
             return None
 
         # Ensure symbol is selected in Market Watch (Mandatory for ticks/candles)
-        if not mt5.symbol_select(found_symbol, True):
+        if not self._select_symbol(symbol, found_symbol):
             logger.error(f"Failed to select symbol {found_symbol} in MT5 Market Watch.")
             return None
 
@@ -227,7 +307,7 @@ class MT5Bridge:
             return None
 
         # 2. Selection (Required for ticks)
-        if not mt5.symbol_select(found_symbol, True):
+        if not self._select_symbol(symbol, found_symbol):
             logger.error(f"MT5: Failed to SELECT {found_symbol} in Market Watch.")
             return None
 
@@ -4,6 +4,7 @@ import requests
 import os
 import pytz
 from datetime import datetime
+from src.utils.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +15,7 @@ class TelegramBot:
         self.signal_channel_id = os.getenv("TELEGRAM_SIGNAL_CHANNEL_ID")
         self.base_url = f"https://api.telegram.org/bot{self.token}"
         self.pending_confirmation = {} # {chat_id: {'command': str, 'args': str, 'expiry': float}}
+        self.http = get_http_client() # Pooled keep-alive session (no TLS handshake per send)
         
         # Auto-configure Bot Menu on startup
         self.set_bot_menu()
@@ -28,6 +30,7 @@ class TelegramBot:
             {"command": "status", "description": "💰 Wallet Status (Equity/Margin)"},
             {"command": "check", "description": "✅ Diagnostics (Brokers/Heartbeat)"},
             {"command": "logs", "description": "📝 View Live Logs"},
+            {"command": "rejects", "description": "🚫 Setup Rejection Stats [SYMBOL]"},
             {"command": "chart", "description": "📷 Visual Chart [SYMBOL]"},
             
             # Trade Mgmt
@@ -58,7 +61,7 @@ class TelegramBot:
         
         try:
             url = f"{self.base_url}/setMyCommands"
-            requests.post(url, json={"commands": commands})
+            self.http.post(url, json={"commands": commands})
         except Exception as e:
             logger.warning(f"Failed to set Telegram Menu: {e}")
 
@@ -118,8 +121,7 @@ class TelegramBot:
             symbol = args.upper()
             
             if context and 'state_manager' in context:
-                active = context['state_manager'].state.get('active_trades', [])
-                target_trades = [t for t in active if t['symbol'] == symbol]
+                target_trades = context['state_manager'].get_trades(symbol)
                 
                 if not target_trades:
                     return f"⚠️ No open positions found for {symbol}."
@@ -133,7 +135,7 @@ class TelegramBot:
                          bridge = context['mt5_bridge']
                          
                     bridge.close_position(trade['ticket'], pct=1.0)
-                    active.remove(trade)
+                    context['state_manager'].remove_trade(trade['ticket'])
                     closed_count += 1
                     
                     # LOG HISTORY
@@ -171,7 +173,7 @@ class TelegramBot:
 
             # 3. Halt System
             if context and 'state_manager' in context:
-                context['state_manager'].state['active_trades'] = []
+                context['state_manager'].replace_trades([])
                 context['state_manager'].state['system_status'] = 'halted'
                 context['state_manager'].save_state()
                 
@@ -251,6 +253,11 @@ class TelegramBot:
                 f"Bybit Bridge: {'🟢' if bybit_ok else '🔴'}\n"
                 f"Heartbeat: Active\n"
             )
+
+            # HTTP latency (pooled client histograms)
+            for host, h in self.http.stats().items():
+                if h['count']:
+                    msg += f"HTTP {host}: p50 ≤{h['p50_ms']}ms | p95 ≤{h['p95_ms']}ms | n={h['count']} | err={h['errors']}\n"
             
             # --- CONFIGURATION (Detailed View) ---
             msg += "\n⚙️ **Active Configuration**\n\n"
@@ -361,6 +368,24 @@ class TelegramBot:
             if context and 'logger_buffer' in context:
                 return f"📝 **Live Logs** (Last 15)\n```\n{context['logger_buffer'].get_logs()}\n```"
             return "📝 Logs not available."
+
+        elif cmd == '/rejects':
+            if not context or 'smc' not in context:
+                return "🚫 Rejection stats unavailable."
+            
+            counter = context['smc'].rejections
+            symbol = args.upper().strip() if args else None
+            stats = counter.sample(symbol)
+            if not stats:
+                return f"🚫 **Rejection Stats**\nNo rejections recorded{' for ' + symbol if symbol else ''} yet."
+            
+            msg = f"🚫 **Rejection Stats** (Since {counter.started_at.strftime('%H:%M')})\n\n"
+            for sym, detectors in sorted(stats.items()):
+                msg += f"**{sym}**\n"
+                for detector, codes in detectors.items():
+                    codes_str = ", ".join(f"{code}: {n}" for code, n in sorted(codes.items(), key=lambda x: -x[1]))
+                    msg += f"┣ {detector.upper()}: {codes_str}\n"
+            return msg
             
         elif cmd == '/chart':
             if not args: return "⚠️ Usage: /chart [SYMBOL]"
@@ -382,8 +407,13 @@ class TelegramBot:
                 tf_5m = '5' if is_bybit else 5
                 tf_1h = '60' if is_bybit else 16385
                 
-                df_5m = bridge.get_candles(symbol, timeframe=tf_5m, num_candles=100)
-                df_1h = bridge.get_candles(symbol, timeframe=tf_1h, num_candles=48)
+                cache = context.get('candle_cache') if context else None
+                if cache:
+                    df_5m = cache.get_candles(bridge, symbol, tf_5m, 100)
+                    df_1h = cache.get_candles(bridge, symbol, tf_1h, 48)
+                else:
+                    df_5m = bridge.get_candles(symbol, timeframe=tf_5m, num_candles=100)
+                    df_1h = bridge.get_candles(symbol, timeframe=tf_1h, num_candles=48)
             except Exception as e:
                 logger.error(f"Data fetch error: {e}")
                 return f"⚠️ Failed to fetch data for {symbol}."
@@ -421,10 +451,17 @@ class TelegramBot:
                                 # Pending MSS (Show trigger line)
                                 zones['mss'] = [{'level': mss_res['trigger_level'], 'desc': 'MSS Wait'}]
 
+                h1_info = " (Inc. 1H & 4H Ranges)" if 'htf' in zones else ""
+                caption = f"📷 **Tactical Chart**: {symbol}{h1_info}"
+                if 'chart_service' in context:
+                    # Rendered in the chart worker; the photo is sent when it's ready
+                    if context['chart_service'].render_and_send(df_5m, symbol, zones=zones, filename=f"{symbol}_detailed.png", caption=caption):
+                        return f"📷 Rendering chart for {symbol}..."
+                    return f"⚠️ Chart generation failed for {symbol}."
+
                 img_path = context['visualizer'].generate_chart(df_5m, symbol, zones=zones, filename=f"{symbol}_detailed.png")
                 if img_path and os.path.exists(img_path):
-                    h1_info = " (Inc. 1H & 4H Ranges)" if 'htf' in zones else ""
-                    self.send_photo(img_path, caption=f"📷 **Tactical Chart**: {symbol}{h1_info}")
+                    self.send_photo(img_path, caption=caption)
                     return None 
                 else:
                     return f"⚠️ Chart generation failed for {symbol}."
@@ -443,11 +480,16 @@ class TelegramBot:
 
         elif cmd == '/history':
             if context and 'state_manager' in context:
-                history = context['state_manager'].state.get('trade_history', [])
+                # /history [N] [SYMBOL] - depth beyond 10 needs a journaling backend (STATE_BACKEND=sqlite)
+                limit, symbol_filter = 10, None
+                for arg in (args or "").split():
+                    if arg.isdigit(): limit = min(int(arg), 50)
+                    else: symbol_filter = arg.upper()
+                history = context['state_manager'].get_trade_history(limit, symbol_filter)
                 if not history:
                     return "📜 **Trade History**\nNo closed trades recorded this session."
                 
-                msg = "📜 **Trade History** (Last 10)\n"
+                msg = f"📜 **Trade History** (Last {len(history)})\n"
                 for t in history:
                     # Expect keys: symbol, direction, pnl_r (or pnl_usd), result (Win/Loss)
                     res_icon = "g" if t.get('pnl', 0) > 0 else "r" # Simple color coding concept
@@ -706,7 +748,7 @@ class TelegramBot:
                 "text": message,
                 "parse_mode": "Markdown"
             }
-            response = requests.post(url, json=payload)
+            response = self.http.post(url, json=payload)
             response.raise_for_status()
             logger.info(f"Telegram message sent to {target_chat}: {message[:20]}...")
             return True
@@ -739,7 +781,7 @@ class TelegramBot:
             with open(photo_path, 'rb') as photo:
                 files = {'photo': photo}
                 data = {'chat_id': self.chat_id, 'caption': caption}
-                response = requests.post(url, data=data, files=files)
+                response = self.http.post(url, data=data, files=files, timeout=(5, 60))
                 response.raise_for_status()
             logger.info(f"Telegram photo sent: {photo_path}")
         except Exception as e:
@@ -761,7 +803,7 @@ class TelegramBot:
             # If timeout is small (0.5s for rapid checks), we can be tighter.
             client_timeout = timeout + 3.0 if timeout > 5 else 5.0
             
-            response = requests.get(url, params=params, timeout=client_timeout)
+            response = self.http.get(url, params=params, timeout=client_timeout)
             response.raise_for_status()
             return response.json().get("result", [])
         
@@ -1,26 +1,137 @@
+
 import logging
 import os
+import queue
+import threading
+import time
+
+class TokenBucket:
+    """Telegram per-chat pacing: `capacity` burst, refilled at `rate` tokens per second."""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self):
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
 
 class TelegramErrorHandler(logging.Handler):
     """
     A custom logging handler that sends ERROR level messages to Telegram.
+    emit() only formats and enqueues (never blocks the scan loop); a worker thread
+    coalesces identical alerts within `window` seconds (first one immediately, then
+    one "+N more in last 60s" summary of the repeats) and paces sends with a token bucket.
     """
-    def __init__(self, bot):
+    def __init__(self, bot, window=60, per_minute=20, burst=5, max_queue=1000):
         super().__init__()
         self.bot = bot
         self.chat_id = os.getenv("TELEGRAM_CHAT_ID")
         self.setLevel(logging.ERROR)
 
+        self.window = window
+        self.bucket = TokenBucket(rate=per_minute / 60.0, capacity=burst)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._entries = {} # {key: {'text', 'unsent', 'sent_first', 'window_start'}} in arrival order
+        self._stop = threading.Event()
+        self.dropped = 0
+        self._worker = threading.Thread(target=self._run, name="TelegramAlerts", daemon=True)
+        self._worker.start()
+
     def emit(self, record):
         try:
             if not self.chat_id:
                 return
-            
-            log_entry = self.format(record)
-            msg = f"‼️ **SYSTEM ERROR ALERT** ‼️\n\n```\n{log_entry}\n```\n\n_Please check your terminal for more details._"
-            
-            # Use synchronous send if possible or just try/except
-            self.bot.send_message(msg, chat_id=self.chat_id)
+            # Telegram's own failures can't be reported over Telegram (and would loop via the sender)
+            if record.name.startswith('src.communication.telegram'):
+                return
+
+            key = (record.name, record.levelno, record.getMessage())
+            self._queue.put_nowait((key, self.format(record)))
+        except queue.Full:
+            self.dropped += 1
         except Exception:
             # Avoid infinite loops or crashing if telegram fails
             pass
+
+    def close(self):
+        self._stop.set()
+        self._worker.join(timeout=2.0)
+        super().close()
+
+    # --- Worker ---
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                key, text = self._queue.get(timeout=self._next_wakeup())
+                self._ingest(key, text)
+                # Drain whatever else arrived in the same burst before sending
+                while True:
+                    key, text = self._queue.get_nowait()
+                    self._ingest(key, text)
+            except queue.Empty:
+                pass
+            self._flush()
+
+    def _ingest(self, key, text):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = {'text': text, 'unsent': 1, 'sent_first': False, 'window_start': now}
+        else:
+            entry['unsent'] += 1
+            entry['text'] = text # Keep the latest occurrence for the summary
+
+    def _flush(self):
+        now = time.monotonic()
+        # New errors outrank summaries of ones the user has already seen
+        for entry in self._entries.values():
+            if entry['sent_first']:
+                continue
+            if not self.bucket.take():
+                return # Out of tokens: retry on the next wakeup, arrival order preserved
+            self._send(entry['text'])
+            entry['sent_first'] = True
+            entry['unsent'] -= 1 # The alert covers one occurrence; burst duplicates go in the summary
+
+        for key in list(self._entries.keys()):
+            entry = self._entries[key]
+            if now - entry['window_start'] < self.window:
+                continue
+            if entry['unsent'] == 0:
+                del self._entries[key] # No repeats: next occurrence alerts immediately
+                continue
+            if not self.bucket.take():
+                return
+            self._send(entry['text'], repeats=entry['unsent']) # Only occurrences not already alerted
+            # Roll the window: a still-firing error summarises again in `window` seconds
+            entry['unsent'] = 0
+            entry['window_start'] = now
+
+    def _next_wakeup(self):
+        if not self._entries:
+            return 1.0
+        now = time.monotonic()
+        pending_first = any(not e['sent_first'] for e in self._entries.values())
+        if pending_first:
+            return max(0.05, self.bucket.wait_time())
+        soonest = min(e['window_start'] + self.window for e in self._entries.values())
+        return min(1.0, max(0.05, soonest - now))
+
+    def _send(self, log_entry, repeats=0):
+        """repeats: Occurrences since the last message for this error (0 = the first alert itself)."""
+        try:
+            count_note = f" (+{repeats} more in last {self.window}s)" if repeats else ""
+            msg = f"‼️ **SYSTEM ERROR ALERT**{count_note} ‼️\n\n```\n{log_entry}\n```\n\n_Please check your terminal for more details._"
+            self.bot.send_message(msg, chat_id=self.chat_id)
+        except Exception:
+            pass
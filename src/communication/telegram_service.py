@@ -0,0 +1,139 @@
+# src/communication/telegram_service.py
+import itertools
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Outbound priorities (lower = sooner)
+PRIORITY_CRITICAL = 0 # Fills, kill switch, command confirmations
+PRIORITY_HIGH = 1     # Command replies, signals
+PRIORITY_NORMAL = 2   # Status / trade management notices
+PRIORITY_LOW = 3      # Charts / photos
+
+class TelegramService:
+    """
+    Background Telegram I/O for a TelegramBot.
+    - Poller thread: real long polling (getUpdates timeout=25s) into a thread-safe
+      command queue that the main loop drains without blocking.
+    - Sender thread: drains a priority queue of outbound messages/photos.
+    Exposes the TelegramBot interface (send_message, send_signal, send_photo,
+    get_updates, handle_command, chat_id) so callers don't change, but nothing
+    on the trading path ever waits on Telegram.
+    """
+    def __init__(self, bot, poll_timeout=25, max_outbound=500):
+        self.bot = bot
+        self.poll_timeout = poll_timeout
+        self.commands = queue.Queue()
+        self.outbound = queue.PriorityQueue(maxsize=max_outbound)
+        self._seq = itertools.count() # FIFO within the same priority
+        self._offset = None
+        self._stop = threading.Event()
+        self._threads = []
+
+        self.sent = 0
+        self.dropped = 0
+
+    # --- TelegramBot passthroughs ---
+    @property
+    def chat_id(self):
+        return self.bot.chat_id
+
+    @property
+    def signal_channel_id(self):
+        return self.bot.signal_channel_id
+
+    def handle_command(self, command, args, context=None):
+        return self.bot.handle_command(command, args, context)
+
+    # --- Lifecycle ---
+    def start(self):
+        if self._threads:
+            return self
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._poll_loop, name="TelegramPoller", daemon=True),
+            threading.Thread(target=self._send_loop, name="TelegramSender", daemon=True)
+        ]
+        for t in self._threads:
+            t.start()
+        logger.info("Telegram service started (long polling + outbound queue).")
+        return self
+
+    def stop(self, flush_timeout=5.0):
+        """Stops polling and gives the sender up to `flush_timeout` seconds to drain."""
+        deadline = time.time() + flush_timeout
+        while not self.outbound.empty() and time.time() < deadline:
+            time.sleep(0.05)
+        self._stop.set()
+        self._enqueue(PRIORITY_CRITICAL, None) # Wake the sender
+        for t in self._threads:
+            t.join(timeout=1.0)
+        self._threads = []
+
+    # --- Inbound ---
+    def get_updates(self, offset=None, timeout=0):
+        """Non-blocking: returns the updates queued by the poller (offset/timeout kept for compatibility)."""
+        updates = []
+        while True:
+            try:
+                update = self.commands.get_nowait()
+            except queue.Empty:
+                return updates
+            if offset is None or update.get('update_id', 0) >= offset:
+                updates.append(update)
+
+    def _poll_loop(self):
+        backoff = 1
+        while not self._stop.is_set():
+            started = time.time()
+            updates = self.bot.get_updates(offset=self._offset, timeout=self.poll_timeout)
+            for update in updates:
+                self._offset = update['update_id'] + 1
+                self.commands.put(update)
+
+            if updates or time.time() - started >= 1.0:
+                backoff = 1
+            else:
+                # Instant empty return = error path (network / 409): back off instead of spinning
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+
+    # --- Outbound ---
+    def send_message(self, message, chat_id=None, priority=PRIORITY_NORMAL):
+        return self._enqueue(priority, ('message', message, chat_id))
+
+    def send_signal(self, message, priority=PRIORITY_HIGH):
+        return self._enqueue(priority, ('signal', message))
+
+    def send_photo(self, photo_path, caption="", priority=PRIORITY_LOW):
+        return self._enqueue(priority, ('photo', photo_path, caption))
+
+    def _enqueue(self, priority, item):
+        try:
+            self.outbound.put_nowait((priority, next(self._seq), item))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Telegram outbound queue full. Dropped priority {priority} item.")
+            return False
+
+    def _send_loop(self):
+        while not self._stop.is_set():
+            priority, _, item = self.outbound.get()
+            if item is None:
+                continue
+            kind = item[0]
+            try:
+                if kind == 'message':
+                    self.bot.send_message(item[1], chat_id=item[2])
+                elif kind == 'signal':
+                    self.bot.send_signal(item[1])
+                elif kind == 'photo':
+                    self.bot.send_photo(item[1], caption=item[2])
+                self.sent += 1
+            except Exception as e:
+                # Bot methods already log failures; never let the sender die
+                logger.debug(f"Telegram sender error ({kind}): {e}")
@@ -2,8 +2,8 @@ import logging
 import os
 import json
 from datetime import datetime
-import requests
 import pandas as pd
+from src.utils.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -132,7 +132,7 @@ class RiskGuardrails:
         url = "https://nfs.faireconomy.media/ff_calendar_thisweek.xml"
         try:
             headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-            response = requests.get(url, headers=headers, timeout=10)
+            response = get_http_client().get(url, headers=headers, timeout=10)
             response.raise_for_status()
             
             # XML Parsing
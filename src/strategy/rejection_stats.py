@@ -0,0 +1,94 @@
+# src/strategy/rejection_stats.py
+import csv
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# --- Rejection Codes (Detector -> Code) ---
+SWEEP_WICK_TOO_SMALL = 'wick_too_small'
+SWEEP_NOT_RECLAIMED = 'not_reclaimed'
+SWEEP_EXTREME_BROKEN = 'extreme_broken'
+
+MSS_EXPIRED = 'expired'
+MSS_NO_SWING = 'no_swing'
+MSS_NO_BREAK = 'no_break'
+
+FVG_NO_GAP = 'no_gap'
+FVG_OUTSIDE_ZONE = 'outside_zone'
+FVG_MITIGATED = 'mitigated'
+
+class RejectionCounter:
+    """
+    In-memory, thread-safe tally of detector rejections per symbol.
+    Replaces the old stdout [DEBUG] prints: the scan loop only bumps a counter,
+    Telegram (/rejects) or the backtester samples it when needed.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {} # {symbol: Counter({(detector, code): n})}
+        self._last = {}   # {(symbol, detector): {'code': str, 'time': datetime, ...}}
+        self.started_at = datetime.now()
+
+    def record(self, symbol, detector, code, **detail):
+        symbol = symbol or 'UNKNOWN'
+        with self._lock:
+            self._counts.setdefault(symbol, Counter())[(detector, code)] += 1
+            self._last[(symbol, detector)] = dict(code=code, time=datetime.now(), **detail)
+
+    def sample(self, symbol=None):
+        """Returns {symbol: {detector: {code: count}}} (optionally for one symbol)."""
+        with self._lock:
+            symbols = [symbol] if symbol else list(self._counts.keys())
+            result = {}
+            for sym in symbols:
+                counts = self._counts.get(sym)
+                if not counts: continue
+                per_detector = {}
+                for (detector, code), n in counts.items():
+                    per_detector.setdefault(detector, {})[code] = n
+                result[sym] = per_detector
+            return result
+
+    def last(self, symbol, detector):
+        """Most recent rejection for a symbol/detector (or None)."""
+        with self._lock:
+            entry = self._last.get((symbol, detector))
+            return dict(entry) if entry else None
+
+    def totals(self):
+        """Counts aggregated across all symbols: {(detector, code): n}."""
+        with self._lock:
+            total = Counter()
+            for counts in self._counts.values():
+                total.update(counts)
+            return dict(total)
+
+    def export_rows(self):
+        """Flat rows for CSV / DataFrame export."""
+        with self._lock:
+            return [
+                {'symbol': sym, 'detector': detector, 'code': code, 'count': n}
+                for sym, counts in self._counts.items()
+                for (detector, code), n in sorted(counts.items())
+            ]
+
+    def to_csv(self, filepath):
+        rows = self.export_rows()
+        try:
+            with open(filepath, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=['symbol', 'detector', 'code', 'count'])
+                writer.writeheader()
+                writer.writerows(rows)
+            return filepath
+        except Exception as e:
+            logger.error(f"Failed to export rejection stats: {e}")
+            return None
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._last.clear()
+            self.started_at = datetime.now()
@@ -0,0 +1,180 @@
+# src/strategy/rsi_engine.py
+import logging
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RSI_SMA = 'sma'         # Simple rolling mean of gains/losses (legacy bot behaviour)
+RSI_WILDER = 'wilder'   # Wilder smoothing (matches broker / TradingView charts)
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    """Same arithmetic as pandas: loss=0 -> 100, both 0 -> NaN."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = np.divide(avg_gain, avg_loss)
+        return 100 - (100 / (1 + rs))
+
+def rsi_batch(closes, period=14, method=RSI_SMA):
+    """
+    Vectorized RSI for backtests / bulk scans.
+    closes: Series (returns Series on the same index), 1D array, or 2D (N, T) array
+    (one row per symbol, RSI computed along the last axis).
+    """
+    index = closes.index if isinstance(closes, pd.Series) else None
+    values = np.asarray(closes, dtype=float)
+    frame = pd.DataFrame(np.atleast_2d(values).T) # (T, N): one column per symbol
+
+    delta = frame.diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+
+    if method == RSI_WILDER:
+        avg_gain = _wilder_smooth(gain, period)
+        avg_loss = _wilder_smooth(loss, period)
+    else:
+        avg_gain = gain.rolling(window=period).mean()
+        avg_loss = loss.rolling(window=period).mean()
+
+    rsi = _rsi_from_averages(avg_gain.to_numpy(), avg_loss.to_numpy()).T
+    rsi = rsi.reshape(values.shape)
+
+    if index is not None:
+        return pd.Series(rsi, index=index, name=closes.name)
+    return rsi
+
+def _wilder_smooth(frame, period):
+    """Seed with the SMA of the first `period` moves, then EMA with alpha = 1/period."""
+    seeded = frame.copy()
+    seeded.iloc[:period] = np.nan
+    if len(frame) > period:
+        seeded.iloc[period] = frame.iloc[1:period + 1].mean()
+    return seeded.ewm(alpha=1.0 / period, adjust=False).mean()
+
+class IncrementalRSI:
+    """
+    Per-symbol RSI state updated in O(1) per CLOSED bar.
+    Keeps running average gain/loss (SMA window sums or Wilder averages) so the
+    scan loop doesn't re-run diff + rolling means over 50-200 candles every cycle.
+    """
+    def __init__(self, period=14, method=RSI_SMA):
+        if method not in (RSI_SMA, RSI_WILDER):
+            raise ValueError(f"Invalid RSI method: {method}. Options: {RSI_SMA}, {RSI_WILDER}")
+        self.period = period
+        self.method = method
+        self.reset()
+
+    def reset(self):
+        self.last_close = None
+        self.last_time = None
+        self.value = math.nan
+
+        # SMA state: rolling window of moves + running sums
+        self._gains = deque(maxlen=self.period)
+        self._losses = deque(maxlen=self.period)
+        self._sum_gain = 0.0
+        self._sum_loss = 0.0
+
+        # Wilder state
+        self.avg_gain = None
+        self.avg_loss = None
+
+    def update(self, close, time=None):
+        """Ingests one closed bar. Returns the RSI after this bar (NaN while warming up)."""
+        if self.last_close is None:
+            self.last_close = close
+            self.last_time = time
+            if self.method == RSI_SMA:
+                # Legacy batch RSI counts the first (NaN) diff as a 0 move, so its
+                # first value lands on bar `period - 1`. Mirror that warm-up.
+                self._gains.append(0.0)
+                self._losses.append(0.0)
+            return self.value
+
+        gain, loss = self._move(close)
+        self.last_close = close
+        self.last_time = time
+
+        if self.method == RSI_SMA:
+            if len(self._gains) == self.period:
+                self._sum_gain -= self._gains[0]
+                self._sum_loss -= self._losses[0]
+            self._gains.append(gain)
+            self._losses.append(loss)
+            self._sum_gain += gain
+            self._sum_loss += loss
+        else:
+            if self.avg_gain is None:
+                # Warm-up: collect the first `period` moves for the SMA seed
+                self._gains.append(gain)
+                self._losses.append(loss)
+                if len(self._gains) == self.period:
+                    self.avg_gain = sum(self._gains) / self.period
+                    self.avg_loss = sum(self._losses) / self.period
+            else:
+                self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+                self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+
+        self.value = self._value_from_state()
+        return self.value
+
+    def peek(self, close):
+        """RSI if `close` were the next bar (e.g. the forming candle). Does NOT mutate state."""
+        if self.last_close is None:
+            return math.nan
+        gain, loss = self._move(close)
+
+        if self.method == RSI_SMA:
+            if len(self._gains) < self.period - 1:
+                return math.nan
+            sum_gain, sum_loss = self._sum_gain + gain, self._sum_loss + loss
+            if len(self._gains) == self.period:
+                sum_gain -= self._gains[0]
+                sum_loss -= self._losses[0]
+            return float(_rsi_from_averages(sum_gain / self.period, sum_loss / self.period))
+
+        if self.avg_gain is None:
+            if len(self._gains) < self.period - 1:
+                return math.nan
+            avg_gain = (sum(self._gains) + gain) / self.period
+            avg_loss = (sum(self._losses) + loss) / self.period
+        else:
+            avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+            avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        return float(_rsi_from_averages(avg_gain, avg_loss))
+
+    def sync(self, candles):
+        """
+        Feeds the closed bars of `candles` newer than the last ingested bar and
+        returns the RSI including the final (forming) candle via peek().
+        """
+        if candles is None or candles.empty:
+            return math.nan
+
+        closed = candles.iloc[:-1]
+        if not closed.empty:
+            times = closed['time'].to_numpy()
+            if self.last_time is not None and (times[0] > self.last_time or times[-1] < self.last_time):
+                logger.debug("IncrementalRSI: History gap detected. Re-seeding from candles.")
+                self.reset()
+
+            start = int((times <= self.last_time).sum()) if self.last_time is not None else 0
+            closes = closed['close'].to_numpy(dtype=float)
+            for i in range(start, len(times)):
+                self.update(closes[i], times[i])
+
+        return self.peek(float(candles.iloc[-1]['close']))
+
+    def _move(self, close):
+        delta = close - self.last_close
+        return (delta if delta > 0 else 0.0), (-delta if delta < 0 else 0.0)
+
+    def _value_from_state(self):
+        if self.method == RSI_SMA:
+            if len(self._gains) < self.period:
+                return math.nan
+            return float(_rsi_from_averages(self._sum_gain / self.period, self._sum_loss / self.period))
+        if self.avg_gain is None:
+            return math.nan
+        return float(_rsi_from_averages(self.avg_gain, self.avg_loss))
@@ -2,304 +2,554 @@
 import pandas as pd
 import numpy as np
 import logging
+from src.strategy.structure_tracker import StructureTracker
+from src.strategy import rejection_stats as rej
+from src.strategy.rsi_engine import IncrementalRSI, rsi_batch, RSI_SMA
 
 logger = logging.getLogger(__name__)
 
+def _pivot_mask(values, width=1, find_high=True):
+    """
+    Vectorized pivot detection along the last axis.
+    A pivot at i must be STRICTLY above (highs) / below (lows) the `width` candles
+    on each side. Edges without enough neighbours are never pivots.
+    Works on 1D (T,) or stacked 2D (N, T) arrays.
+    """
+    values = np.asarray(values, dtype=float)
+    mask = np.zeros(values.shape, dtype=bool)
+    n = values.shape[-1]
+    if width < 1 or n < (2 * width + 1):
+        return mask
+
+    center = values[..., width:n - width]
+    valid = np.ones(center.shape, dtype=bool)
+    for k in range(1, width + 1):
+        left = values[..., width - k:n - width - k]
+        right = values[..., width + k:n - width + k]
+        if find_high:
+            valid &= (center > left) & (center > right)
+        else:
+            valid &= (center < left) & (center < right)
+
+    mask[..., width:n - width] = valid
+    return mask
+
+def _ohlc_arrays(df):
+    """Float64 NumPy views of the OHLC columns."""
+    return {col: df[col].to_numpy(dtype=float) for col in ('open', 'high', 'low', 'close')}
+
+def _sweep_levels(highs, lows, windows, exclude=5):
+    """
+    Base-range extremes for several lookback windows in one pass (last axis = time).
+    Window W covers the W candles before the excluded last `exclude`; None = full base.
+    Returns (level_high, level_low) shaped (..., len(windows)).
+    """
+    highs = np.asarray(highs, dtype=float)
+    n = highs.shape[-1]
+    base_high = highs[..., :n - exclude] # Not [:-exclude]: exclude=0 must keep the whole range
+    base_low = np.asarray(lows, dtype=float)[..., :n - exclude]
+    n_base = base_high.shape[-1]
+
+    # Reverse running max/min: position p = extreme of the last p+1 base candles
+    rev_max = np.maximum.accumulate(base_high[..., ::-1], axis=-1)
+    rev_min = np.minimum.accumulate(base_low[..., ::-1], axis=-1)
+    pos = [min(w, n_base) - 1 if w else n_base - 1 for w in windows]
+    return rev_max[..., pos], rev_min[..., pos]
+
+def _sweep_rules(arrays, level_high, level_low, recent=3, min_wick=0.1):
+    """
+    Evaluates the sweep rules for the last `recent` candles (newest first) against
+    every window level. Rule arrays are shaped (..., W, recent).
+    """
+    # Candidates newest first: k=0 -> candle -1
+    o, h, l, c = (np.asarray(arrays[col], dtype=float)[..., -recent:][..., ::-1]
+                  for col in ('open', 'high', 'low', 'close'))
+    total = h - l
+
+    # Extremes of the candles AFTER each candidate (for the counter-structure check)
+    newer_high = np.concatenate([np.full(h.shape[:-1] + (1,), -np.inf),
+                                 np.maximum.accumulate(h, axis=-1)[..., :-1]], axis=-1)
+    newer_low = np.concatenate([np.full(l.shape[:-1] + (1,), np.inf),
+                                np.minimum.accumulate(l, axis=-1)[..., :-1]], axis=-1)
+    # Closes from each candidate to NOW (for the time-to-reclaim check)
+    min_close_since = np.minimum.accumulate(c, axis=-1)
+    max_close_since = np.maximum.accumulate(c, axis=-1)
+
+    # Broadcast candidates (..., 1, R) against levels (..., W, 1)
+    lh = np.asarray(level_high, dtype=float)[..., :, None]
+    ll = np.asarray(level_low, dtype=float)[..., :, None]
+    cand = lambda a: a[..., None, :]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio_high = np.where(total > 0, (h - np.maximum(o, c)) / total, 0.0)
+        ratio_low = np.where(total > 0, (np.minimum(o, c) - l) / total, 0.0)
+
+    rules = {'recent': h.shape[-1]}
+    for side, breach, reclaim, ratio, reclaimed, broken, extreme in (
+        ('buy_side', cand(h) > lh, cand(c) < lh, ratio_high, cand(min_close_since) < lh, newer_high > h, h),
+        ('sell_side', cand(l) < ll, cand(c) > ll, ratio_low, cand(max_close_since) > ll, newer_low < l, l),
+    ):
+        wick_ok = np.broadcast_to(cand((total > 0) & (ratio >= min_wick)), breach.shape)
+        extreme_broken = np.broadcast_to(cand(broken), breach.shape)
+        rules[side] = {
+            'breach': breach,
+            'reclaim': reclaim,
+            'ratio': np.broadcast_to(cand(ratio), breach.shape),
+            'wick_ok': wick_ok,
+            'reclaimed': reclaimed,
+            'extreme_broken': extreme_broken,
+            'valid': breach & reclaim & wick_ok & reclaimed & ~extreme_broken,
+            'extreme': extreme
+        }
+    return rules
+
+def _scan_fvg(highs, lows, direction, eq_level, lookback=50):
+    """
+    Vectorized 3-candle FVG scan over 1D high/low arrays (oldest first).
+    Returns (fvg_list, reject_code) - reject_code is None when an FVG was found.
+    """
+    return _scan_fvg_batch(np.asarray(highs, dtype=float)[None, :], np.asarray(lows, dtype=float)[None, :],
+                           [direction], [eq_level], lookback)[0]
+
+def _scan_fvg_batch(highs, lows, directions, eq_levels, lookback=50):
+    """
+    3-candle FVG scan over stacked (N, T) high/low arrays, one direction/EQ per row.
+    Candle A = i-2, Candle C = i. Mitigation uses a reverse running min/max of the
+    FUTURE lows/highs, so every candidate is checked in O(1) instead of re-walking
+    all later candles. Returns [(fvg_list, reject_code), ...] per row.
+    """
+    n_rows, n = highs.shape
+    if n < 3: return [([], rej.FVG_NO_GAP) for _ in range(n_rows)]
+
+    # Candidate window: same bounds as the original backwards loop
+    start_idx = n - 1
+    end_idx = max(2, start_idx - lookback)
+    idx = np.arange(end_idx, start_idx + 1)
+
+    eq = np.asarray(eq_levels, dtype=float)[:, None]
+    bullish = np.array([d == 'bullish' for d in directions])[:, None]
+    bearish = np.array([d == 'bearish' for d in directions])[:, None]
+
+    # Long Setup: Gap between Candle A High and Candle C Low
+    bull_top = lows[:, idx]
+    bull_bottom = highs[:, idx - 2]
+    # Lowest low AFTER each candle (inf when nothing follows)
+    future_low = np.concatenate([np.minimum.accumulate(lows[:, ::-1], axis=1)[:, ::-1][:, 1:],
+                                 np.full((n_rows, 1), np.inf)], axis=1)
+    bull_gap = bull_bottom < bull_top
+    # Discount Check + Mitigated if any future Low <= gap_top
+    bull_zone = bull_gap & (bull_top < eq)
+    bull_valid = bull_zone & (future_low[:, idx] > bull_top)
+
+    # Short Setup: Gap between Candle A Low and Candle C High
+    bear_top = lows[:, idx - 2]
+    bear_bottom = highs[:, idx]
+    # Highest high AFTER each candle (-inf when nothing follows)
+    future_high = np.concatenate([np.maximum.accumulate(highs[:, ::-1], axis=1)[:, ::-1][:, 1:],
+                                  np.full((n_rows, 1), -np.inf)], axis=1)
+    bear_gap = bear_top > bear_bottom
+    # Premium Check + Mitigated if any future High >= gap_bottom
+    bear_zone = bear_gap & (bear_bottom > eq)
+    bear_valid = bear_zone & (future_high[:, idx] < bear_bottom)
+
+    top = np.where(bullish, bull_top, bear_top)
+    bottom = np.where(bullish, bull_bottom, bear_bottom)
+    entry = np.where(bullish, bull_top, bear_bottom)
+    gap = np.where(bullish, bull_gap, bear_gap & bearish)
+    in_zone = np.where(bullish, bull_zone, bear_zone & bearish)
+    valid = np.where(bullish, bull_valid, bear_valid & bearish)
+
+    results = []
+    for r in range(n_rows):
+        if not valid[r].any():
+            if in_zone[r].any(): code = rej.FVG_MITIGATED
+            elif gap[r].any(): code = rej.FVG_OUTSIDE_ZONE
+            else: code = rej.FVG_NO_GAP
+            results.append(([], code))
+            continue
+
+        fvg_list = []
+        # Most recent first
+        for k in np.flatnonzero(valid[r])[::-1]:
+            fvg_list.append({
+                'top': float(top[r, k]),
+                'bottom': float(bottom[r, k]),
+                'entry': float(entry[r, k]),
+                'type': directions[r],
+                'index': int(idx[k])
+            })
+        results.append((fvg_list, None))
+    return results
+
 class SMCLogic:
     def __init__(self):
         self.swing_lookback = 3 
+        # Rule constants (tunable: backtest_sweep.py)
+        self.sweep_min_wick = 0.1     # Sweep wick must be >= 10% of the candle range
+        self.sweep_min_candles = 20   # HTF candles needed before sweeps are evaluated
+        self.sweep_exclude = 5        # Newest HTF candles kept out of the base range (potential sweepers)
+        self.mss_expiry_hours = 8.0   # MSS must follow the sweep within this window
+        self.structure_trackers = {} # {(symbol, timeframe): StructureTracker}
+        self.rejections = rej.RejectionCounter() # Sampled by /rejects & backtest export
+        self.rsi_trackers = {} # {(symbol, timeframe, period, method): IncrementalRSI}
 
-    def calculate_rsi(self, series, period=14):
-        delta = series.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        return 100 - (100 / (1 + rs))
+    def get_structure_tracker(self, symbol, timeframe):
+        """Returns the persistent per-symbol structure tracker (created on first use)."""
+        key = (symbol, str(timeframe))
+        if key not in self.structure_trackers:
+            self.structure_trackers[key] = StructureTracker(pivot_width=max(1, self.swing_lookback // 2))
+        return self.structure_trackers[key]
 
-    def find_swings(self, df: pd.DataFrame):
+    def get_rsi_tracker(self, symbol, timeframe, period=14, method=RSI_SMA):
+        """Returns the persistent per-symbol incremental RSI (created on first use)."""
+        key = (symbol, str(timeframe), period, method)
+        if key not in self.rsi_trackers:
+            self.rsi_trackers[key] = IncrementalRSI(period=period, method=method)
+        return self.rsi_trackers[key]
+
+    def calculate_rsi(self, series, period=14, method=RSI_SMA):
+        """Batch RSI over a full series ('sma' = legacy rolling mean, 'wilder' = broker-style)."""
+        return rsi_batch(series, period=period, method=method)
+
+    def find_swings(self, df: pd.DataFrame, pivot_width=None):
         """
-        Identifies swing highs and lows based on the 3-candle pivot rule.
+        Identifies swing highs and lows based on the N-candle pivot rule.
         Adds 'is_swing_high', 'swing_high_val', 'is_swing_low', 'swing_low_val' columns.
+        pivot_width: Candles required on EACH side of the pivot (Default: derived from
+        swing_lookback, so 3 -> classic 3-candle pattern with 1 candle either side).
         """
-        df['is_swing_high'] = False
-        df['swing_high_val'] = np.nan
-        df['is_swing_low'] = False
-        df['swing_low_val'] = np.nan
-        
-        # 3-Candle Pattern: i-1 is the pivot. 
-        # High[i-1] > High[i-2] AND High[i-1] > High[i] -> Swing High at i-1
-        # Low[i-1] < Low[i-2] AND Low[i-1] < Low[i] -> Swing Low at i-1
-        # We iterate from index 2 to len-1 (need i-2, i-1, i)
-        
-        for i in range(2, len(df)):
-            # Check Swing High
-            if (df['high'].iloc[i-1] > df['high'].iloc[i-2]) and (df['high'].iloc[i-1] > df['high'].iloc[i]):
-                df.at[df.index[i-1], 'is_swing_high'] = True
-                df.at[df.index[i-1], 'swing_high_val'] = df['high'].iloc[i-1]
-            
-            # Check Swing Low
-            if (df['low'].iloc[i-1] < df['low'].iloc[i-2]) and (df['low'].iloc[i-1] < df['low'].iloc[i]):
-                df.at[df.index[i-1], 'is_swing_low'] = True
-                df.at[df.index[i-1], 'swing_low_val'] = df['low'].iloc[i-1]
-                
+        width = pivot_width if pivot_width is not None else max(1, self.swing_lookback // 2)
+
+        highs = df['high'].to_numpy(dtype=float)
+        lows = df['low'].to_numpy(dtype=float)
+
+        # Single array pass per side (no per-row .iloc / df.at writes)
+        is_high = _pivot_mask(highs, width, find_high=True)
+        is_low = _pivot_mask(lows, width, find_high=False)
+
+        df['is_swing_high'] = is_high
+        df['swing_high_val'] = np.where(is_high, highs, np.nan)
+        df['is_swing_low'] = is_low
+        df['swing_low_val'] = np.where(is_low, lows, np.nan)
+
         return df
 
-    def detect_htf_sweeps(self, htf_candles: pd.DataFrame):
-        if len(htf_candles) < 20: return {'swept': False}
+    def detect_htf_sweeps(self, htf_candles: pd.DataFrame, symbol=None):
+        """
+        symbol: Used to attribute rejections in self.rejections.
+        Non-swept results carry 'rejections': [{'code', 'side', 'candle', ...}].
+        """
+        if len(htf_candles) < self.sweep_min_candles: return {'swept': False}
 
-        # Lookback Window
-        lookback = 20
-        # Must exclude the 'potentially sweeping' candles
-        # Let's check the last 3 candles to see if any of them are valid sweeps
+        # Base range for PDH/PDL: everything except the 'potentially sweeping' last 5 candles.
+        # Check the last 3 candles to see if any of them are valid sweeps
         # that have reclaimed or are reclaiming.
-        
-        df_base = htf_candles.iloc[:-5] # Base range for PDH/PDL
-        period_high = df_base['high'].max()
-        period_low = df_base['low'].min()
-        
-        # DEBUG PRINT START
-        # print(f"DEBUG: Period High: {period_high}, Period Low: {period_low}")
-
-        # Check last 3 candles for a sweep
-        for i in range(1, 4):
-            candle = htf_candles.iloc[-i]
-            
-            # 1. Body Close Rule & Basic Sweep Check
-            # BUY SIDE SWEEP (High crosses PDH, Close < PDH)
-            if candle['high'] > period_high: 
-                # Check Reclaim immediately for Debugging
-                is_reclaim = candle['close'] < period_high
-                
+        arrays = _ohlc_arrays(htf_candles)
+        level_high, level_low = _sweep_levels(arrays['high'], arrays['low'], windows=[None], exclude=self.sweep_exclude)
+        rules = _sweep_rules(arrays, level_high, level_low, min_wick=self.sweep_min_wick)
+
+        return self._resolve_sweep(rules, (), level_high, level_low,
+                                   lambda i: htf_candles.iloc[-i]['time'], symbol)
+
+    def _resolve_sweep(self, rules, row, level_high, level_low, sweep_time_at, symbol=None):
+        """
+        Picks the first valid sweep from precomputed rule arrays (single window).
+        row: Index prefix into the rule arrays (() for one symbol, (n,) for batch row n).
+        sweep_time_at(i): Time of candle -i.
+        """
+        period_high = float(level_high[row + (0,)])
+        period_low = float(level_low[row + (0,)])
+
+        rejections = []
+        # Candidate order: newest candle first, Buy-side before Sell-side
+        for k in range(rules['recent']):
+            i = k + 1
+            at = row + (0, k)
+            for side in ('buy_side', 'sell_side'):
+                r = rules[side]
+                # 1. Body Close Rule & Basic Sweep Check
+                if not (r['breach'][at] and r['reclaim'][at]):
+                    continue
+
                 # 2. Wick Proportion Filter (>= 10% of total length)
-                total_len = candle['high'] - candle['low']
-                wick_len = candle['high'] - max(candle['open'], candle['close'])
-                ratio = wick_len / total_len if total_len > 0 else 0
-                
-                if not is_reclaim:
-                    # Log Breakout
-                    # print(f"   [DEBUG] Candle -{i} Breakout High (Not Reclaimed). Close {candle['close']} > {period_high}")
-                    pass
-                
-                if is_reclaim:
-                    if total_len > 0 and ratio >= 0.1:
-                        
-                        # 3. Time-to-Reclaim Rule
-                        reclaimed = False
-                        # Check candles from sweep index to end
-                        for j in range(-i, 0):
-                            if htf_candles.iloc[j]['close'] < period_high:
-                                reclaimed = True
-                                break
-                        
-                        if reclaimed:
-                            # 4. Counter-Structure Break Check
-                            # Ensure no candle between sweep and current has broken the 'Extreme'
-                            extreme_broken = False
-                            if i > 1:
-                                for k in range(-i+1, 0):
-                                    if htf_candles.iloc[k]['high'] > candle['high']:
-                                        extreme_broken = True
-                                        break
-                            
-                            if not extreme_broken:
-                                return {
-                                    'swept': True, 
-                                    'side': 'buy_side', 
-                                    'level': period_high, 
-                                    'extreme': candle['high'],
-                                    'sweep_candle_time': candle['time'],
-                                    'desc': "HTF High Sweep (Refined)"
-                                }
-                            else:
-                                print(f"   [DEBUG] Sweep Rej: Extreme Broken (-{i})")
-                        else:
-                            print(f"   [DEBUG] Sweep Rej: Not Reclaimed (-{i})")
-                    else:
-                        print(f"   [DEBUG] Sweep Rej: Wick Too Small {ratio:.2f} < 0.1 (-{i})")
-
-            # SELL SIDE SWEEP (Low crosses PDL, Close > PDL)
-            if candle['low'] < period_low:
-                is_reclaim = candle['close'] > period_low
-                
-                total_len = candle['high'] - candle['low']
-                wick_len = min(candle['open'], candle['close']) - candle['low']
-                ratio = wick_len / total_len if total_len > 0 else 0
-                
-                if not is_reclaim:
-                   # print(f"   [DEBUG] Candle -{i} Breakout Low (Not Reclaimed). Close {candle['close']} < {period_low}")
-                   pass
-
-                if is_reclaim:
-                    if total_len > 0 and ratio >= 0.1:
-                        reclaimed = False
-                        for j in range(-i, 0):
-                            if htf_candles.iloc[j]['close'] > period_low:
-                                reclaimed = True
-                                break
-                        
-                        if reclaimed:
-                            # 4. Counter-Structure Break Check
-                            extreme_broken = False
-                            if i > 1:
-                                for k in range(-i+1, 0):
-                                    if htf_candles.iloc[k]['low'] < candle['low']:
-                                        extreme_broken = True
-                                        break
-                            
-                            if not extreme_broken:
-                                return {
-                                    'swept': True, 
-                                    'side': 'sell_side', 
-                                    'level': period_low, 
-                                    'extreme': candle['low'],
-                                    'sweep_candle_time': candle['time'],
-                                    'desc': "HTF Low Sweep (Refined)"
-                                }
-                            else:
-                                print(f"   [DEBUG] Sweep Rej: Extreme Broken (-{i})")
-                        else:
-                             print(f"   [DEBUG] Sweep Rej: Not Reclaimed (-{i})")
-                    else:
-                        print(f"   [DEBUG] Sweep Rej: Wick Too Small {ratio:.2f} < 0.1 (-{i})")
-             
-        return {'swept': False, 'htf_high': period_high, 'htf_low': period_low}
+                if not r['wick_ok'][at]:
+                    code = rej.SWEEP_WICK_TOO_SMALL
+                # 3. Time-to-Reclaim Rule
+                elif not r['reclaimed'][at]:
+                    code = rej.SWEEP_NOT_RECLAIMED
+                # 4. Counter-Structure Break Check
+                elif r['extreme_broken'][at]:
+                    code = rej.SWEEP_EXTREME_BROKEN
+                else:
+                    return self._sweep_result(side, period_high if side == 'buy_side' else period_low,
+                                              r['extreme'][row + (k,)], sweep_time_at(i))
+
+                ratio = round(float(r['ratio'][at]), 3)
+                rejections.append({'code': code, 'side': side, 'candle': -i, 'ratio': ratio})
+                self.rejections.record(symbol, 'sweep', code, side=side, candle=-i, ratio=ratio)
 
-    def detect_mss(self, ltf_candles: pd.DataFrame, bias_direction, sweep_time):
+        return {'swept': False, 'htf_high': period_high, 'htf_low': period_low, 'rejections': rejections}
+
+    def detect_htf_sweeps_multi(self, htf_candles: pd.DataFrame, windows=(20, 50, 100)):
+        """
+        Multi-range liquidity scan. Each window W uses the W H1 candles before the
+        excluded last 5 as its base range; all candidates x windows are evaluated
+        in one array pass. Returns EVERY qualifying sweep (tagged with 'window').
+        """
+        if len(htf_candles) < self.sweep_min_candles: return []
+
+        arrays = _ohlc_arrays(htf_candles)
+        level_high, level_low = _sweep_levels(arrays['high'], arrays['low'], windows=list(windows), exclude=self.sweep_exclude)
+        rules = _sweep_rules(arrays, level_high, level_low, min_wick=self.sweep_min_wick)
+
+        sweeps = []
+        for w_idx, window in enumerate(windows):
+            for k in range(rules['recent']):
+                for side in ('buy_side', 'sell_side'):
+                    if not rules[side]['valid'][w_idx, k]:
+                        continue
+                    level = level_high[w_idx] if side == 'buy_side' else level_low[w_idx]
+                    sweep = self._sweep_result(side, float(level), rules[side]['extreme'][k],
+                                               htf_candles.iloc[-(k + 1)]['time'])
+                    sweep['window'] = window
+                    sweeps.append(sweep)
+        return sweeps
+
+    def _sweep_result(self, side, level, extreme, sweep_time):
+        return {
+            'swept': True, 
+            'side': side, 
+            'level': level, 
+            'extreme': float(extreme),
+            'sweep_candle_time': sweep_time,
+            'desc': "HTF High Sweep (Refined)" if side == 'buy_side' else "HTF Low Sweep (Refined)"
+        }
+
+    def detect_mss(self, ltf_candles: pd.DataFrame, bias_direction, sweep_time, tracker=None, symbol=None):
+        """
+        tracker: Optional StructureTracker for this symbol. When given, only the new
+        closed bars are ingested and swings are read from its state instead of
+        re-running find_swings over the full history.
+        Non-MSS results carry a 'reject_code' (expired / no_swing / no_break).
+        """
         current_time = ltf_candles.iloc[-1]['time']
         time_diff = (current_time - sweep_time).total_seconds() / 3600
         
         # STRICT RULE: MSS must be WITHIN 90 mins (User removed 30m min limit)
         # if time_diff < 0.5: return ... (Removed)
         
-        if time_diff > 8.0:
-            return {'mss': False, 'reason': 'Expired (>4h)'}
+        if time_diff > self.mss_expiry_hours:
+            return self._mss_reject(symbol, rej.MSS_EXPIRED, reason='Expired (>4h)')
 
-        ltf_candles = self.find_swings(ltf_candles)
         current_candle = ltf_candles.iloc[-1]
+        structure = self.read_structure(ltf_candles, tracker)
         
         if bias_direction == 'sell_side': # Long Bias
-             last_swing_highs = ltf_candles[ltf_candles['is_swing_high'] == True].tail(3)
-             if last_swing_highs.empty: return {'mss': False}
-             
-             target_swing = last_swing_highs.iloc[-1]
-             target_level = target_swing['swing_high_val']
+             target_level = structure['swing_high']
+             if target_level is None: return self._mss_reject(symbol, rej.MSS_NO_SWING)
              
              if current_candle['close'] > target_level:
                  return {
                      'mss': True, 
                      'time': current_time,
                      'level': target_level,
-                     'leg_low': ltf_candles.tail(12)['low'].min(), 
+                     'leg_low': structure['leg_low'], 
                      'leg_high': current_candle['high']
                  }
              else:
-                 return {'mss': False, 'trigger_level': target_level, 'type': 'above'}
+                 return self._mss_reject(symbol, rej.MSS_NO_BREAK, trigger_level=target_level, type='above')
 
         elif bias_direction == 'buy_side': # Short Bias
-             last_swing_lows = ltf_candles[ltf_candles['is_swing_low'] == True].tail(3)
-             if last_swing_lows.empty: return {'mss': False}
-             
-             target_swing = last_swing_lows.iloc[-1]
-             target_level = target_swing['swing_low_val']
+             target_level = structure['swing_low']
+             if target_level is None: return self._mss_reject(symbol, rej.MSS_NO_SWING)
              
              if current_candle['close'] < target_level:
                  return {
                      'mss': True, 
                      'time': current_time,
                      'level': target_level,
-                     'leg_high': ltf_candles.tail(12)['high'].max(), 
+                     'leg_high': structure['leg_high'], 
                      'leg_low': current_candle['low']
                  }
              else:
-                 return {'mss': False, 'trigger_level': target_level, 'type': 'below'}
+                 return self._mss_reject(symbol, rej.MSS_NO_BREAK, trigger_level=target_level, type='below')
                  
         return {'mss': False}
 
-    def find_fvg(self, ltf_candles: pd.DataFrame, direction, leg_high, leg_low, lookback=50):
+    def _mss_reject(self, symbol, code, **extra):
+        self.rejections.record(symbol, 'mss', code)
+        return dict(mss=False, reject_code=code, **extra)
+
+    def read_structure(self, ltf_candles: pd.DataFrame, tracker=None):
+        """
+        Swing/leg view of `ltf_candles` used by the MSS rules (entry and structural exit).
+        tracker: Optional StructureTracker. Its swings are limited to the ones find_swings()
+        could confirm inside this window, so both paths see the same structure.
+        """
+        if tracker is None:
+            return self._structure_from_history(ltf_candles.copy())
+
+        structure = tracker.sync(ltf_candles).snapshot(ltf_candles.iloc[-1])
+        # find_swings() can't confirm a pivot in the first `pivot_width` rows of the window
+        first_pivot_time = ltf_candles.iloc[min(tracker.pivot_width, len(ltf_candles) - 1)]['time']
+        for side in ('swing_high', 'swing_low'):
+            if structure[f'{side}_time'] is not None and structure[f'{side}_time'] < first_pivot_time:
+                structure[side] = None
+                structure[f'{side}_time'] = None
+        return structure
+
+    def _structure_from_history(self, ltf_candles: pd.DataFrame):
+        """Full-history fallback: same view as StructureTracker.snapshot()."""
+        ltf_candles = self.find_swings(ltf_candles)
+        swing_highs = ltf_candles[ltf_candles['is_swing_high'] == True]
+        swing_lows = ltf_candles[ltf_candles['is_swing_low'] == True]
+        leg = ltf_candles.tail(12)
+        return {
+            'swing_high': swing_highs.iloc[-1]['swing_high_val'] if not swing_highs.empty else None,
+            'swing_high_time': swing_highs.iloc[-1]['time'] if not swing_highs.empty else None,
+            'swing_low': swing_lows.iloc[-1]['swing_low_val'] if not swing_lows.empty else None,
+            'swing_low_time': swing_lows.iloc[-1]['time'] if not swing_lows.empty else None,
+            'leg_high': leg['high'].max(),
+            'leg_low': leg['low'].min()
+        }
+
+    def find_fvg(self, ltf_candles: pd.DataFrame, direction, leg_high, leg_low, lookback=50, symbol=None):
         """
         Scans for UNMITIGATED Fair Value Gaps (FVGs) within the last `lookback` candles.
         Returns a list of valid FVGs sorted by recency (most recent first).
+        An empty result is recorded in self.rejections (no_gap / outside_zone / mitigated).
         """
-        eq_level = (leg_high + leg_low) / 2
-        fvg_list = []
-        
         # Ensure enough data
         if len(ltf_candles) < 3: return []
-        
-        # Iterate backwards from the most recent completed candle
-        # i goes from (len-1) down to (len-1 - lookback)
-        start_idx = len(ltf_candles) - 1
-        end_idx = max(2, start_idx - lookback)
-        
-        for i in range(start_idx, end_idx - 1, -1):
-            eval_idx = i
-            
-            # Candle C (Current in loop), B (Middle), A (First)
-            # FVG is formed between A and C
-            candle_c = ltf_candles.iloc[eval_idx] 
-            # candle_b = ltf_candles.iloc[eval_idx-1]
-            candle_a = ltf_candles.iloc[eval_idx-2]
-            
-            fvg_found = None
-            
-            if direction == 'bullish': # Long Setup
-                # Gap between Candle A High and Candle C Low
-                if candle_a['high'] < candle_c['low']:
-                    gap_top = candle_c['low']
-                    gap_bottom = candle_a['high']
-                    
-                    # Discount Check (Optional/Strict)
-                    if gap_top < eq_level: 
-                         fvg_found = {
-                             'top': gap_top, 
-                             'bottom': gap_bottom, 
-                             'entry': gap_top, 
-                             'type': 'bullish',
-                             'index': eval_idx
-                         }
-
-            elif direction == 'bearish': # Short Setup
-                # Gap between Candle A Low and Candle C High
-                if candle_a['low'] > candle_c['high']:
-                    gap_top = candle_a['low']
-                    gap_bottom = candle_c['high']
-                    
-                    # Premium Check
-                    if gap_bottom > eq_level: 
-                         fvg_found = {
-                             'top': gap_top, 
-                             'bottom': gap_bottom, 
-                             'entry': gap_bottom, 
-                             'type': 'bearish',
-                             'index': eval_idx
-                         }
-            
-            if fvg_found:
-                # MITIGATION CHECK
-                # We need to check if any candle AFTER this FVG (index > eval_idx) has filled the gap.
-                is_mitigated = False
-                
-                # Check all candles from eval_idx + 1 to NOW
-                # If any candle's wick enters the gap zone, it's mitigated.
-                for j in range(eval_idx + 1, len(ltf_candles)):
-                    future_candle = ltf_candles.iloc[j]
-                    
-                    if direction == 'bullish':
-                        # Valid Bullish FVG Zone: [gap_bottom, gap_top]
-                        # Mitigated if Future Low <= gap_top (Price came back down into it)
-                        if future_candle['low'] <= fvg_found['top']:
-                            is_mitigated = True
-                            break
-                            
-                    elif direction == 'bearish':
-                        # Valid Bearish FVG Zone: [gap_bottom, gap_top]
-                        # Mitigated if Future High >= gap_bottom (Price came back up into it)
-                        if future_candle['high'] >= fvg_found['bottom']:
-                            is_mitigated = True
-                            break
-                
-                if not is_mitigated:
-                    # Add to list if clean
-                    fvg_list.append(fvg_found)
-                    
+
+        highs = ltf_candles['high'].to_numpy(dtype=float)
+        lows = ltf_candles['low'].to_numpy(dtype=float)
+        fvg_list, reject_code = _scan_fvg(highs, lows, direction, (leg_high + leg_low) / 2, lookback)
+        if reject_code:
+            self.rejections.record(symbol, 'fvg', reject_code, direction=direction)
         return fvg_list
+
+    @staticmethod
+    def stack_candles(candle_map, length=None, symbols=None):
+        """
+        Aligns per-symbol candle DataFrames into (N, T) arrays for evaluate_batch().
+        Uses the last `length` rows of each frame (Default: shortest frame).
+        symbols=None: symbols with missing/short data are dropped.
+        symbols=[...]: rows follow that order exactly (e.g. the HTF stack's symbols when
+        stacking LTF); a missing or short symbol raises ValueError instead of shifting rows.
+        Returns (symbols, {'time', 'open', 'high', 'low', 'close'}).
+        """
+        frames = {sym: df for sym, df in candle_map.items() if df is not None and not df.empty}
+        if symbols is not None:
+            missing = [sym for sym in symbols if sym not in frames]
+            if missing:
+                raise ValueError(f"stack_candles: no candles for {missing}")
+            frames = {sym: frames[sym] for sym in symbols}
+        if not frames:
+            return [], {}
+        if length is None:
+            length = min(len(df) for df in frames.values())
+
+        if symbols is not None:
+            short = [sym for sym in symbols if len(frames[sym]) < length]
+            if short:
+                raise ValueError(f"stack_candles: fewer than {length} candles for {short}")
+            symbols = list(symbols)
+        else:
+            symbols = [sym for sym, df in frames.items() if len(df) >= length]
+        tensor = {}
+        for col in ('open', 'high', 'low', 'close'):
+            tensor[col] = np.stack([frames[sym][col].to_numpy(dtype=float)[-length:] for sym in symbols]) \
+                if symbols else np.empty((0, length))
+        tensor['time'] = np.stack([pd.to_datetime(frames[sym]['time']).to_numpy()[-length:] for sym in symbols]) \
+            if symbols else np.empty((0, length), dtype='datetime64[ns]')
+        return symbols, tensor
+
+    def evaluate_batch(self, symbols, htf, ltf=None):
+        """
+        Vectorized Sweep -> MSS -> FVG pipeline for N symbols in one call.
+        htf / ltf: Aligned arrays {'time', 'open', 'high', 'low', 'close'} shaped (N, T)
+        (see stack_candles). Row n of both belongs to symbols[n]: stack LTF with
+        stack_candles(ltf_map, symbols=symbols). Row-count mismatches raise ValueError.
+        Returns {symbol: {'sweep': dict, 'mss': dict|None, 'fvgs': list|None}} using the
+        same dict contracts as detect_htf_sweeps / detect_mss / find_fvg.
+        """
+        for name, tensor in (('htf', htf), ('ltf', ltf)):
+            if tensor and tensor['high'].shape[0] != len(symbols):
+                raise ValueError(f"evaluate_batch: {name} has {tensor['high'].shape[0]} rows for {len(symbols)} symbols")
+
+        results = {sym: {'sweep': {'swept': False}, 'mss': None, 'fvgs': None} for sym in symbols}
+        if not symbols or htf['high'].shape[-1] < self.sweep_min_candles:
+            return results
+
+        # --- 1. HTF Sweeps (all symbols, one array pass) ---
+        level_high, level_low = _sweep_levels(htf['high'], htf['low'], windows=[None], exclude=self.sweep_exclude)
+        rules = _sweep_rules(htf, level_high, level_low, min_wick=self.sweep_min_wick)
+        for n, sym in enumerate(symbols):
+            results[sym]['sweep'] = self._resolve_sweep(rules, (n,), level_high, level_low,
+                                                        lambda i, n=n: pd.Timestamp(htf['time'][n, -i]), sym)
+
+        swept_rows = [n for n, sym in enumerate(symbols) if results[sym]['sweep']['swept']]
+        if ltf is None or not swept_rows or ltf['high'].shape[-1] < 3:
+            return results
+
+        # --- 2. LTF MSS (swings for all swept symbols at once) ---
+        rows = np.array(swept_rows)
+        highs, lows, closes = ltf['high'][rows], ltf['low'][rows], ltf['close'][rows]
+        width = max(1, self.swing_lookback // 2)
+        is_high = _pivot_mask(highs, width, find_high=True)
+        is_low = _pivot_mask(lows, width, find_high=False)
+
+        # Last swing per row (argmax on the reversed mask = most recent pivot)
+        t_last = highs.shape[-1] - 1
+        last_high_idx = t_last - np.argmax(is_high[:, ::-1], axis=1)
+        last_low_idx = t_last - np.argmax(is_low[:, ::-1], axis=1)
+        leg_high = highs[:, -12:].max(axis=1)
+        leg_low = lows[:, -12:].min(axis=1)
+
+        fvg_rows, fvg_dirs, fvg_eq = [], [], []
+        for j, n in enumerate(swept_rows):
+            sym = symbols[n]
+            sweep = results[sym]['sweep']
+            current_time = pd.Timestamp(ltf['time'][n, -1])
+            if (current_time - sweep['sweep_candle_time']).total_seconds() / 3600 > self.mss_expiry_hours:
+                results[sym]['mss'] = self._mss_reject(sym, rej.MSS_EXPIRED, reason='Expired (>4h)')
+                continue
+
+            if sweep['side'] == 'sell_side': # Long Bias
+                if not is_high[j].any():
+                    results[sym]['mss'] = self._mss_reject(sym, rej.MSS_NO_SWING)
+                    continue
+                target_level = float(highs[j, last_high_idx[j]])
+                if closes[j, -1] > target_level:
+                    mss = {'mss': True, 'time': current_time, 'level': target_level,
+                           'leg_low': float(leg_low[j]), 'leg_high': float(highs[j, -1])}
+                else:
+                    mss = self._mss_reject(sym, rej.MSS_NO_BREAK, trigger_level=target_level, type='above')
+            else: # Short Bias
+                if not is_low[j].any():
+                    results[sym]['mss'] = self._mss_reject(sym, rej.MSS_NO_SWING)
+                    continue
+                target_level = float(lows[j, last_low_idx[j]])
+                if closes[j, -1] < target_level:
+                    mss = {'mss': True, 'time': current_time, 'level': target_level,
+                           'leg_high': float(leg_high[j]), 'leg_low': float(lows[j, -1])}
+                else:
+                    mss = self._mss_reject(sym, rej.MSS_NO_BREAK, trigger_level=target_level, type='below')
+
+            results[sym]['mss'] = mss
+            if mss['mss']:
+                fvg_rows.append(n)
+                fvg_dirs.append('bullish' if sweep['side'] == 'sell_side' else 'bearish')
+                fvg_eq.append((mss['leg_high'] + mss['leg_low']) / 2)
+
+        # --- 3. FVG Entries (all MSS-confirmed symbols at once) ---
+        if fvg_rows:
+            rows = np.array(fvg_rows)
+            scans = _scan_fvg_batch(ltf['high'][rows], ltf['low'][rows], fvg_dirs, fvg_eq)
+            for n, direction, (fvg_list, reject_code) in zip(fvg_rows, fvg_dirs, scans):
+                if reject_code:
+                    self.rejections.record(symbols[n], 'fvg', reject_code, direction=direction)
+                results[symbols[n]]['fvgs'] = fvg_list
+
+        return results
@@ -0,0 +1,118 @@
+# src/strategy/structure_tracker.py
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class StructureTracker:
+    """
+    Streaming swing/structure state for ONE symbol + timeframe.
+    Fed closed bars one at a time (O(pivot_width) per bar), it keeps the latest
+    confirmed swing high/low and the rolling leg extremes so MSS checks don't
+    have to re-run find_swings over the full candle history every cycle.
+    """
+    def __init__(self, pivot_width=1, leg_window=12):
+        self.pivot_width = max(1, int(pivot_width))
+        self.leg_window = leg_window
+        self.reset()
+
+    def reset(self):
+        size = 2 * self.pivot_width + 1
+        self._win_time = deque(maxlen=size)
+        self._win_high = deque(maxlen=size)
+        self._win_low = deque(maxlen=size)
+        self._leg_high = deque(maxlen=self.leg_window)
+        self._leg_low = deque(maxlen=self.leg_window)
+
+        self.last_time = None
+        self.bars_seen = 0
+        self.swing_high = None # {'time': ..., 'price': ...}
+        self.swing_low = None
+
+    def update(self, time, high, low):
+        """Ingests a single CLOSED bar and confirms the pivot `pivot_width` bars back."""
+        self._win_time.append(time)
+        self._win_high.append(high)
+        self._win_low.append(low)
+        self._leg_high.append(high)
+        self._leg_low.append(low)
+        self.last_time = time
+        self.bars_seen += 1
+
+        pivot = self._check_pivot(list(self._win_time), list(self._win_high), list(self._win_low))
+        if pivot['high']: self.swing_high = pivot['high']
+        if pivot['low']: self.swing_low = pivot['low']
+
+    def sync(self, candles):
+        """
+        Feeds only the closed bars of `candles` newer than the last ingested bar.
+        The final row is treated as the forming candle and is NOT ingested.
+        Resets automatically if the new window doesn't overlap the stored history.
+        """
+        if candles is None or len(candles) < 2:
+            return self
+
+        closed = candles.iloc[:-1]
+        times = closed['time'].to_numpy()
+
+        if self.last_time is not None and (times[0] > self.last_time or times[-1] < self.last_time):
+            logger.debug("StructureTracker: History gap detected. Re-seeding from candles.")
+            self.reset()
+
+        start = 0
+        if self.last_time is not None:
+            start = int((times <= self.last_time).sum())
+
+        highs = closed['high'].to_numpy(dtype=float)
+        lows = closed['low'].to_numpy(dtype=float)
+        for i in range(start, len(times)):
+            self.update(times[i], highs[i], lows[i])
+        return self
+
+    def snapshot(self, current_bar=None):
+        """
+        Returns the structure view used by the MSS rules.
+        current_bar: The forming candle (dict/Series with high/low). It can confirm
+        a provisional pivot on the last closed bar and is included in leg extremes,
+        matching find_swings() run over closed bars + current candle.
+        """
+        swing_high = self.swing_high
+        swing_low = self.swing_low
+        leg_highs = list(self._leg_high)
+        leg_lows = list(self._leg_low)
+
+        if current_bar is not None:
+            size = 2 * self.pivot_width
+            times = list(self._win_time)[-size:] + [current_bar.get('time')]
+            highs = list(self._win_high)[-size:] + [float(current_bar['high'])]
+            lows = list(self._win_low)[-size:] + [float(current_bar['low'])]
+            pivot = self._check_pivot(times, highs, lows)
+            if pivot['high']: swing_high = pivot['high']
+            if pivot['low']: swing_low = pivot['low']
+
+            leg_highs = leg_highs[-(self.leg_window - 1):] + [float(current_bar['high'])]
+            leg_lows = leg_lows[-(self.leg_window - 1):] + [float(current_bar['low'])]
+
+        return {
+            'swing_high': swing_high['price'] if swing_high else None,
+            'swing_high_time': swing_high['time'] if swing_high else None,
+            'swing_low': swing_low['price'] if swing_low else None,
+            'swing_low_time': swing_low['time'] if swing_low else None,
+            'leg_high': max(leg_highs) if leg_highs else None,
+            'leg_low': min(leg_lows) if leg_lows else None
+        }
+
+    def _check_pivot(self, times, highs, lows):
+        """Strict pivot test on the centre of a (2 * width + 1) window."""
+        result = {'high': None, 'low': None}
+        w = self.pivot_width
+        if len(highs) < 2 * w + 1:
+            return result
+
+        c_high, c_low = highs[w], lows[w]
+        others = [i for i in range(2 * w + 1) if i != w]
+        if all(c_high > highs[i] for i in others):
+            result['high'] = {'time': times[w], 'price': c_high}
+        if all(c_low < lows[i] for i in others):
+            result['low'] = {'time': times[w], 'price': c_low}
+        return result
@@ -9,6 +9,12 @@ class TradeManager:
         self.state_manager = state_manager
         self.smc = smc_logic if smc_logic else SMCLogic()
         self.bot = telegram_bot
+
+        # Management levels in R (tunable: backtest_sweep.py)
+        self.be_trigger_r = 1.5   # Move SL to BE + buffer
+        self.be_buffer_r = 0.25   # Locked-in profit once BE triggers
+        self.partial_r = 2.0      # Partial TP (and start trailing)
+        self.partial_pct = 0.3    # Fraction closed at partial_r
         
         # Load Preferences
         self.trailing_enabled = self.state_manager.state.get('trailing_enabled', True)
@@ -19,10 +25,11 @@ class TradeManager:
         self.state_manager.save_state()
         return enabled
 
-    def manage_active_trade(self, trade, current_price, ltf_candles=None):
+    def manage_active_trade(self, trade, current_price, ltf_candles=None, structure_tracker=None):
         """
         Block 3.2: Trade Lifecycle & Trailing Management.
         Includes Structural Smart Exit (Reversal MSS).
+        structure_tracker: Optional StructureTracker for the symbol (skips find_swings).
         
         1. BE Trigger: At 1.5R, move SL to (Entry - 0.25R buffer).
         2. Partial TP: At 2.0R, close 30%.
@@ -51,18 +58,16 @@ class TradeManager:
             # User guideline: "reversal MSS on the 5m chart". 
             try:
                 # Analyze structure
-                df_swings = self.smc.find_swings(ltf_candles.copy())
-                last_candle = df_swings.iloc[-1]
+                last_candle = ltf_candles.iloc[-1]
+                structure = self.smc.read_structure(ltf_candles, structure_tracker)
                 
                 if direction == 'long':
                     # Check for Bearish MSS (Break of Swing Low)
                     # Find last confirmed swing low (excluding current candle if it's forming, but finding swings needs lookback)
                     # find_swings marks i-1. 
-                    swing_lows = df_swings[df_swings['is_swing_low'] == True]
-                    if not swing_lows.empty:
-                        last_swing = swing_lows.iloc[-1]
+                    if structure['swing_low'] is not None:
                         # If current candle CLOSE is BELOW that swing low
-                        if last_candle['close'] < last_swing['swing_low_val']:
+                        if last_candle['close'] < structure['swing_low']:
                             logger.warning(f"🚨 Structural Exit: Bearish MSS detected for {symbol}. Closing Long immediately.")
                             self.bridge.close_position(trade['ticket'], pct=1.0)
                             
@@ -91,10 +96,8 @@ class TradeManager:
                             
                 elif direction == 'short':
                     # Check for Bullish MSS (Break of Swing High)
-                    swing_highs = df_swings[df_swings['is_swing_high'] == True]
-                    if not swing_highs.empty:
-                        last_swing = swing_highs.iloc[-1]
-                        if last_candle['close'] > last_swing['swing_high_val']:
+                    if structure['swing_high'] is not None:
+                        if last_candle['close'] > structure['swing_high']:
                              logger.warning(f"🚨 Structural Exit: Bullish MSS detected for {symbol}. Closing Short immediately.")
                              self.bridge.close_position(trade['ticket'], pct=1.0)
                              
@@ -111,7 +114,7 @@ class TradeManager:
                 logger.error(f"Smart Exit Check Failed: {e}")
 
         # 1. Break-Even Check (1.5R)
-        if current_r >= 1.5 and not trade.get('is_be', False):
+        if current_r >= self.be_trigger_r and not trade.get('is_be', False):
             # Move SL to Entry + 0.25R (Buffer) matches specific prompt:
             # "move the Stop Loss to -0.25R (entry price plus a small buffer for fees)"
             # Wait, user said "-0.25R" relative to risk? 
@@ -119,7 +122,7 @@ class TradeManager:
             # Or locking in 0.25R profit? "entry price plus a small buffer" implies profit.
             # Let's assume locking in 0.25R Profit.
             
-            buffer = 0.25 * r_distance
+            buffer = self.be_buffer_r * r_distance
             new_sl = 0
             
             if direction == 'long':
@@ -134,15 +137,15 @@ class TradeManager:
             self.state_manager.save_state()
 
         # 2. Partial TP (2.0R)
-        if current_r >= 2.0 and not trade.get('partial_taken', False):
-            logger.info(f"Triggering Partial TP (30%) for {symbol} at {current_r:.2f}R")
+        if current_r >= self.partial_r and not trade.get('partial_taken', False):
+            logger.info(f"Triggering Partial TP ({self.partial_pct:.0%}) for {symbol} at {current_r:.2f}R")
             # Close 30%
-            self.bridge.close_position(trade['ticket'], pct=0.3)
+            self.bridge.close_position(trade['ticket'], pct=self.partial_pct)
             trade['partial_taken'] = True
             self.state_manager.save_state()
             
         # 3. Trailing SL (Post 2.0R)
-        if current_r >= 2.0 and ltf_candles is not None and not ltf_candles.empty and self.trailing_enabled:
+        if current_r >= self.partial_r and ltf_candles is not None and not ltf_candles.empty and self.trailing_enabled:
             # Trailing Logic: Trail behind the extreme of the last 3 closed candles
             # This is a robust way to trail market structure without complex swing detection
             
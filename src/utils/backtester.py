@@ -9,7 +9,7 @@ logger = logging.getLogger(__name__)
 class Backtester:
     def __init__(self):
         self.smc = SMCLogic()
-        self.visualizer = Visualizer(export_dir="backtest_results")
+        self.visualizer = Visualizer(export_dir="backtest_results", renderer="fast")
         self.results = []
 
     def run(self, data_path):
@@ -0,0 +1,47 @@
+# src/utils/bar_scheduler.py
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Channel -> bar length (seconds)
+DEFAULT_CHANNELS = {
+    'H1': 3600,      # HTF sweep evaluation
+    'M5': 300,       # MSS / FVG evaluation
+    'REACTION': 300  # Pending-setup reaction candle
+}
+
+class BarCloseScheduler:
+    """
+    Tells the main loop WHEN a symbol's SMC rules need re-evaluating.
+    Each (symbol, channel) is due once per bar: after a bar close (plus `settle`
+    seconds so the broker has published the new bar) until done() is called.
+    Evaluations that are skipped (spread, news, pause) stay due and are retried.
+    """
+    def __init__(self, channels=None, settle=2.0):
+        self.channels = dict(channels or DEFAULT_CHANNELS)
+        self.settle = settle
+        self._done = {} # {(symbol, channel): bar index last evaluated}
+
+    def bar_index(self, channel, now=None):
+        now = time.time() if now is None else now
+        return int((now - self.settle) // self.channels[channel])
+
+    def is_due(self, symbol, channel, now=None):
+        return self._done.get((symbol, channel)) != self.bar_index(channel, now)
+
+    def done(self, symbol, channel, now=None):
+        self._done[(symbol, channel)] = self.bar_index(channel, now)
+
+    def reset(self, symbol=None):
+        """Forces re-evaluation (e.g. after a reconnect or a manual /scan)."""
+        if symbol is None:
+            self._done.clear()
+            return
+        for key in [k for k in self._done if k[0] == symbol]:
+            del self._done[key]
+
+    def seconds_until_next_close(self, now=None):
+        """Time until the earliest channel's next bar close (+ settle)."""
+        now = time.time() if now is None else now
+        return min(period - ((now - self.settle) % period) for period in self.channels.values())
@@ -0,0 +1,98 @@
+# src/utils/candle_cache.py
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+def timeframe_seconds(timeframe):
+    """
+    Bar length in seconds for both bridge conventions.
+    Bybit: '1', '5', '60', 'D', 'W', 'M'. MT5: 1, 5 (minutes), 16385 (H1 = 0x4000 | hours),
+    32769 (W1), 49153 (MN1).
+    """
+    if isinstance(timeframe, str):
+        tf = timeframe.upper()
+        if tf == 'D': return 86400
+        if tf == 'W': return 604800
+        if tf == 'M': return 2592000
+        return int(tf) * 60
+
+    tf = int(timeframe)
+    if tf & 0xC000 == 0xC000: return 2592000       # Monthly
+    if tf & 0x8000: return 604800                   # Weekly
+    if tf & 0x4000: return (tf & 0x3FFF) * 3600     # Hours (H1 = 16385, D1 = 16408)
+    return tf * 60                                  # Minutes
+
+class CandleCache:
+    """
+    Per-cycle candle cache between main.py and the bridges.
+    Keyed by (bridge, symbol, timeframe). Each key is fetched ONCE per scan cycle at
+    the deepest depth any caller has asked for, and smaller requests are served as
+    slices of it. Entries also expire when the current bar closes (wall clock), so a
+    long cycle never serves a stale forming candle across a bar boundary.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {} # {key: {'df': DataFrame, 'depth': int, 'cycle': int, 'expires': float}}
+        self._depths = {}  # {key: deepest depth requested so far}
+        self.cycle = 0
+        self.hits = 0
+        self.misses = 0
+
+    def new_cycle(self):
+        """Marks the start of a scan cycle: everything cached earlier becomes stale."""
+        with self._lock:
+            self.cycle += 1
+            self._entries.clear()
+
+    def reserve(self, bridge, symbol, timeframe, depth):
+        """Pre-declares the deepest slice needed so the first fetch covers every caller."""
+        key = (bridge, symbol, str(timeframe))
+        with self._lock:
+            self._depths[key] = max(self._depths.get(key, 0), depth)
+
+    def get_candles(self, bridge, symbol, timeframe, num_candles=200):
+        """Drop-in for bridge.get_candles(symbol, timeframe, num_candles)."""
+        key = (bridge, symbol, str(timeframe))
+        now = time.time()
+
+        with self._lock:
+            depth = max(self._depths.get(key, 0), num_candles)
+            self._depths[key] = depth
+            entry = self._entries.get(key)
+            if entry and entry['cycle'] == self.cycle and now < entry['expires'] and entry['depth'] >= num_candles:
+                self.hits += 1
+                return self._slice(entry, num_candles)
+            self.misses += 1
+
+        df = bridge.get_candles(symbol, timeframe=timeframe, num_candles=depth)
+        if df is None or df.empty:
+            return df
+
+        # Expire at the next bar boundary (epoch-aligned; broker offsets are whole hours)
+        period = timeframe_seconds(timeframe)
+        entry = {'df': df, 'depth': depth, 'cycle': self.cycle, 'expires': (now // period + 1) * period}
+        with self._lock:
+            self._entries[key] = entry
+        return self._slice(entry, num_candles)
+
+    def invalidate(self, bridge=None, symbol=None):
+        """Drops cached entries (all, per bridge, or per bridge + symbol)."""
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if (bridge is None or key[0] is bridge) and (symbol is None or key[1] == symbol):
+                    del self._entries[key]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total) if total else 0.0,
+            'cycle': self.cycle
+        }
+
+    def _slice(self, entry, num_candles):
+        # Copy so callers adding columns (find_swings, rsi) can't corrupt the shared frame
+        return entry['df'].tail(num_candles).copy()
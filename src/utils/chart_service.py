@@ -0,0 +1,95 @@
+# src/utils/chart_service.py
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+_worker_visualizer = None
+
+def _init_worker(export_dir):
+    """Runs once per worker process: pays the matplotlib/mplfinance import + style cost up front."""
+    global _worker_visualizer
+    from src.utils.visualizer import Visualizer
+    _worker_visualizer = Visualizer(export_dir=export_dir)
+
+def _render(df, symbol, zones, filename):
+    return _worker_visualizer.generate_chart(df, symbol, zones=zones, filename=filename)
+
+class ChartRenderService:
+    """
+    Renders Visualizer charts in a separate process pool so the trading loop never
+    waits on matplotlib. submit() returns a Future (-> image path or None);
+    render_and_send() also delivers the PNG to Telegram once it's ready.
+    Workers use 'spawn' (fork is unsafe with the Telegram/stream threads running,
+    and it's the only option on Windows where the MT5 terminal lives).
+    """
+    def __init__(self, bot=None, export_dir="debug_charts", max_workers=1):
+        self.bot = bot
+        self.export_dir = export_dir
+        self.max_workers = max_workers
+        os.makedirs(export_dir, exist_ok=True)
+        self.executor = self._new_executor()
+        self.submitted = 0
+        self.failed = 0
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.export_dir,)
+        )
+
+    def submit(self, df, symbol, zones=None, filename="chart.png"):
+        """Queues a render. Returns a Future, or None if the data is empty / the pool is gone."""
+        if df is None or df.empty:
+            logger.warning(f"ChartRenderService: No data for {symbol}")
+            return None
+        try:
+            try:
+                future = self.executor.submit(_render, df, symbol, zones, filename)
+            except BrokenProcessPool:
+                # A worker died (OOM, native crash): start a fresh pool instead of losing charts for good
+                logger.warning("Chart worker pool broken. Restarting it.")
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = self._new_executor()
+                future = self.executor.submit(_render, df, symbol, zones, filename)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Chart render submit failed for {symbol}: {e}")
+            return None
+        self.submitted += 1
+        return future
+
+    def render_and_send(self, df, symbol, zones=None, filename="chart.png", caption="", bot=None):
+        """Fire-and-forget: render off-process, then send_photo on the bot when done."""
+        future = self.submit(df, symbol, zones=zones, filename=filename)
+        if future is not None:
+            target = bot or self.bot
+            future.add_done_callback(lambda f: self._deliver(f, symbol, caption, target))
+        return future
+
+    def _deliver(self, future, symbol, caption, bot):
+        # Runs on the executor's management thread: keep it short (TelegramService.send_photo only enqueues)
+        try:
+            img_path = future.result()
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Chart render failed for {symbol}: {e}")
+            return
+        if not img_path or not os.path.exists(img_path):
+            # The worker's own log lines stay in its process: report the failure here
+            self.failed += 1
+            logger.error(f"Chart generation failed for {symbol}.")
+            return
+        if bot is not None:
+            try:
+                bot.send_photo(img_path, caption=caption)
+            except Exception as e:
+                logger.error(f"Failed to send chart for {symbol}: {e}")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
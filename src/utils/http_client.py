@@ -0,0 +1,132 @@
+# src/utils/http_client.py
+import bisect
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Latency bucket upper bounds (ms); the last bucket is +inf
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+class LatencyHistogram:
+    """Fixed-bucket request latency histogram (thread-safe)."""
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = list(buckets)
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.errors = 0
+
+    def record(self, ms, error=False):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+            self.total += 1
+            self.sum_ms += ms
+            if error: self.errors += 1
+
+    def percentile(self, pct):
+        """Upper bound (ms) of the bucket holding the pct-th percentile (inf for the overflow bucket)."""
+        with self._lock:
+            if not self.total:
+                return None
+            target = self.total * pct / 100.0
+            running = 0
+            for i, n in enumerate(self.counts):
+                running += n
+                if running >= target:
+                    return self.buckets[i] if i < len(self.buckets) else float('inf')
+            return float('inf')
+
+    def snapshot(self):
+        with self._lock:
+            total, sum_ms, errors = self.total, self.sum_ms, self.errors
+            buckets = dict(zip([f"<={b}ms" for b in self.buckets] + ["+inf"], self.counts))
+        return {
+            'count': total,
+            'errors': errors,
+            'avg_ms': (sum_ms / total) if total else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'buckets': buckets
+        }
+
+class HttpClient:
+    """
+    Shared keep-alive HTTP layer (one requests.Session, pooled per host).
+    - pool_maxsize caps concurrent connections per host (pool_block=True waits instead of opening more)
+    - Retries connect errors and 429/5xx with exponential backoff (Retry-After honoured).
+      Read errors are NOT retried: a POST may already have been delivered (duplicate alerts),
+      and long-poll read timeouts are expected.
+    - Every call is timed into a per-host LatencyHistogram.
+    """
+    def __init__(self, per_host_limit=4, retries=3, backoff_factor=0.5, default_timeout=(5, 15)):
+        self.default_timeout = default_timeout
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries, connect=retries, read=0, status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'POST']),
+            respect_retry_after_header=True,
+            raise_on_status=False # Hand the final response back so callers keep their raise_for_status handling
+        )
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=per_host_limit, pool_block=True, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._histograms = {}
+        self._hist_lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.default_timeout)
+        host = urlsplit(url).netloc
+        started = time.perf_counter()
+        error = False
+        try:
+            response = self.session.request(method, url, **kwargs)
+            error = response.status_code >= 400
+            return response
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._histogram(host).record((time.perf_counter() - started) * 1000, error=error)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def _histogram(self, host):
+        with self._hist_lock:
+            if host not in self._histograms:
+                self._histograms[host] = LatencyHistogram()
+            return self._histograms[host]
+
+    def stats(self):
+        """{host: histogram snapshot}"""
+        with self._hist_lock:
+            hosts = dict(self._histograms)
+        return {host: hist.snapshot() for host, hist in hosts.items()}
+
+    def close(self):
+        self.session.close()
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+def get_http_client():
+    """Process-wide pooled client shared by Telegram, guardrails, etc."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient()
+        return _shared_client
@@ -0,0 +1,100 @@
+# src/utils/scan_orchestrator.py
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+TIMED_OUT = 'timeout'
+BUSY = 'busy'
+
+class ScanOrchestrator:
+    """
+    Runs the per-symbol hunt/manage pipelines of one scan cycle concurrently.
+    Blocking bridge calls execute on a bounded thread pool; an asyncio semaphore per
+    lane (bridge) caps how many pipelines hit the same terminal / API at once, and
+    each pipeline gets a timeout so one hung IPC/HTTP call can't hold the cycle.
+    Cycle time ~= slowest symbol instead of the sum of all symbols.
+    """
+    def __init__(self, lane_limits=None, timeout=20.0, max_workers=None):
+        # MT5 terminal IPC is effectively serial: keep it at 1 unless the broker build is known to cope
+        self.lane_limits = dict(lane_limits or {'mt5': 1, 'bybit': 4})
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or sum(self.lane_limits.values()),
+            thread_name_prefix="scan"
+        )
+        self._loop = asyncio.new_event_loop()
+        self._semaphores = {}
+        self._in_flight = {} # {key: concurrent Future} - jobs still running after a timeout
+        self._in_flight_lock = threading.Lock()
+
+        self.last_cycle_time = 0.0
+        self.last_durations = {} # {key: seconds}
+        self.timeouts = 0
+
+    def run_cycle(self, jobs):
+        """
+        jobs: Iterable of (lane, key, fn) - fn is a blocking callable with no args.
+        Returns {key: result | exception | TIMED_OUT | BUSY}.
+        A job waits at most `timeout` for its lane and `timeout` to run, so a hung
+        call (which keeps its lane slot until the thread returns) can't stall the cycle.
+        """
+        start = time.time()
+        results = self._loop.run_until_complete(self._gather(list(jobs)))
+        self.last_cycle_time = time.time() - start
+        return results
+
+    async def _gather(self, jobs):
+        outcomes = await asyncio.gather(*(self._run_job(lane, key, fn) for lane, key, fn in jobs))
+        return {key: outcome for (_, key, _), outcome in zip(jobs, outcomes)}
+
+    async def _run_job(self, lane, key, fn):
+        with self._in_flight_lock:
+            previous = self._in_flight.get(key)
+            if previous is not None and not previous.done():
+                # Still stuck from an earlier cycle: don't stack another call on top
+                return BUSY
+
+        sem = self._semaphore(lane)
+        try:
+            await asyncio.wait_for(sem.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            # Lane still held (e.g. by a timed-out MT5 call that hasn't returned): skip, retry next cycle
+            logger.warning(f"Scan pipeline {key} ({lane}) waited {self.timeout:.0f}s for its lane. Skipping this cycle.")
+            return BUSY
+        started = time.time()
+        future = self.executor.submit(fn)
+        with self._in_flight_lock:
+            self._in_flight[key] = future
+        # Release the lane slot when the THREAD finishes, not when we stop waiting
+        future.add_done_callback(lambda _: self._release(sem))
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"Scan pipeline {key} ({lane}) exceeded {self.timeout:.0f}s. Skipping this cycle.")
+            return TIMED_OUT
+        except Exception as e:
+            logger.error(f"Scan pipeline {key} ({lane}) failed: {e}", exc_info=True)
+            return e
+        finally:
+            self.last_durations[key] = time.time() - started
+
+    def _release(self, sem):
+        try:
+            self._loop.call_soon_threadsafe(sem.release)
+        except RuntimeError:
+            pass # Loop closed during shutdown
+
+    def _semaphore(self, lane):
+        if lane not in self._semaphores:
+            self._semaphores[lane] = asyncio.Semaphore(self.lane_limits.get(lane, 1))
+        return self._semaphores[lane]
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self._loop.close()
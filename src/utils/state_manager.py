@@ -2,17 +2,41 @@
 import json
 import os
 import logging
+import threading
 from datetime import datetime
+from src.utils.state_store import ALL, HISTORY_LIMIT, JsonStateStore, create_store
 
 logger = logging.getLogger(__name__)
 
 class StateManager:
-    def __init__(self, filepath="state.json"):
+    """
+    Write-behind persistence: dashboard/sweep updates only mark the state dirty and are
+    flushed at most every `flush_interval` seconds; trade-critical changes (trades,
+    pending setups, PnL, history) and explicit save_state() calls flush immediately.
+    Mutators record what changed; the storage backend (state_store) decides whether
+    that means an atomic whole-file JSON rewrite or a few SQLite row writes.
+    """
+    def __init__(self, filepath="state.json", flush_interval=1.0, store=None):
         self.filepath = filepath
+        self.flush_interval = flush_interval
+        self.store = store or create_store(filepath)
+        self._lock = threading.RLock() # Scan pipelines and Telegram commands mutate state concurrently
+        self._write_lock = threading.Lock() # One writer at a time, batches applied in order
+        self._changes = {} # Pending change-set: {'kv': set|ALL, 'trades': set|ALL, 'pending': set|ALL, 'scans': set, 'journal': list}
+        self._flush_timer = None
+        self.writes = 0
+        # Indexes over the canonical lists (which are what gets persisted)
+        self._trades_by_ticket = {}  # {str(ticket): trade}
+        self._trades_by_symbol = {}  # {symbol: [trade, ...]}
+        self._pending_by_symbol = {} # {symbol: setup}
+        self._indexed = (None, None) # (trades list, pending list) the indexes were built from
+        self._indexes_stale = True
         self.state = self.load_state()
+        if self._changes:
+            self.flush() # Persist a state.json import right away
 
     def load_state(self):
-        """Loads state from JSON file or initializes default."""
+        """Loads state from the storage backend (or imports state.json) or initializes default."""
         
         # Default State Definition
         default_state = {
@@ -35,84 +59,288 @@ class StateManager:
             "trade_history": [] 
         }
 
-        if os.path.exists(self.filepath):
-            try:
+        state = None
+        try:
+            state = self.store.load()
+            if state is None and not isinstance(self.store, JsonStateStore) and os.path.exists(self.filepath):
+                # First run on a new backend: import the existing state.json
                 with open(self.filepath, "r") as f:
                     state = json.load(f)
-                    
-                    # MERGE DEFAULTS: Ensure all keys exist
-                    for key, value in default_state.items():
-                        if key not in state:
-                            state[key] = value
-                    
-                    # DATE CHECK: Reset PnL if new day
-                    current_date = datetime.now().strftime("%Y-%m-%d")
-                    saved_date = state.get('last_pnl_date', "1970-01-01")
-                    if saved_date != current_date:
-                        logger.info(f"🔄 NEW DAY DETECTED: Resetting Session PnL (Was: {state.get('session_pnl', 0)})")
-                        state['session_pnl'] = 0.0
-                        state['last_pnl_date'] = current_date
-                        # Auto-unpause if paused due to loss?
-                        if state.get('system_status') == 'paused':
-                             logger.info("🔄 Auto-Resuming System for New Day.")
-                             state['system_status'] = 'active'
-                             
-                    return state
-            except Exception as e:
-                logger.error(f"Failed to load state: {e}")
-        
+                logger.info(f"Migrating {self.filepath} into {type(self.store).__name__}.")
+                self._touch_all()
+                for symbol in state.get('last_scan_data', {}):
+                    self._touch('scans', symbol)
+                self._changes['journal'] = list(reversed(state.get('trade_history', []))) # Oldest first
+        except Exception as e:
+            logger.error(f"Failed to load state: {e}")
+
+        if state is not None:
+            # MERGE DEFAULTS: Ensure all keys exist
+            for key, value in default_state.items():
+                if key not in state:
+                    state[key] = value
+
+            # DATE CHECK: Reset PnL if new day
+            current_date = datetime.now().strftime("%Y-%m-%d")
+            saved_date = state.get('last_pnl_date', "1970-01-01")
+            if saved_date != current_date:
+                logger.info(f"🔄 NEW DAY DETECTED: Resetting Session PnL (Was: {state.get('session_pnl', 0)})")
+                state['session_pnl'] = 0.0
+                state['last_pnl_date'] = current_date
+                # Auto-unpause if paused due to loss?
+                if state.get('system_status') == 'paused':
+                     logger.info("🔄 Auto-Resuming System for New Day.")
+                     state['system_status'] = 'active'
+
+            return state
+
         return default_state
 
     def save_state(self):
-        """Persists current state to JSON."""
+        """
+        Persists now. Callers use this after editing self.state in place, so the
+        small sections (settings, trades, pending setups) are re-synced in full
+        and the trade/pending indexes are rebuilt on the next lookup.
+        """
+        with self._lock:
+            self._indexes_stale = True
+            self._touch_all()
+        self.flush()
+
+    def mark_dirty(self):
+        """Schedules a write-behind flush (coalesces everything changed within flush_interval)."""
+        with self._lock:
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """
+        Writes the pending change-set. Rows are serialized under the state lock,
+        the I/O happens under the writer lock only. Never call with self._lock held.
+        """
+        with self._write_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if not self._changes:
+                    return
+                changes, self._changes = self._changes, {}
+                try:
+                    batch = self.store.prepare(self.state, changes)
+                except Exception as e:
+                    logger.error(f"Failed to save state: {e}")
+                    return
+
+            try:
+                self.store.write(batch)
+                self.writes += 1
+            except Exception as e:
+                logger.error(f"Failed to save state: {e}")
+                with self._lock:
+                    self._merge_changes(changes) # Retry on the next flush
+                self.mark_dirty()
+
+    def close(self):
+        self.flush()
+        with self._write_lock: # No Timer flush mid-close
+            self.store.close()
+
+    # --- Change tracking ---
+    def _touch(self, section, key=None):
+        current = self._changes.get(section)
+        if current == ALL:
+            return
+        if key is None:
+            self._changes[section] = ALL
+        else:
+            self._changes.setdefault(section, set()).add(key)
+
+    def _touch_all(self):
+        for section in ('kv', 'trades', 'pending'):
+            self._touch(section)
+
+    def _merge_changes(self, changes):
+        for section, keys in changes.items():
+            if section == 'journal':
+                self._changes['journal'] = list(keys) + self._changes.get('journal', [])
+            elif keys == ALL:
+                self._touch(section)
+            else:
+                for key in keys:
+                    self._touch(section, key)
+
+    # --- Indexed views ---
+    def invalidate_indexes(self):
+        """Call after editing state['active_trades'] / state['pending_setups'] without the mutators below."""
+        with self._lock:
+            self._indexes_stale = True
+
+    def _ensure_indexes(self):
+        """
+        Rebuilds the indexes after invalidate_indexes() / save_state(), or if a list was
+        reassigned. Mutators below keep them current incrementally, so this is normally
+        a flag and two identity checks.
+        """
+        trades = self.state.setdefault('active_trades', [])
+        pending = self.state.setdefault('pending_setups', [])
+        built_trades, built_pending = self._indexed
+        if not self._indexes_stale and trades is built_trades and pending is built_pending:
+            return
+        self._trades_by_ticket = {str(t.get('ticket')): t for t in trades}
+        self._trades_by_symbol = {}
+        for t in trades:
+            self._trades_by_symbol.setdefault(t.get('symbol'), []).append(t)
+        self._pending_by_symbol = {s.get('symbol'): s for s in pending}
+        self._indexed = (trades, pending)
+        self._indexes_stale = False
+
+    def get_trades(self, symbol=None):
+        """Active trades (for one symbol: O(1) index lookup)."""
+        with self._lock:
+            self._ensure_indexes()
+            if symbol is None:
+                return list(self.state['active_trades'])
+            return list(self._trades_by_symbol.get(symbol, ()))
+
+    def get_trade(self, ticket):
+        with self._lock:
+            self._ensure_indexes()
+            return self._trades_by_ticket.get(str(ticket))
+
+    def trade_symbols(self):
+        with self._lock:
+            self._ensure_indexes()
+            return set(self._trades_by_symbol)
+
+    def get_pending_setup(self, symbol):
+        with self._lock:
+            self._ensure_indexes()
+            return self._pending_by_symbol.get(symbol)
+
+    def pending_symbols(self):
+        with self._lock:
+            self._ensure_indexes()
+            return set(self._pending_by_symbol)
+
+    def get_trade_history(self, limit=HISTORY_LIMIT, symbol=None):
+        """Newest-first closed trades. Backends with a journal serve any depth; otherwise the last 10."""
         try:
-            with open(self.filepath, "w") as f:
-                json.dump(self.state, f, indent=4)
+            history = self.store.query_history(limit, symbol)
         except Exception as e:
-            logger.error(f"Failed to save state: {e}")
+            logger.error(f"Trade history query failed: {e}")
+            history = None
+        if history is None:
+            with self._lock:
+                history = [t for t in self.state.get('trade_history', []) if not symbol or t.get('symbol') == symbol]
+        return history[:limit]
 
     def update_scan_data(self, symbol, data):
         """Updates the dashboard status for a symbol."""
-        if 'last_scan_data' not in self.state:
-            self.state['last_scan_data'] = {}
-        self.state['last_scan_data'][symbol] = data
-        self.save_state()
+        with self._lock:
+            if 'last_scan_data' not in self.state:
+                self.state['last_scan_data'] = {}
+            self.state['last_scan_data'][symbol] = data
+            self._touch('scans', symbol)
+            self.mark_dirty() # Dashboard only: write-behind
 
     def update_sweep(self, symbol, sweep_data):
         """Updates detected HTF sweep for a symbol."""
-        self.state['active_sweeps'][symbol] = sweep_data
-        self.save_state()
+        with self._lock:
+            self.state['active_sweeps'][symbol] = sweep_data
+            self._touch('kv', 'active_sweeps')
+            self.mark_dirty() # Re-detected on the next H1 close if lost
 
     def clear_sweep(self, symbol):
-        if symbol in self.state['active_sweeps']:
-            del self.state['active_sweeps'][symbol]
-            self.save_state()
+        with self._lock:
+            if symbol in self.state['active_sweeps']:
+                del self.state['active_sweeps'][symbol]
+                self._touch('kv', 'active_sweeps')
+                self.mark_dirty()
 
     def add_trade(self, trade_data):
-        self.state['active_trades'].append(trade_data)
-        self.save_state()
+        with self._lock:
+            self._ensure_indexes()
+            ticket = str(trade_data.get('ticket'))
+            existing = self._trades_by_ticket.get(ticket)
+            if existing is not None:
+                self._unindex_trade(existing) # Same ticket re-added: replace, don't duplicate
+            self.state['active_trades'].append(trade_data)
+            self._trades_by_ticket[ticket] = trade_data
+            self._trades_by_symbol.setdefault(trade_data.get('symbol'), []).append(trade_data)
+            self._touch('trades', ticket)
+        self.flush()
+
+    def replace_trades(self, trades):
+        """Swaps the whole active trade list (e.g. /panic clears it)."""
+        with self._lock:
+            self.state['active_trades'] = list(trades)
+            self._indexes_stale = True
+            self._touch('trades')
+        self.flush()
 
     def remove_trade(self, ticket):
-        self.state['active_trades'] = [t for t in self.state['active_trades'] if t.get('ticket') != ticket]
-        self.save_state()
+        with self._lock:
+            self._ensure_indexes()
+            trade = self._trades_by_ticket.get(str(ticket))
+            if trade is None:
+                return # Nothing to remove, nothing to write
+            self._unindex_trade(trade)
+            self._touch('trades', str(ticket))
+        self.flush()
+
+    def _unindex_trade(self, trade):
+        _remove_item(self.state['active_trades'], trade)
+        del self._trades_by_ticket[str(trade.get('ticket'))]
+        symbol_trades = self._trades_by_symbol.get(trade.get('symbol'), [])
+        _remove_item(symbol_trades, trade)
+        if not symbol_trades:
+            self._trades_by_symbol.pop(trade.get('symbol'), None)
 
     def add_pending_setup(self, setup_data):
-        # Remove existing for same symbol to avoid dupes/stale
-        self.remove_pending_setup(setup_data['symbol'])
-        self.state['pending_setups'].append(setup_data)
-        self.save_state()
+        with self._lock:
+            # Remove existing for same symbol to avoid dupes/stale
+            self._drop_pending_setup(setup_data['symbol'])
+            self.state['pending_setups'].append(setup_data)
+            self._pending_by_symbol[setup_data['symbol']] = setup_data
+            self._touch('pending', setup_data['symbol'])
+        self.flush()
 
     def remove_pending_setup(self, symbol):
-        self.state['pending_setups'] = [s for s in self.state['pending_setups'] if s.get('symbol') != symbol]
-        self.save_state()
+        with self._lock:
+            if not self._drop_pending_setup(symbol):
+                return # Nothing pending for this symbol, nothing to write
+            self._touch('pending', symbol)
+        self.flush() # Immediate: a stale setup surviving a restart could fire twice
+
+    def _drop_pending_setup(self, symbol):
+        self._ensure_indexes()
+        setup = self._pending_by_symbol.pop(symbol, None)
+        if setup is None:
+            return False
+        _remove_item(self.state['pending_setups'], setup)
+        return True
 
     def updates_session_pnl(self, amount):
-        self.state['session_pnl'] = self.state.get('session_pnl', 0.0) + amount
-        self.save_state()
+        with self._lock:
+            self.state['session_pnl'] = self.state.get('session_pnl', 0.0) + amount
+            self._touch('kv', 'session_pnl')
+        self.flush()
 
     def log_closed_trade(self, trade_data):
-        """Logs a closed trade to history (Highlander rule: Keep only last 10)."""
-        history = self.state.get('trade_history', [])
-        history.insert(0, trade_data) # Prepend to show newest first
-        self.state['trade_history'] = history[:10] # Keep last 10
-        self.save_state()
+        """Logs a closed trade to history (Highlander rule: Keep only last 10 in memory; the backend may journal all)."""
+        with self._lock:
+            history = self.state.get('trade_history', [])
+            history.insert(0, trade_data) # Prepend to show newest first
+            self.state['trade_history'] = history[:HISTORY_LIMIT] # Keep last 10
+            self._changes.setdefault('journal', []).append(trade_data)
+        self.flush()
+
+def _remove_item(items, item):
+    """In-place removal of this exact object (list.remove() would match an equal dict)."""
+    for i, candidate in enumerate(items):
+        if candidate is item:
+            del items[i]
+            return
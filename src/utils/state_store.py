@@ -0,0 +1,385 @@
+# src/utils/state_store.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Change-set marker: the whole section changed (e.g. after an external in-place edit + save_state())
+ALL = '*'
+
+# State keys that live in their own tables; everything else is a key/value row
+TABLE_KEYS = ('active_trades', 'pending_setups', 'last_scan_data', 'trade_history')
+
+HISTORY_LIMIT = 10 # In-memory trade_history length (/history, dashboard)
+
+class JsonStateStore:
+    """
+    Whole-state JSON file (the original format). prepare() serializes the full
+    state; write() replaces the file atomically (temp file + fsync + rename).
+    """
+    def __init__(self, filepath="state.json"):
+        self.filepath = filepath
+
+    def load(self):
+        if not os.path.exists(self.filepath):
+            return None
+        with open(self.filepath, "r") as f:
+            return json.load(f)
+
+    def prepare(self, state, changes):
+        return json.dumps(state, indent=4)
+
+    def write(self, payload):
+        tmp_path = f"{self.filepath}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.filepath) # Atomic on POSIX and Windows
+
+    def query_history(self, limit=HISTORY_LIMIT, symbol=None):
+        return None # Only the in-memory (last 10) history exists
+
+    def close(self):
+        pass
+
+class SqliteStateStore:
+    """
+    SQLite (WAL) backend: one row per trade / pending setup / scan snapshot / setting,
+    plus an unbounded closed-trade journal. prepare() turns a change-set into row
+    operations, so a flush costs what changed, not the size of the whole state.
+    One write connection shared by every flushing thread (Timer flushes, scan
+    workers) - StateManager._write_lock serializes load/write on it - plus one
+    read connection for query_history (WAL readers don't block the writer).
+    """
+    def __init__(self, path="state.db"):
+        self.path = path
+        self._conn = self._connect()
+        self._init_schema()
+        self._read_conn = self._connect()
+        self._read_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL") # WAL: durable across app crashes, fsync at checkpoints
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn
+        with conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS kv (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS trades (
+                    ticket TEXT PRIMARY KEY,
+                    symbol TEXT,
+                    seq INTEGER NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades(symbol);
+                CREATE TABLE IF NOT EXISTS pending_setups (
+                    symbol TEXT PRIMARY KEY,
+                    seq INTEGER NOT NULL,
+                    created_at TEXT,
+                    data TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS scans (
+                    symbol TEXT PRIMARY KEY,
+                    updated_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_scans_updated ON scans(updated_at);
+                CREATE TABLE IF NOT EXISTS trade_journal (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    symbol TEXT,
+                    closed_at TEXT NOT NULL,
+                    pnl REAL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_journal_symbol ON trade_journal(symbol, closed_at);
+                CREATE INDEX IF NOT EXISTS idx_journal_closed ON trade_journal(closed_at);
+            """)
+
+    def load(self):
+        conn = self._conn
+        rows = conn.execute("SELECT key, value FROM kv").fetchall()
+        if not rows and not any(conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+                                for table in ('trades', 'pending_setups', 'scans', 'trade_journal')):
+            return None # Fresh database (rows written before any setting still count)
+        state = {key: json.loads(value) for key, value in rows}
+        state['active_trades'] = [json.loads(d) for (d,) in conn.execute("SELECT data FROM trades ORDER BY seq")]
+        state['pending_setups'] = [json.loads(d) for (d,) in conn.execute("SELECT data FROM pending_setups ORDER BY seq")]
+        state['last_scan_data'] = {s: json.loads(d) for s, d in conn.execute("SELECT symbol, data FROM scans")}
+        state['trade_history'] = self._query_history(conn, HISTORY_LIMIT)
+        return state
+
+    def prepare(self, state, changes):
+        """Serializes the changed rows (runs under the StateManager lock)."""
+        ops = []
+        kv_keys = changes.get('kv')
+        if kv_keys == ALL:
+            kv_keys = [k for k in state if k not in TABLE_KEYS]
+            ops.append(("DELETE FROM kv WHERE key NOT IN (%s)" % ",".join("?" * len(kv_keys)), tuple(kv_keys)))
+        for key in kv_keys or ():
+            if key in state:
+                ops.append(("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, json.dumps(state[key]))))
+            else:
+                ops.append(("DELETE FROM kv WHERE key = ?", (key,)))
+
+        if changes.get('trades'):
+            ops.extend(self._sync_rows(
+                state.get('active_trades', []), changes['trades'], 'trades', lambda t: str(t.get('ticket')),
+                lambda t: ("INSERT INTO trades (ticket, symbol, seq, data) "
+                           "VALUES (?, ?, (SELECT IFNULL(MAX(seq), 0) + 1 FROM trades), ?) "
+                           "ON CONFLICT(ticket) DO UPDATE SET symbol = excluded.symbol, data = excluded.data",
+                           (str(t.get('ticket')), t.get('symbol'), json.dumps(t)))
+            ))
+
+        if changes.get('pending'):
+            ops.extend(self._sync_rows(
+                state.get('pending_setups', []), changes['pending'], 'pending_setups', lambda p: p.get('symbol'),
+                lambda p: ("INSERT INTO pending_setups (symbol, seq, created_at, data) "
+                           "VALUES (?, (SELECT IFNULL(MAX(seq), 0) + 1 FROM pending_setups), ?, ?) "
+                           "ON CONFLICT(symbol) DO UPDATE SET created_at = excluded.created_at, data = excluded.data",
+                           (p.get('symbol'), p.get('created_at'), json.dumps(p)))
+            ))
+
+        now = time.time()
+        scans = state.get('last_scan_data', {})
+        for symbol in changes.get('scans', ()):
+            if symbol in scans:
+                ops.append(("INSERT OR REPLACE INTO scans (symbol, updated_at, data) VALUES (?, ?, ?)",
+                            (symbol, now, json.dumps(scans[symbol]))))
+            else:
+                ops.append(("DELETE FROM scans WHERE symbol = ?", (symbol,)))
+
+        for entry in changes.get('journal', ()):
+            ops.append(("INSERT INTO trade_journal (symbol, closed_at, pnl, data) VALUES (?, ?, ?, ?)",
+                        (entry.get('symbol'), datetime.now().isoformat(), entry.get('pnl'), json.dumps(entry))))
+        return ops
+
+    def _sync_rows(self, rows, keys, table, key_of, upsert):
+        """Upserts the touched rows (or all of them) in list order - new rows get seq in that order - and deletes touched keys that are gone."""
+        if keys == ALL:
+            return [("DELETE FROM %s" % table, ())] + [upsert(r) for r in rows]
+        key_column = 'ticket' if table == 'trades' else 'symbol'
+        present = set()
+        ops = []
+        for r in rows:
+            if key_of(r) in keys:
+                present.add(key_of(r))
+                ops.append(upsert(r))
+        for key in keys:
+            if key not in present:
+                ops.append(("DELETE FROM %s WHERE %s = ?" % (table, key_column), (key,)))
+        return ops
+
+    def write(self, ops):
+        if not ops:
+            return
+        conn = self._conn
+        with conn: # One transaction per flush
+            for sql, params in ops:
+                conn.execute(sql, params)
+
+    def query_history(self, limit=HISTORY_LIMIT, symbol=None):
+        """Newest-first closed trades from the full journal (optionally for one symbol)."""
+        with self._read_lock:
+            return self._query_history(self._read_conn, limit, symbol)
+
+    @staticmethod
+    def _query_history(conn, limit, symbol=None):
+        if symbol:
+            rows = conn.execute(
+                "SELECT data FROM trade_journal WHERE symbol = ? ORDER BY id DESC LIMIT ?", (symbol, limit))
+        else:
+            rows = conn.execute("SELECT data FROM trade_journal ORDER BY id DESC LIMIT ?", (limit,))
+        return [json.loads(d) for (d,) in rows]
+
+    def close(self):
+        with self._read_lock:
+            self._read_conn.close()
+        self._conn.close()
+
+class JournalStateStore:
+    """
+    Append-only event journal (<prefix>.journal, one JSON event per line) plus a
+    compacted snapshot (<prefix>.snapshot.json). Each flush appends its change-set as
+    events with one write + one fsync; every `compact_every` events the full state is
+    snapshotted atomically and the journal restarts. load() = snapshot + replay of the
+    tail (a torn last line from a crash mid-append is ignored).
+    """
+    def __init__(self, prefix="state", compact_every=5000):
+        self.journal_path = f"{prefix}.journal"
+        self.snapshot_path = f"{prefix}.snapshot.json"
+        self.compact_every = compact_every
+        self.seq = 0 # Last event sequence number written
+        self.events_since_snapshot = 0
+
+    def load(self):
+        state, snapshot_seq = None, 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+            state, snapshot_seq = snapshot['state'], snapshot['seq']
+        self.seq = snapshot_seq
+
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            good_offset = 0
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        event = None
+                    if event is None or not line.endswith(b"\n"):
+                        # Torn append from a crash: cut it off so new events aren't written after it
+                        logger.warning("State journal: dropping torn trailing entry.")
+                        f.close()
+                        os.truncate(self.journal_path, good_offset)
+                        break
+                    good_offset += len(line)
+                    if event['seq'] <= snapshot_seq:
+                        continue # Already in the snapshot (crash between snapshot and journal reset)
+                    if state is None:
+                        state = {}
+                    apply_event(state, event)
+                    self.seq = event['seq']
+                    replayed += 1
+        self.events_since_snapshot = replayed
+        if replayed:
+            logger.info(f"State journal: replayed {replayed} events on top of snapshot #{snapshot_seq}.")
+        return state
+
+    def prepare(self, state, changes):
+        """Change-set -> event lines (+ a full snapshot when it's time to compact)."""
+        events = []
+        kv_keys = changes.get('kv')
+        if kv_keys == ALL:
+            events.append({'op': 'replace_kv', 'value': {k: v for k, v in state.items() if k not in TABLE_KEYS}})
+        else:
+            for key in kv_keys or ():
+                if key in state:
+                    events.append({'op': 'set', 'key': key, 'value': state[key]})
+                else:
+                    events.append({'op': 'del', 'key': key})
+
+        for section, field, state_key in (('trades', 'ticket', 'active_trades'), ('pending', 'symbol', 'pending_setups')):
+            keys = changes.get(section)
+            if not keys:
+                continue
+            rows = state.get(state_key, [])
+            if keys == ALL:
+                events.append({'op': 'replace_rows', 'key': state_key, 'value': rows})
+                continue
+            touched = {str(key) for key in keys}
+            present = set()
+            for row in rows: # List order: replay appends new rows in the same order
+                if str(row.get(field)) in touched:
+                    present.add(str(row.get(field)))
+                    events.append({'op': 'put_row', 'key': state_key, 'field': field, 'value': row})
+            for key in touched - present:
+                events.append({'op': 'del_row', 'key': state_key, 'field': field, 'id': key})
+
+        scans = state.get('last_scan_data', {})
+        for symbol in changes.get('scans', ()):
+            if symbol in scans:
+                events.append({'op': 'put_scan', 'symbol': symbol, 'value': scans[symbol]})
+
+        for entry in changes.get('journal', ()):
+            events.append({'op': 'close_trade', 'value': entry})
+
+        lines = []
+        for event in events:
+            self.seq += 1
+            event['seq'] = self.seq
+            lines.append(json.dumps(event))
+
+        snapshot = None
+        self.events_since_snapshot += len(lines)
+        if self.events_since_snapshot >= self.compact_every:
+            snapshot = json.dumps({'seq': self.seq, 'state': state})
+            self.events_since_snapshot = 0
+        return lines, snapshot
+
+    def write(self, batch):
+        lines, snapshot = batch
+        if lines:
+            with open(self.journal_path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno()) # One fsync per flush group
+        if snapshot is not None:
+            self._compact(snapshot)
+
+    def _compact(self, snapshot):
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # Safe even if we crash right here: replay skips events already in the snapshot
+        with open(self.journal_path, "w") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        logger.info("State journal compacted into snapshot.")
+
+    def query_history(self, limit=HISTORY_LIMIT, symbol=None):
+        return None # Snapshots keep the last 10 (see trade_history)
+
+    def close(self):
+        pass
+
+def apply_event(state, event):
+    """Replays one journal event onto a state dict."""
+    op = event['op']
+    if op == 'set':
+        state[event['key']] = event['value']
+    elif op == 'del':
+        state.pop(event['key'], None)
+    elif op == 'replace_kv':
+        for key in [k for k in state if k not in TABLE_KEYS]:
+            del state[key]
+        state.update(event['value'])
+    elif op == 'replace_rows':
+        state[event['key']] = event['value']
+    elif op == 'put_row':
+        rows = state.setdefault(event['key'], [])
+        row_id = str(event['value'].get(event['field']))
+        for i, row in enumerate(rows):
+            if str(row.get(event['field'])) == row_id:
+                rows[i] = event['value']
+                break
+        else:
+            rows.append(event['value'])
+    elif op == 'del_row':
+        state[event['key']] = [r for r in state.get(event['key'], []) if str(r.get(event['field'])) != event['id']]
+    elif op == 'put_scan':
+        state.setdefault('last_scan_data', {})[event['symbol']] = event['value']
+    elif op == 'close_trade':
+        history = state.setdefault('trade_history', [])
+        history.insert(0, event['value'])
+        del history[HISTORY_LIMIT:]
+
+def create_store(filepath="state.json", backend=None):
+    """
+    STATE_BACKEND=json (default) | sqlite (STATE_DB, default: state.db next to state.json)
+    | journal (state.journal + state.snapshot.json next to state.json).
+    """
+    backend = (backend or os.getenv("STATE_BACKEND", "json")).lower()
+    if backend == 'sqlite':
+        db_path = os.getenv("STATE_DB") or os.path.splitext(filepath)[0] + ".db"
+        return SqliteStateStore(db_path)
+    if backend == 'journal':
+        return JournalStateStore(os.path.splitext(filepath)[0])
+    return JsonStateStore(filepath)
@@ -6,111 +6,241 @@ import numpy as np
 import matplotlib
 matplotlib.use('Agg') # Force non-GUI backend for stability
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection, PolyCollection
 
 logger = logging.getLogger(__name__)
 
+# TradingView palette
+TV_UP = '#089981'
+TV_DOWN = '#f23645'
+TV_BG = '#131722'
+TV_GRID = '#2a2e39'
+TV_TEXT = '#d1d4dc'
+
+# Charts are flat colour blocks: light zlib compression is ~5x cheaper and barely larger
+PNG_OPTIONS = {'compress_level': 1}
+
+_tv_style = None
+
+def tv_style():
+    """Custom TradingView mplfinance style (built once per process)."""
+    global _tv_style
+    if _tv_style is None:
+        mc = mpf.make_marketcolors(up=TV_UP, down=TV_DOWN, # TV Official Colors
+                                   edge='inherit',
+                                   wick='inherit',
+                                   volume='in',
+                                   ohlc='inherit')
+        _tv_style = mpf.make_mpf_style(marketcolors=mc,
+                                       facecolor=TV_BG,
+                                       gridcolor=TV_GRID,
+                                       gridstyle='solid',
+                                       edgecolor=TV_GRID,
+                                       y_on_right=True)
+    return _tv_style
+
 class Visualizer:
-    def __init__(self, export_dir="debug_charts"):
+    """
+    renderer='mpf':  full mplfinance pipeline (live evidence / /chart).
+    renderer='fast': candles drawn straight from NumPy arrays with matplotlib
+                     collections (backtest audit charts, one per trade).
+    Both keep one figure alive and clear it between renders instead of
+    building a new 15x10 figure every call - one Visualizer per thread/process.
+    """
+    def __init__(self, export_dir="debug_charts", renderer="mpf"):
         self.export_dir = export_dir
+        self.renderer = renderer
         if not os.path.exists(export_dir):
             os.makedirs(export_dir)
+        self._fig = None
+        self._ax = None
 
     def generate_chart(self, df, symbol, zones=None, filename="chart.png"):
         """
-        Generates a static chart using mplfinance and saves it as an image.
+        Generates a static chart (mplfinance or fast renderer) and saves it as an image.
         """
         try:
             if df is None or df.empty:
                 logger.warning(f"Visualizer: No data for {symbol}")
                 return None
 
-            # Prepare Data (mplfinance expects DatetimeIndex)
-            data = df.copy()
-            if 'time' in data.columns:
-                data['time'] = pd.to_datetime(data['time'])
-                data.set_index('time', inplace=True)
-            
-            # Ensure index is sorted
-            data.sort_index(inplace=True)
-
             img_path = os.path.join(self.export_dir, filename)
-            
-            # 1. Custom TradingView Style
-            mc = mpf.make_marketcolors(up='#089981', down='#f23645', # TV Official Colors
-                                       edge='inherit',
-                                       wick='inherit',
-                                       volume='in',
-                                       ohlc='inherit')
-            s  = mpf.make_mpf_style(marketcolors=mc, 
-                                   facecolor='#131722', 
-                                   gridcolor='#2a2e39', 
-                                   gridstyle='solid',
-                                   edgecolor='#2a2e39',
-                                   y_on_right=True)
-
-            # 2. Horizontal Lines Logic
-            hlines = []
-            h_colors = []
-            h_styles = []
-            
-            if zones:
-                # Execution Context
-                if 'trade' in zones:
-                    t = zones['trade']
-                    if t.get('entry'): hlines.append(t['entry']); h_colors.append('#2962ff'); h_styles.append('-') # Blue Entry
-                    if t.get('sl'): hlines.append(t['sl']); h_colors.append('#f23645'); h_styles.append('--')     # Red SL
-                    if t.get('tp'): hlines.append(t['tp']); h_colors.append('#089981'); h_styles.append('-')     # Green TP
-                
-                # HTF Range Context (User Request)
-                if 'htf' in zones:
-                    htf = zones['htf']
-                    if htf.get('1H_high'): hlines.append(htf['1H_high']); h_colors.append('#ff9800'); h_styles.append('-.') # Orange 1H High
-                    if htf.get('1H_low'): hlines.append(htf['1H_low']); h_colors.append('#ff9800'); h_styles.append('-.')   # Orange 1H Low
-                    if htf.get('4H_high'): hlines.append(htf['4H_high']); h_colors.append('#9c27b0'); h_styles.append(':')  # Purple 4H High
-                    if htf.get('4H_low'): hlines.append(htf['4H_low']); h_colors.append('#9c27b0'); h_styles.append(':')    # Purple 4H Low
-
-                if 'sweeps' in zones:
-                    for s_zone in zones['sweeps']:
-                        price = s_zone.get('price', s_zone.get('level'))
-                        if price:
-                            hlines.append(price)
-                            h_colors.append('#ffd600') # Gold Sweep
-                            h_styles.append('-')
-                
-                if 'mss' in zones:
-                     # Check if it's a list or single dict
-                     mss_zones = zones['mss'] if isinstance(zones['mss'], list) else [zones['mss']]
-                     for m_zone in mss_zones:
-                         price = m_zone.get('level', m_zone.get('price'))
-                         if price:
-                             hlines.append(price)
-                             h_colors.append('#ffffff') # White MSS
-                             h_styles.append('--')      # Dashed
-
-            # Basic Plotting Arguments
-            kwargs = dict(
-                type='candle',
-                style=s,
-                title=f"\n{symbol} - Tactical View",
-                ylabel='Price',
-                volume=False,
-                savefig=img_path,
-                figsize=(15, 10),
-                datetime_format='%H:%M',
-                xrotation=0,
-                tight_layout=True,
-                scale_padding=dict(left=0.1, right=1.2, top=0.5, bottom=0.5)
-            )
-
-            if hlines:
-                kwargs['hlines'] = dict(hlines=hlines, colors=h_colors, linestyle=h_styles, linewidths=1.8)
-
-            # 4. Render
-            mpf.plot(data, **kwargs)
-            
+            h_lines = self._zone_lines(zones)
+
+            if self.renderer == 'fast':
+                self._render_fast(df, symbol, h_lines, img_path)
+            else:
+                self._render_mpf(df, symbol, h_lines, img_path)
+
             logger.info(f"Professional Tactical Chart generated: {img_path}")
             return img_path
 
         except Exception as e:
             logger.error(f"Failed to generate professional chart: {e}")
             return None
+
+    def _zone_lines(self, zones):
+        """Horizontal Lines Logic -> (prices, colors, styles)"""
+        hlines = []
+        h_colors = []
+        h_styles = []
+
+        if zones:
+            # Execution Context
+            if 'trade' in zones:
+                t = zones['trade']
+                if t.get('entry'): hlines.append(t['entry']); h_colors.append('#2962ff'); h_styles.append('-') # Blue Entry
+                if t.get('sl'): hlines.append(t['sl']); h_colors.append(TV_DOWN); h_styles.append('--')        # Red SL
+                if t.get('tp'): hlines.append(t['tp']); h_colors.append(TV_UP); h_styles.append('-')           # Green TP
+
+            # HTF Range Context (User Request)
+            if 'htf' in zones:
+                htf = zones['htf']
+                if htf.get('1H_high'): hlines.append(htf['1H_high']); h_colors.append('#ff9800'); h_styles.append('-.') # Orange 1H High
+                if htf.get('1H_low'): hlines.append(htf['1H_low']); h_colors.append('#ff9800'); h_styles.append('-.')   # Orange 1H Low
+                if htf.get('4H_high'): hlines.append(htf['4H_high']); h_colors.append('#9c27b0'); h_styles.append(':')  # Purple 4H High
+                if htf.get('4H_low'): hlines.append(htf['4H_low']); h_colors.append('#9c27b0'); h_styles.append(':')    # Purple 4H Low
+
+            if 'sweeps' in zones:
+                for s_zone in zones['sweeps']:
+                    price = s_zone.get('price', s_zone.get('level'))
+                    if price:
+                        hlines.append(price)
+                        h_colors.append('#ffd600') # Gold Sweep
+                        h_styles.append('-')
+
+            if 'mss' in zones:
+                 # Check if it's a list or single dict
+                 mss_zones = zones['mss'] if isinstance(zones['mss'], list) else [zones['mss']]
+                 for m_zone in mss_zones:
+                     price = m_zone.get('level', m_zone.get('price'))
+                     if price:
+                         hlines.append(price)
+                         h_colors.append('#ffffff') # White MSS
+                         h_styles.append('--')      # Dashed
+
+        return hlines, h_colors, h_styles
+
+    # --- mplfinance path ---
+    def _render_mpf(self, df, symbol, h_lines, img_path):
+        # Prepare Data (mplfinance expects a sorted DatetimeIndex) - no copy unless needed
+        data = df
+        if 'time' in data.columns:
+            data = data.set_index(pd.DatetimeIndex(pd.to_datetime(data['time'])))
+        if not data.index.is_monotonic_increasing:
+            data = data.sort_index()
+
+        if self._fig is None:
+            self._fig = mpf.figure(style=tv_style(), figsize=(15, 10))
+            self._ax = self._fig.add_subplot(1, 1, 1)
+        else:
+            self._ax.clear()
+        ax = self._ax
+
+        kwargs = dict(
+            type='candle',
+            ax=ax,
+            ylabel='Price',
+            datetime_format='%H:%M',
+            xrotation=0
+        )
+
+        hlines, h_colors, h_styles = h_lines
+        if hlines:
+            kwargs['hlines'] = dict(hlines=hlines, colors=h_colors, linestyle=h_styles, linewidths=1.8)
+
+        mpf.plot(data, **kwargs)
+        ax.set_title(f"{symbol} - Tactical View")
+        self._fig.tight_layout()
+        self._fig.savefig(img_path, facecolor=self._fig.get_facecolor(), pil_kwargs=PNG_OPTIONS)
+
+    # --- Fast path ---
+    def _render_fast(self, df, symbol, h_lines, img_path):
+        o = df['open'].to_numpy(dtype=float)
+        h = df['high'].to_numpy(dtype=float)
+        l = df['low'].to_numpy(dtype=float)
+        c = df['close'].to_numpy(dtype=float)
+        if 'time' in df.columns:
+            times = pd.to_datetime(df['time']).to_numpy()
+        else:
+            times = pd.to_datetime(df.index).to_numpy()
+        if len(times) > 1 and (np.diff(times) < np.timedelta64(0)).any():
+            order = np.argsort(times, kind='stable')
+            o, h, l, c, times = o[order], h[order], l[order], c[order], times[order]
+
+        if self._fig is None:
+            self._setup_fast_axes()
+        ax = self._ax
+
+        n = len(c)
+        x = np.arange(n, dtype=float)
+        colors = np.where(c >= o, TV_UP, TV_DOWN)
+
+        # Wicks: one segment per bar
+        self._wicks.set_segments(np.stack([np.column_stack([x, l]), np.column_stack([x, h])], axis=1))
+        self._wicks.set_color(colors)
+
+        # Bodies: one quad per bar (doji get a minimum visible height)
+        w = 0.35
+        lo = np.minimum(o, c)
+        hi = np.maximum(o, c)
+        min_body = (np.nanmax(h) - np.nanmin(l)) * 0.001
+        hi = np.where(hi - lo < min_body, lo + min_body, hi)
+        self._bodies.set_verts(np.stack([
+            np.column_stack([x - w, lo]), np.column_stack([x - w, hi]),
+            np.column_stack([x + w, hi]), np.column_stack([x + w, lo])
+        ], axis=1))
+        self._bodies.set_facecolor(colors)
+        self._bodies.set_edgecolor(colors)
+
+        # Zone lines are the only artists rebuilt per render
+        for line in self._zone_artists:
+            line.remove()
+        hlines, h_colors, h_styles = h_lines
+        self._zone_artists = [ax.axhline(price, color=color, linestyle=style, linewidth=1.8)
+                              for price, color, style in zip(hlines, h_colors, h_styles)]
+
+        # y-range covers candles + zone lines
+        y_values = np.concatenate([l, h, np.asarray(hlines, dtype=float)])
+        y_min, y_max = np.nanmin(y_values), np.nanmax(y_values)
+        pad = (y_max - y_min) * 0.05 or abs(y_max) * 0.001 or 1.0
+        ax.set_xlim(-1, n)
+        ax.set_ylim(y_min - pad, y_max + pad)
+
+        ticks = np.linspace(0, n - 1, num=min(n, 10)).astype(int)
+        ax.set_xticks(ticks)
+        ax.set_xticklabels(pd.DatetimeIndex(times[ticks]).strftime('%H:%M'))
+        self._title.set_text(f"{symbol} - Tactical View")
+
+        self._fig.savefig(img_path, facecolor=TV_BG, pil_kwargs=PNG_OPTIONS)
+
+    def _setup_fast_axes(self):
+        """Figure, TradingView styling and the two candle collections - created once, updated in place."""
+        self._fig, self._ax = plt.subplots(figsize=(15, 10), facecolor=TV_BG)
+        ax = self._ax
+        ax.set_facecolor(TV_BG)
+        ax.grid(True, color=TV_GRID, linestyle='solid')
+        ax.set_axisbelow(True)
+        for spine in ax.spines.values():
+            spine.set_color(TV_GRID)
+        ax.yaxis.tick_right()
+        ax.yaxis.set_label_position('right')
+        ax.tick_params(colors=TV_TEXT)
+        ax.set_ylabel('Price', color=TV_TEXT)
+        self._title = ax.set_title("", color=TV_TEXT)
+
+        self._wicks = LineCollection([], linewidths=1.0)
+        self._bodies = PolyCollection([], linewidths=0.5)
+        ax.add_collection(self._wicks)
+        ax.add_collection(self._bodies)
+        self._zone_artists = []
+
+    def _release(self):
+        if self._fig is not None:
+            plt.close(self._fig)
+        self._fig = None
+        self._ax = None
+
+    def close(self):
+        """Frees the cached figure."""
+        self._release()
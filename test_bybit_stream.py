@@ -0,0 +1,118 @@
+import threading
+import time
+from src.bridges.bybit_bridge import BybitBridge
+from src.bridges.bybit_replay import ReplayServer
+
+INTERVAL_MS = 5 * 60 * 1000
+
+class FakeRestSession:
+    """get_kline stand-in: 50 bars ending at the current 5m bar (newest first, like Bybit)."""
+    def __init__(self, current_start):
+        self.current_start = current_start
+        self.kline_calls = 0
+
+    def get_kline(self, category, symbol, interval, limit, start=None):
+        self.kline_calls += 1
+        starts = [self.current_start - i * INTERVAL_MS for i in range(min(limit, 50))]
+        if start is not None:
+            starts = [t for t in starts if t >= start]
+        rows = [[str(t), "100", "101", "99", "100", "10", "1000"] for t in starts]
+        return {'retCode': 0, 'result': {'list': rows}}
+
+class FakeTickerSession:
+    """get_tickers stand-in: slow enough that concurrent callers overlap."""
+    def __init__(self):
+        self.ticker_calls = 0
+
+    def get_tickers(self, category):
+        self.ticker_calls += 1
+        time.sleep(0.05)
+        rows = [{'symbol': 'BTCUSDT', 'bid1Price': '101.4', 'ask1Price': '101.6'},
+                {'symbol': 'NEWUSDT', 'bid1Price': '', 'ask1Price': ''}] # No book yet
+        return {'retCode': 0, 'result': {'list': rows}}
+
+def kline_msg(start, close, confirm=False):
+    return {
+        'topic': 'kline.5.BTCUSDT', 'type': 'snapshot', 'ts': start,
+        'data': [{'start': start, 'end': start + INTERVAL_MS - 1, 'interval': '5',
+                  'open': '100', 'high': str(max(101, close)), 'low': '99', 'close': str(close),
+                  'volume': '12', 'turnover': '1200', 'confirm': confirm, 'timestamp': start}]
+    }
+
+def test_stream_replay():
+    print("--- STARTING BYBIT STREAM REPLAY TEST ---")
+    current = int(time.time() * 1000) // INTERVAL_MS * INTERVAL_MS
+    messages = [
+        kline_msg(current, 100.5),
+        kline_msg(current, 102.0, confirm=True),     # Forming bar closes
+        kline_msg(current + INTERVAL_MS, 101.5),     # Next bar opens
+        {'topic': 'orderbook.1.BTCUSDT', 'type': 'snapshot', 'ts': current,
+         'data': {'s': 'BTCUSDT', 'b': [['101.4', '3']], 'a': [['101.6', '2']], 'u': 1, 'seq': 1}}
+    ]
+    server = ReplayServer(messages, autoplay=False).start()
+
+    bridge = BybitBridge()
+    bridge.session = FakeRestSession(current)
+    stream = bridge.start_stream(['BTCUSDT'], intervals=('5',), url=server.url)
+    try:
+        assert stream.wait_until_connected(timeout=5)
+
+        # 1. REST seeds the ring during this connection -> stream takes over
+        seeded = bridge.get_candles('BTCUSDT', '5', num_candles=20)
+        assert len(seeded) == 20 and bridge.session.kline_calls == 1
+
+        server.play()
+        deadline = time.time() + 5
+        while stream.messages < len(messages) and time.time() < deadline:
+            time.sleep(0.02)
+        assert stream.messages == len(messages)
+
+        # 2. Served from the ring: new bar appended, closed bar updated, no REST call
+        df = bridge.get_candles('BTCUSDT', '5', num_candles=20)
+        assert bridge.session.kline_calls == 1
+        assert len(df) == 20
+        assert df['close'].iloc[-2] == 102.0 and df['close'].iloc[-1] == 101.5
+        assert df['time'].iloc[-1].value // 10**6 == current + INTERVAL_MS
+
+        # Frames handed out earlier are detached from the ring (CandleCache keeps them for the cycle)
+        assert seeded['close'].iloc[-1] == 100.0
+        assert seeded['time'].iloc[-1].value // 10**6 == current
+
+        # 3. Top of book from orderbook.1
+        assert bridge.get_tick('BTCUSDT') == {'bid': 101.4, 'ask': 101.6}
+
+        # 4. Socket open but silent past stale_after: frozen feed -> REST again
+        stream.connected_since -= 2 * stream.stale_after
+        stream.last_message_at -= 2 * stream.stale_after
+        assert not stream.is_fresh()
+        bridge.get_candles('BTCUSDT', '5', num_candles=20)
+        assert bridge.session.kline_calls == 2
+    finally:
+        bridge.stop_stream()
+        server.stop()
+
+    print("--- BYBIT STREAM REPLAY OK ---")
+
+def test_ticker_snapshot():
+    print("--- STARTING BYBIT TICKER SNAPSHOT TEST ---")
+    bridge = BybitBridge()
+    bridge.session = FakeTickerSession()
+
+    # Lanes hitting an expired snapshot together -> one get_tickers call
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(bridge.get_ticks(['BTCUSDT']))) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert bridge.session.ticker_calls == 1
+    assert results == [{'BTCUSDT': {'bid': 101.4, 'ask': 101.6}}] * 8
+    assert 'NEWUSDT' not in bridge.get_ticks()
+
+    # Expired TTL -> refreshed
+    bridge._tick_snapshot_at -= 2 * bridge.tick_ttl
+    bridge.get_ticks()
+    assert bridge.session.ticker_calls == 2
+    print("--- BYBIT TICKER SNAPSHOT OK ---")
+
+if __name__ == "__main__":
+    test_stream_replay()
+    test_ticker_snapshot()
@@ -1,6 +1,11 @@
+import os
+import tempfile
 import pandas as pd
 import numpy as np
 from src.strategy.smc_logic import SMCLogic
+from src.strategy import rejection_stats as rej
+from src.strategy.rsi_engine import IncrementalRSI, RSI_SMA, RSI_WILDER
+from src.communication.telegram_bot import TelegramBot
 
 def test_logic():
     print("--- STARTING SMC LOGIC TEST ---")
@@ -51,5 +56,311 @@ def test_logic():
     
     print("\n--- TEST COMPLETE ---")
 
+def test_find_swings():
+    print("--- STARTING SWING ENGINE TEST ---")
+    smc = SMCLogic()
+
+    # Zig-zag: pivot highs at 2 and 6, pivot lows at 4 and 8 (3-candle rule)
+    highs = [10, 11, 13, 11, 10, 12, 14, 12, 11, 12]
+    lows = [9, 10, 12, 9, 8, 10, 13, 10, 7, 11]
+    df = pd.DataFrame({'high': highs, 'low': lows})
+
+    res = smc.find_swings(df.copy())
+    assert list(res.index[res['is_swing_high']]) == [2, 6]
+    assert list(res.index[res['is_swing_low']]) == [4, 8]
+    assert res.at[6, 'swing_high_val'] == 14
+    assert np.isnan(res.at[5, 'swing_high_val'])
+
+    # Wider pivot (2 candles each side): both highs still clear their neighbours,
+    # the low at 8 drops out (only one candle after it)
+    res_wide = smc.find_swings(df.copy(), pivot_width=2)
+    assert list(res_wide.index[res_wide['is_swing_high']]) == [2, 6]
+    assert list(res_wide.index[res_wide['is_swing_low']]) == [4]
+
+    print("--- SWING ENGINE OK ---")
+
+def test_structure_tracker():
+    print("--- STARTING STRUCTURE TRACKER TEST ---")
+    smc = SMCLogic()
+    tracker = smc.get_structure_tracker("TEST", 5)
+
+    # Random walk 5m candles, scanned as a rolling 200-bar window (like main.py)
+    rng = np.random.default_rng(7)
+    closes = 100 + rng.normal(0, 1, 400).cumsum()
+    df = pd.DataFrame({
+        'time': pd.date_range(start='2024-01-01', periods=400, freq='5min'),
+        'open': closes,
+        'high': closes + rng.uniform(0, 1, 400),
+        'low': closes - rng.uniform(0, 1, 400),
+        'close': closes + rng.normal(0, 0.3, 400)
+    })
+
+    for end in range(250, 400):
+        window = df.iloc[end - 200:end].reset_index(drop=True)
+        sweep_time = window.iloc[-1]['time'] - pd.Timedelta(hours=1)
+        for side in ['sell_side', 'buy_side']:
+            full = smc.detect_mss(window.copy(), side, sweep_time)
+            streamed = smc.detect_mss(window.copy(), side, sweep_time, tracker=tracker)
+            assert full == streamed, f"Mismatch at {end} {side}: {full} vs {streamed}"
+
+    # Window that starts after the tracker's last swings: a steady rise has no pivots,
+    # so the swings confirmed on the earlier bars must not leak into the MSS check
+    rising = df.iloc[400 - 20:].reset_index(drop=True)
+    rising['time'] = df['time'].iloc[-1] + pd.Timedelta(minutes=5) * np.arange(1, 21)
+    rising['high'] = 200.0 + np.arange(20)
+    rising['low'] = rising['high'] - 1.0
+    rising['close'] = rising['high'] - 0.5
+    joined = pd.concat([df.iloc[-50:], rising], ignore_index=True)
+    tracker.sync(joined) # Ingest the old pivots + the rise
+    sweep_time = rising.iloc[-1]['time'] - pd.Timedelta(hours=1)
+    for side in ['sell_side', 'buy_side']:
+        full = smc.detect_mss(rising.copy(), side, sweep_time)
+        streamed = smc.detect_mss(rising.copy(), side, sweep_time, tracker=tracker)
+        assert full == streamed and full['reject_code'] == rej.MSS_NO_SWING, f"{side}: {full} vs {streamed}"
+
+    print("--- STRUCTURE TRACKER OK ---")
+
+def test_multi_window_sweeps():
+    print("--- STARTING MULTI-WINDOW SWEEP TEST ---")
+    smc = SMCLogic()
+
+    # 120 flat H1 candles with a 110 high far back and a 105 high recently
+    df = pd.DataFrame({
+        'time': pd.date_range(start='2024-01-01', periods=120, freq='1h'),
+        'open': [100.0] * 120,
+        'high': [102.0] * 120,
+        'low': [98.0] * 120,
+        'close': [100.0] * 120
+    })
+    df.at[30, 'high'] = 110.0 # Only inside the 100-bar window
+    df.at[100, 'high'] = 105.0 # Inside the 20 and 50-bar windows
+
+    # Last candle sweeps 105 (wick 33%) but stays below 110
+    df.at[119, 'high'] = 106.0
+    df.at[119, 'close'] = 104.0
+
+    sweeps = smc.detect_htf_sweeps_multi(df, windows=(20, 50, 100))
+    assert [s['window'] for s in sweeps] == [20, 50]
+    assert all(s['side'] == 'buy_side' and s['level'] == 105.0 for s in sweeps)
+
+    # exclude=0 keeps the whole base range (the sweeper is inside it, so nothing can sweep)
+    smc.sweep_exclude = 0
+    assert smc.detect_htf_sweeps_multi(df, windows=(20, 50, 100)) == []
+    assert not smc.detect_htf_sweeps(df)['swept']
+
+    print("--- MULTI-WINDOW SWEEP OK ---")
+
+def test_evaluate_batch():
+    print("--- STARTING BATCH EVALUATION TEST ---")
+    smc = SMCLogic()
+    rng = np.random.default_rng(11)
+
+    # 8 symbols, each H1 frame with a spike on one of the last 3 candles
+    htf_map, ltf_map = {}, {}
+    for n in range(8):
+        closes = 100 + rng.normal(0, 1, 60).cumsum()
+        htf = pd.DataFrame({
+            'time': pd.date_range(start='2024-01-01', periods=60, freq='1h'),
+            'open': closes + rng.normal(0, 0.5, 60),
+            'close': closes
+        })
+        htf['high'] = htf[['open', 'close']].max(axis=1) + rng.uniform(0, 2, 60)
+        htf['low'] = htf[['open', 'close']].min(axis=1) - rng.uniform(0, 2, 60)
+        htf.loc[60 - (n % 3) - 1, 'high' if n % 2 else 'low'] += 6 if n % 2 else -6
+
+        ltf_closes = closes[-1] + rng.normal(0, 0.3, 200).cumsum()
+        ltf = pd.DataFrame({
+            'time': pd.date_range(end=htf['time'].iloc[-1] + pd.Timedelta(hours=1), periods=200, freq='5min'),
+            'open': ltf_closes, 'close': ltf_closes,
+            'high': ltf_closes + rng.uniform(0, 0.3, 200), 'low': ltf_closes - rng.uniform(0, 0.3, 200)
+        })
+        htf_map[f"SYM{n}"], ltf_map[f"SYM{n}"] = htf, ltf
+
+    symbols, htf = smc.stack_candles(htf_map)
+    _, ltf = smc.stack_candles(ltf_map, symbols=symbols)
+    results = smc.evaluate_batch(symbols, htf, ltf)
+
+    for sym in symbols:
+        sweep = smc.detect_htf_sweeps(htf_map[sym], symbol=sym)
+        assert results[sym]['sweep'] == sweep
+        if sweep['swept']:
+            mss = smc.detect_mss(ltf_map[sym], sweep['side'], sweep['sweep_candle_time'], symbol=sym)
+            assert results[sym]['mss'] == mss
+
+    # LTF rows must line up with the HTF symbols: a gap fails loudly instead of shifting rows
+    partial_ltf = {sym: df for sym, df in ltf_map.items() if sym != "SYM3"}
+    try:
+        smc.stack_candles(partial_ltf, symbols=symbols)
+        assert False, "missing LTF symbol should raise"
+    except ValueError:
+        pass
+    _, shifted = smc.stack_candles(partial_ltf)
+    try:
+        smc.evaluate_batch(symbols, htf, shifted)
+        assert False, "row mismatch should raise"
+    except ValueError:
+        pass
+
+    print("--- BATCH EVALUATION OK ---")
+
+def legacy_find_fvg(ltf_candles, direction, leg_high, leg_low, lookback=50):
+    """The pre-vectorization find_fvg loop (reference for the equivalence test)."""
+    eq_level = (leg_high + leg_low) / 2
+    fvg_list = []
+    if len(ltf_candles) < 3: return []
+    start_idx = len(ltf_candles) - 1
+    end_idx = max(2, start_idx - lookback)
+    for i in range(start_idx, end_idx - 1, -1):
+        candle_c = ltf_candles.iloc[i]
+        candle_a = ltf_candles.iloc[i - 2]
+        fvg_found = None
+        if direction == 'bullish':
+            if candle_a['high'] < candle_c['low'] and candle_c['low'] < eq_level:
+                fvg_found = {'top': candle_c['low'], 'bottom': candle_a['high'], 'entry': candle_c['low'], 'type': 'bullish', 'index': i}
+        elif direction == 'bearish':
+            if candle_a['low'] > candle_c['high'] and candle_c['high'] > eq_level:
+                fvg_found = {'top': candle_a['low'], 'bottom': candle_c['high'], 'entry': candle_c['high'], 'type': 'bearish', 'index': i}
+        if fvg_found:
+            is_mitigated = False
+            for j in range(i + 1, len(ltf_candles)):
+                future_candle = ltf_candles.iloc[j]
+                if direction == 'bullish' and future_candle['low'] <= fvg_found['top']:
+                    is_mitigated = True
+                    break
+                if direction == 'bearish' and future_candle['high'] >= fvg_found['bottom']:
+                    is_mitigated = True
+                    break
+            if not is_mitigated:
+                fvg_list.append(fvg_found)
+    return fvg_list
+
+def test_find_fvg():
+    print("--- STARTING FVG SCAN TEST ---")
+    smc = SMCLogic()
+    rng = np.random.default_rng(3)
+
+    # Jumpy random walk so gaps (and their mitigation) are common
+    closes = 100 + rng.normal(0, 1.5, 300).cumsum()
+    df = pd.DataFrame({
+        'time': pd.date_range(start='2024-01-01', periods=300, freq='5min'),
+        'high': closes + rng.uniform(0, 0.5, 300),
+        'low': closes - rng.uniform(0, 0.5, 300)
+    })
+
+    found = 0
+    for end in range(60, 300, 7):
+        window = df.iloc[end - 60:end].reset_index(drop=True)
+        leg_high, leg_low = window['high'].max(), window['low'].min()
+        for direction in ('bullish', 'bearish'):
+            for shift in (-5.0, 0.0, 5.0): # Move EQ so the premium/discount filter bites both ways
+                legacy = legacy_find_fvg(window, direction, leg_high + shift, leg_low + shift)
+                fast = smc.find_fvg(window, direction, leg_high + shift, leg_low + shift)
+                assert fast == legacy, f"Mismatch at {end} {direction} {shift}: {fast} vs {legacy}"
+                found += len(fast)
+    assert found > 0 # The data actually exercises the hit path
+
+    # Rejection codes for an empty result
+    flat = pd.DataFrame({'high': [101.0] * 10, 'low': [99.0] * 10})
+    assert smc.find_fvg(flat, 'bullish', 110, 90, symbol="FLAT") == []
+    assert smc.rejections.last("FLAT", 'fvg')['code'] == rej.FVG_NO_GAP
+
+    gapped = pd.DataFrame({'high': [101.0, 103.0, 104.0, 105.0], 'low': [99.0, 100.0, 103.0, 104.0]})
+    assert smc.find_fvg(gapped, 'bullish', 104, 100, symbol="GAP") == [] # Gap top 103 above EQ 102
+    assert smc.rejections.last("GAP", 'fvg')['code'] == rej.FVG_OUTSIDE_ZONE
+    gapped.loc[3, 'low'] = 102.5 # Discount gap, then wicked back into
+    assert smc.find_fvg(gapped, 'bullish', 110, 100, symbol="GAP") == []
+    assert smc.rejections.last("GAP", 'fvg')['code'] == rej.FVG_MITIGATED
+
+    print("--- FVG SCAN OK ---")
+
+def test_rejection_stats():
+    print("--- STARTING REJECTION STATS TEST ---")
+    smc = SMCLogic()
+
+    # Sweep: tiny wick through the 105 high (Case B of test_logic)
+    df = pd.DataFrame({
+        'time': pd.date_range(start='2024-01-01', periods=25, freq='1h'),
+        'open': [100.0] * 25, 'high': [102.0] * 25, 'low': [98.0] * 25, 'close': [100.0] * 25
+    })
+    df.at[10, 'high'] = 105.0
+    df.at[24, 'high'], df.at[24, 'close'] = 105.1, 104.9
+    res = smc.detect_htf_sweeps(df, symbol="XAUUSD")
+    assert not res['swept']
+    first = res['rejections'][0]
+    assert (first['code'], first['side'], first['candle']) == (rej.SWEEP_WICK_TOO_SMALL, 'buy_side', -1)
+
+    # MSS: sweep older than mss_expiry_hours
+    ltf = pd.DataFrame({
+        'time': pd.date_range(end=df['time'].iloc[-1], periods=50, freq='5min'),
+        'high': [101.0] * 50, 'low': [99.0] * 50, 'close': [100.0] * 50
+    })
+    old_sweep = ltf['time'].iloc[-1] - pd.Timedelta(hours=smc.mss_expiry_hours + 1)
+    mss = smc.detect_mss(ltf, 'sell_side', old_sweep, symbol="XAUUSD")
+    assert mss['mss'] is False and mss['reject_code'] == rej.MSS_EXPIRED
+    smc.detect_mss(ltf, 'sell_side', old_sweep, symbol="XAUUSD")
+    smc.find_fvg(ltf, 'bullish', 110, 90, symbol="EURUSD")
+
+    counter = smc.rejections
+    assert counter.sample() == {
+        'XAUUSD': {'sweep': {rej.SWEEP_WICK_TOO_SMALL: 1}, 'mss': {rej.MSS_EXPIRED: 2}},
+        'EURUSD': {'fvg': {rej.FVG_NO_GAP: 1}}
+    }
+    assert counter.sample('EURUSD') == {'EURUSD': {'fvg': {rej.FVG_NO_GAP: 1}}}
+    assert counter.totals()[('mss', rej.MSS_EXPIRED)] == 2
+    assert counter.last('XAUUSD', 'sweep')['ratio'] == first['ratio']
+
+    # /rejects (no network: the command only reads the counter)
+    bot = TelegramBot.__new__(TelegramBot)
+    msg = bot.handle_command('/rejects', 'xauusd', {'smc': smc})
+    assert "**XAUUSD**" in msg and "MSS: expired: 2" in msg and "EURUSD" not in msg
+    assert "No rejections recorded for GBPUSD" in bot.handle_command('/rejects', 'GBPUSD', {'smc': smc})
+
+    # Backtest CSV export
+    with tempfile.TemporaryDirectory() as folder:
+        path = counter.to_csv(os.path.join(folder, "rejections.csv"))
+        exported = pd.read_csv(path)
+    assert len(exported) == 3
+    assert exported.set_index(['symbol', 'detector'])['count'][('XAUUSD', 'mss')] == 2
+
+    counter.reset()
+    assert counter.sample() == {}
+
+    print("--- REJECTION STATS OK ---")
+
+def test_incremental_rsi():
+    print("--- STARTING INCREMENTAL RSI TEST ---")
+    smc = SMCLogic()
+    rng = np.random.default_rng(5)
+    closes = 100 + rng.normal(0, 1, 400).cumsum()
+    closes[150:155] = closes[149] # Flat stretch: zero-move bars
+    df = pd.DataFrame({'time': pd.date_range(start='2024-01-01', periods=400, freq='5min'), 'close': closes})
+
+    for method in (RSI_SMA, RSI_WILDER):
+        batch = smc.calculate_rsi(df['close'], 14, method=method).to_numpy()
+
+        # 1. One closed bar at a time == batch RSI
+        rsi = IncrementalRSI(14, method=method)
+        stepped = np.array([rsi.update(c) for c in closes])
+        assert np.allclose(stepped, batch, equal_nan=True), method
+
+        # 2. Rolling 200-bar windows through sync() (forming bar via peek), like the scan loop
+        tracker = smc.get_rsi_tracker("TEST", 5, method=method)
+        for end in range(220, 400, 3):
+            window = df.iloc[end - 200:end].reset_index(drop=True)
+            assert np.isclose(tracker.sync(window), batch[end - 1]), f"{method} sync mismatch at {end}"
+
+        # 3. A window that no longer overlaps the stored history re-seeds (warm-up NaN, no stale state)
+        later = df.iloc[300:310].reset_index(drop=True)
+        assert np.isnan(tracker.sync(later))
+
+    print("--- INCREMENTAL RSI OK ---")
+
 if __name__ == "__main__":
     test_logic()
+    test_find_swings()
+    test_structure_tracker()
+    test_multi_window_sweeps()
+    test_evaluate_batch()
+    test_find_fvg()
+    test_rejection_stats()
+    test_incremental_rsi()
@@ -0,0 +1,182 @@
+import json
+import os
+import tempfile
+from src.utils.state_manager import StateManager
+from src.utils.state_store import JsonStateStore, SqliteStateStore, JournalStateStore
+
+def make_store(backend, folder, **kwargs):
+    if backend == 'json':
+        return JsonStateStore(os.path.join(folder, "state.json"))
+    if backend == 'sqlite':
+        return SqliteStateStore(os.path.join(folder, "state.db"))
+    return JournalStateStore(os.path.join(folder, "state"), **kwargs)
+
+def open_manager(backend, folder, **kwargs):
+    return StateManager(os.path.join(folder, "state.json"), store=make_store(backend, folder, **kwargs))
+
+def populate(sm):
+    sm.add_trade({'ticket': 1, 'symbol': 'XAUUSD', 'direction': 'long', 'entry_price': 2000.0})
+    sm.add_trade({'ticket': 2, 'symbol': 'EURUSD', 'direction': 'short', 'entry_price': 1.1})
+    sm.add_trade({'ticket': 3, 'symbol': 'XAUUSD', 'direction': 'short', 'entry_price': 2010.0})
+    sm.remove_trade(2)
+    sm.add_pending_setup({'symbol': 'GBPUSD', 'direction': 'bullish', 'entry': 1.25, 'created_at': '2024-01-01T00:00:00'})
+    sm.add_pending_setup({'symbol': 'GBPUSD', 'direction': 'bearish', 'entry': 1.26, 'created_at': '2024-01-01T01:00:00'})
+    sm.update_scan_data('XAUUSD', {'status': 'Scanning', 'rsi': 55.0})
+    sm.update_sweep('XAUUSD', {'side': 'buy_side', 'level': 2015.0})
+    sm.updates_session_pnl(-50.0)
+    sm.log_closed_trade({'ticket': 2, 'symbol': 'EURUSD', 'pnl': -50.0})
+    sm.flush()
+
+def check_populated(sm):
+    assert [t['ticket'] for t in sm.state['active_trades']] == [1, 3]
+    assert [t['ticket'] for t in sm.get_trades('XAUUSD')] == [1, 3]
+    assert sm.get_trade(2) is None
+    assert sm.get_pending_setup('GBPUSD')['direction'] == 'bearish'
+    assert len(sm.state['pending_setups']) == 1
+    assert sm.state['last_scan_data']['XAUUSD']['rsi'] == 55.0
+    assert sm.state['active_sweeps']['XAUUSD']['level'] == 2015.0
+    assert sm.state['session_pnl'] == -50.0
+    assert sm.get_trade_history()[0]['ticket'] == 2
+
+def test_round_trip():
+    print("--- STARTING STATE STORE ROUND-TRIP TEST ---")
+    for backend in ('json', 'sqlite', 'journal'):
+        with tempfile.TemporaryDirectory() as folder:
+            sm = open_manager(backend, folder)
+            populate(sm)
+            check_populated(sm)
+            sm.close()
+
+            reopened = open_manager(backend, folder)
+            check_populated(reopened)
+            reopened.close()
+    print("--- STATE STORE ROUND-TRIP OK ---")
+
+def test_failed_write_is_retried():
+    print("--- STARTING FAILED WRITE RETRY TEST ---")
+    with tempfile.TemporaryDirectory() as folder:
+        sm = open_manager('sqlite', folder)
+        real_write = sm.store.write
+        calls = []
+        def flaky_write(batch):
+            calls.append(batch)
+            if len(calls) == 1:
+                raise OSError("disk full")
+            real_write(batch)
+        sm.store.write = flaky_write
+
+        sm.add_trade({'ticket': 7, 'symbol': 'XAUUSD'}) # Write fails: change-set merged back
+        sm.add_trade({'ticket': 8, 'symbol': 'XAUUSD'}) # Next flush carries both tickets
+        sm.close()
+
+        reopened = open_manager('sqlite', folder)
+        assert [t['ticket'] for t in reopened.state['active_trades']] == [7, 8]
+        reopened.close()
+    print("--- FAILED WRITE RETRY OK ---")
+
+def test_journal_torn_tail():
+    print("--- STARTING JOURNAL TORN TAIL TEST ---")
+    with tempfile.TemporaryDirectory() as folder:
+        sm = open_manager('journal', folder)
+        populate(sm)
+        sm.close()
+
+        # Crash mid-append: half an event, no newline
+        journal_path = os.path.join(folder, "state.journal")
+        good_size = os.path.getsize(journal_path)
+        with open(journal_path, "a") as f:
+            f.write('{"op": "set", "key": "session_pnl", "val')
+
+        sm = open_manager('journal', folder)
+        check_populated(sm)
+        assert os.path.getsize(journal_path) == good_size # Torn line cut off
+
+        # New events land after the last good line and survive another restart
+        sm.add_trade({'ticket': 9, 'symbol': 'US30'})
+        sm.close()
+        reopened = open_manager('journal', folder)
+        assert [t['ticket'] for t in reopened.state['active_trades']] == [1, 3, 9]
+        reopened.close()
+    print("--- JOURNAL TORN TAIL OK ---")
+
+def test_journal_compaction():
+    print("--- STARTING JOURNAL COMPACTION TEST ---")
+    with tempfile.TemporaryDirectory() as folder:
+        sm = open_manager('journal', folder, compact_every=5)
+        populate(sm)
+        sm.add_trade({'ticket': 10, 'symbol': 'NAS100'})
+        sm.close()
+
+        snapshot_path = os.path.join(folder, "state.snapshot.json")
+        assert os.path.exists(snapshot_path)
+        with open(snapshot_path) as f:
+            snapshot_seq = json.load(f)['seq']
+        with open(os.path.join(folder, "state.journal")) as f:
+            tail = [json.loads(line) for line in f]
+        assert all(event['seq'] > snapshot_seq for event in tail) # Journal restarted after the snapshot
+
+        reopened = open_manager('journal', folder, compact_every=5)
+        assert [t['ticket'] for t in reopened.state['active_trades']] == [1, 3, 10]
+        assert reopened.get_pending_setup('GBPUSD')['direction'] == 'bearish'
+        assert reopened.state['session_pnl'] == -50.0
+        reopened.close()
+    print("--- JOURNAL COMPACTION OK ---")
+
+def test_state_json_import():
+    print("--- STARTING STATE.JSON IMPORT TEST ---")
+    for backend in ('sqlite', 'journal'):
+        with tempfile.TemporaryDirectory() as folder:
+            legacy = open_manager('json', folder)
+            legacy.log_closed_trade({'ticket': 1, 'symbol': 'XAUUSD', 'pnl': 120.0})
+            populate(legacy)
+            legacy.close()
+
+            sm = open_manager(backend, folder) # Empty backend + state.json -> import
+            check_populated(sm)
+            sm.close()
+
+            # The import was persisted by the new backend, not just read from state.json again
+            os.remove(os.path.join(folder, "state.json"))
+            reopened = open_manager(backend, folder)
+            check_populated(reopened)
+            assert [t['ticket'] for t in reopened.get_trade_history()] == [2, 1]
+            reopened.close()
+    print("--- STATE.JSON IMPORT OK ---")
+
+def test_indexes():
+    print("--- STARTING STATE INDEX TEST ---")
+    with tempfile.TemporaryDirectory() as folder:
+        sm = open_manager('json', folder)
+        populate(sm)
+        trades, pending = sm.state['active_trades'], sm.state['pending_setups']
+
+        # Mutators edit the canonical lists in place
+        sm.remove_trade(1)
+        sm.add_pending_setup({'symbol': 'GBPUSD', 'direction': 'bullish', 'entry': 1.24})
+        sm.remove_pending_setup('GBPUSD')
+        assert sm.state['active_trades'] is trades and sm.state['pending_setups'] is pending
+        assert [t['ticket'] for t in trades] == [3] and pending == []
+
+        # Same-length edit from outside: invisible until invalidate_indexes()
+        trades[0] = {'ticket': 11, 'symbol': 'US30'}
+        sm.invalidate_indexes()
+        assert sm.get_trade(3) is None and sm.get_trade(11)['symbol'] == 'US30'
+        assert sm.get_trades('XAUUSD') == []
+
+        # Whole-list swap through the mutator (/panic)
+        sm.replace_trades([])
+        assert sm.get_trades() == [] and sm.trade_symbols() == set()
+        sm.close()
+
+        reopened = open_manager('json', folder)
+        assert reopened.state['active_trades'] == [] and reopened.get_trade(11) is None
+        reopened.close()
+    print("--- STATE INDEX OK ---")
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_failed_write_is_retried()
+    test_journal_torn_tail()
+    test_journal_compaction()
+    test_state_json_import()
+    test_indexes()
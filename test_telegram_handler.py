@@ -0,0 +1,45 @@
+import logging
+import time
+from src.communication.telegram_handler import TelegramErrorHandler
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, msg, chat_id=None):
+        self.sent.append(msg)
+
+def make_record(msg):
+    return logging.LogRecord("main", logging.ERROR, __file__, 1, msg, None, None)
+
+def test_alert_coalescing():
+    print("--- STARTING ALERT COALESCING TEST ---")
+    bot = FakeBot()
+    handler = TelegramErrorHandler(bot, window=0.3)
+    handler.chat_id = "1"
+    try:
+        # Burst of 5 identical errors + 1 different one
+        for _ in range(5):
+            handler.emit(make_record("MT5 disconnected"))
+        handler.emit(make_record("Bybit timeout"))
+
+        deadline = time.time() + 2
+        while len(bot.sent) < 2 and time.time() < deadline:
+            time.sleep(0.02)
+        assert len(bot.sent) == 2 # One immediate alert per distinct error
+        assert "MT5 disconnected" in bot.sent[0] and "more in last" not in bot.sent[0]
+        assert "Bybit timeout" in bot.sent[1]
+
+        # After the window: one summary with the 4 repeats (the first was already sent)
+        deadline = time.time() + 2
+        while len(bot.sent) < 3 and time.time() < deadline:
+            time.sleep(0.02)
+        time.sleep(0.1)
+        assert len(bot.sent) == 3
+        assert "MT5 disconnected" in bot.sent[2] and "(+4 more in last 0.3s)" in bot.sent[2]
+    finally:
+        handler.close()
+    print("--- ALERT COALESCING OK ---")
+
+if __name__ == "__main__":
+    test_alert_coalescing()